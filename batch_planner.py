@@ -0,0 +1,200 @@
+import argparse
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from shortest_path_calculation import TransportMode, use_distance_matrix_store
+from planning_cache import PlanningCache, plan_journey, use_planning_cache
+from main import CRITERIA_MAPPING
+from fast_loader import load_locations_fast, load_transport_modes_fast
+from distance_store import DISTANCE_STORE_DIRECTORY, DistanceMatrixStore
+
+# Function to turn the locations field of a request into a locations dictionary
+def _request_locations(value):
+    """
+    Parameters:
+        value: Path to a locations CSV file, or a mapping of names to [latitude, longitude].
+
+    Returns:
+        dict: Dictionary of location names and their coordinates (latitude, longitude), or a
+              LocationTable when read from a CSV file.
+    """
+    if isinstance(value, str):
+        return load_locations_fast(value)  # Parsed once, then read from the binary cache
+    return {name: (float(coords[0]), float(coords[1])) for name, coords in value.items()}
+
+# Function to turn the transport_modes field of a request into TransportMode objects
+def _request_transport_modes(value):
+    """
+    Parameters:
+        value: Path to a transport modes CSV file, or a list of objects with name, speed_kmh,
+               cost_per_km and transfer_time_min fields.
+
+    Returns:
+        list: List of TransportMode objects.
+    """
+    if isinstance(value, str):
+        return load_transport_modes_fast(value)
+    return [TransportMode(mode["name"], float(mode["speed_kmh"]), float(mode["cost_per_km"]),
+                          int(mode["transfer_time_min"])) for mode in value]
+
+# Function to plan one route request without any user interaction
+def plan_request(request):
+    """
+    Solves the route and optimizes transport modes for one batch request.
+
+    Parameters:
+        request (dict): Route request with the fields
+                        - request_id: Identifier echoed in the result.
+                        - locations: Mapping of names to [latitude, longitude] or a CSV path (default "locations.csv").
+                        - transport_modes: List of modes or a CSV path (default "transport_modes.csv").
+                        - criterion: "Minimum Cost", "Minimum Time", "Both Cost and Time" or "1"/"2"/"3"
+                          (default "Minimum Cost").
+                        - seed: Seed for the heuristic solvers (default 42).
+                        - start: Starting location (default "Tarjan" when present, otherwise any).
+
+    Returns:
+        dict: JSON-serializable result with the route, per-segment modes and totals.
+    """
+    # Diagnostics from the loaders and decorators go to stderr so stdout stays valid JSONL
+    with redirect_stdout(sys.stderr):
+        locations = _request_locations(request.get("locations", "locations.csv"))
+        transport_modes = _request_transport_modes(request.get("transport_modes", "transport_modes.csv"))
+        criterion = request.get("criterion", "Minimum Cost")
+        criterion = CRITERIA_MAPPING.get(criterion, criterion)
+        if criterion not in CRITERIA_MAPPING.values():
+            raise ValueError(f"Unknown criterion: {criterion}")
+        if not locations:
+            raise ValueError("No valid locations in request")
+        if not transport_modes:
+            raise ValueError("No valid transport modes in request")
+        start = request.get("start", "Tarjan" if "Tarjan" in locations else None)
+
+        # Repeated requests (same locations, modes, start and seed) reuse the cached plan
+        _, path, journey, journey_distance = plan_journey(locations, transport_modes, start=start,
+                                                          seed=request.get("seed", 42), columnar=True)
+
+    best = journey[criterion]
+    segments = [
+        {"segment": f"{origin} -> {destination}", "mode": mode, "cost": float(cost), "time": float(time),
+         "distance": float(distance)}
+        for origin, destination, mode, cost, time, distance in zip(journey["Start"], journey["End"], best["Mode"],
+                                                          best["Cost"], best["Time"], journey["Distance"])
+    ]
+    return {
+        "request_id": request.get("request_id"),
+        "criterion": criterion,
+        "path": path,
+        "total_distance": journey_distance,
+        "total_cost": float(best["Cost"].sum()),
+        "total_time": float(best["Time"].sum()),
+        "segments": segments,
+    }
+
+# Function to plan one JSONL line, turning any failure into an error result
+def plan_line(line):
+    """
+    Parameters:
+        line (str): One JSON-encoded route request.
+
+    Returns:
+        dict: Result of plan_request, or {"request_id": ..., "error": ...} if the request failed.
+    """
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get("request_id")
+        return plan_request(request)
+    except Exception as e:
+        return {"request_id": request_id, "error": f"{type(e).__name__}: {e}"}
+
+# Function to set up a pool worker with the distance matrix store and plan cache of the batch
+def _initialize_worker(distance_store, planning_cache):
+    use_distance_matrix_store(distance_store)
+    if planning_cache is not None:
+        use_planning_cache(planning_cache)
+
+# Generator planning a stream of JSONL requests, in order, with bounded memory
+def plan_stream(lines, workers=1, max_pending=None, distance_store=None, planning_cache=None):
+    """
+    Plans every non-blank line of a JSONL stream. With workers > 1 the requests run in a process
+    pool; at most max_pending requests are read ahead, so memory stays constant for any input size.
+
+    Parameters:
+        lines (iterable): JSONL lines, e.g. an open file or sys.stdin.
+        workers (int): Number of worker processes (1 plans in the current process).
+        max_pending (int): Requests in flight at once (default 4 per worker).
+        distance_store (DistanceMatrixStore): Optional store of memory-mapped distance matrices, used
+                                              by this process and every worker.
+        planning_cache (PlanningCache): Optional plan cache, used by this process and every worker
+                                        (each with its own memory tier and a shared disk tier).
+
+    Yields:
+        dict: One result per request, in input order.
+    """
+    requests = (line for line in lines if line.strip())
+    if distance_store is not None:
+        use_distance_matrix_store(distance_store)
+    if planning_cache is not None:
+        use_planning_cache(planning_cache)
+    if workers <= 1:
+        for line in requests:
+            yield plan_line(line)
+        return
+
+    max_pending = max_pending or workers * 4
+    # Workers set the store and cache themselves, whatever the process start method
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                             initargs=(distance_store, planning_cache)) as executor:
+        pending = deque()
+        for line in requests:
+            pending.append(executor.submit(plan_line, line))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# Command-line entry point for headless batch planning
+def run_batch_planner(argv=None):
+    """
+    Reads JSONL route requests from a file or stdin and writes one JSONL result per request.
+
+    Parameters:
+        argv (list): Command-line arguments (default: sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(description="Plan TarjanPlanner route requests from JSONL without a terminal.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL request file, or - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL result file, or - for stdout (default)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--distance-store", nargs="?", const=DISTANCE_STORE_DIRECTORY, default=None,
+                        help=f"Folder of memory-mapped distance matrices shared by workers and runs "
+                             f"(default when given without a folder: {DISTANCE_STORE_DIRECTORY}; off by default)")
+    parser.add_argument("--float32", action="store_true",
+                        help="Store distance matrices as float32 (enables --distance-store with its default folder)")
+    parser.add_argument("--plan-cache", default=None,
+                        help="SQLite file caching finished plans across workers and runs (default: memory only)")
+    args = parser.parse_args(argv)
+
+    distance_store = None
+    if args.float32 and not args.distance_store:
+        args.distance_store = DISTANCE_STORE_DIRECTORY  # float32 only applies to stored matrices
+    if args.distance_store:
+        distance_store = DistanceMatrixStore(args.distance_store, "float32" if args.float32 else "float64")
+    planning_cache = PlanningCache(path=args.plan_cache) if args.plan_cache else None
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r")
+    target = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in plan_stream(source, workers=args.workers, distance_store=distance_store,
+                                  planning_cache=planning_cache):
+            target.write(json.dumps(result) + "\n")
+            target.flush()  # Stream each result as soon as it is ready
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+if __name__ == "__main__":
+    run_batch_planner()
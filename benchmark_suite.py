@@ -0,0 +1,358 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from shortest_path_calculation import (Segment, genetic_algorithm, local_search_route, calculate_total_distance,
+                                       haversine_array, location_coordinates)
+from route_solver import held_karp_route, solve_route
+from cluster_solver import cluster_solve_route
+from spatial_index import SpatialIndex
+from calculate_journey import calculate_journey, calculate_journey_batch
+from compare_transport_modes import compare_transport_modes, compare_transport_modes_batch
+from fast_loader import load_locations_fast
+from main import load_locations, load_transport_modes
+
+BASELINE_PATH = "benchmark_baseline.json"  # Default results file of the run command
+TRANSPORT_MODES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transport_modes.csv")  # Bundled modes
+BENCHMARK_VERSION = 1  # Format version of the results file
+DEFAULT_SIZES = (10, 100, 1000, 10000)  # Numbers of synthetic locations benchmarked
+SEOUL_BOUNDS = (37.413, 37.715, 126.734, 127.269)  # Min/max latitude and longitude of Seoul
+TARJAN_HOME = (37.5219, 126.9245)  # First location of every synthetic set, the route start
+GENERATIONS = 100  # Generations of genetic_algorithm per benchmark run
+WARM_UP_SIZE = 5  # Locations of the untimed warm-up pass
+EXACT_MAX_LOCATIONS = 12  # Largest set solved by held_karp_route
+MATRIX_MAX_LOCATIONS = 2000  # Solvers building the n x n distance matrix (8 n^2 bytes) are skipped above this
+REGRESSION_THRESHOLD = 0.2  # Relative increase in time or peak memory flagged as a regression
+QUALITY_THRESHOLD = 0.02  # Relative increase of the tour / lower bound ratio flagged as a regression
+NOISE_FLOOR_SECONDS = 0.005  # Smaller absolute time differences are never flagged
+NOISE_FLOOR_BYTES = 1 << 20  # Smaller absolute peak memory differences are never flagged
+
+# Function to generate a seeded synthetic location set inside Seoul
+def synthetic_locations(size, seed=0):
+    """
+    Parameters:
+        size (int): Number of locations, Tarjan's home included.
+        seed (int): Random seed; the same seed and size always give the same set.
+
+    Returns:
+        dict: Location names ("Tarjan", "Stop 1", ...) and their (latitude, longitude), uniform in SEOUL_BOUNDS.
+    """
+    rng = np.random.default_rng([seed, size])
+    min_latitude, max_latitude, min_longitude, max_longitude = SEOUL_BOUNDS
+    latitudes = rng.uniform(min_latitude, max_latitude, size - 1).round(6)
+    longitudes = rng.uniform(min_longitude, max_longitude, size - 1).round(6)
+    locations = {"Tarjan": TARJAN_HOME}
+    for number, (latitude, longitude) in enumerate(zip(latitudes.tolist(), longitudes.tolist()), start=1):
+        locations[f"Stop {number}"] = (latitude, longitude)
+    return locations
+
+# Function to write a location set in the locations.csv format
+def write_locations_csv(locations, file_path):
+    """
+    Parameters:
+        locations (dict): Location names and their coordinates.
+        file_path (str): CSV file to write.
+    """
+    with open(file_path, "w") as file:
+        file.write("Name,Latitude,Longitude\n")
+        file.writelines(f"{name},{latitude:.6f},{longitude:.6f}\n" for name, (latitude, longitude) in locations.items())
+
+# Function to compute a lower bound on the shortest path through all locations
+def path_lower_bound(locations):
+    """
+    Every path through all locations is a spanning tree, so the minimum spanning tree (Prim's algorithm,
+    one haversine row per step) is never longer than the optimal route. Needs O(n) memory only.
+
+    Parameters:
+        locations (dict): Location names and their coordinates, or a LocationTable.
+
+    Returns:
+        float: Length of the minimum spanning tree in kilometers.
+    """
+    coords = location_coordinates(locations)
+    size = len(coords)
+    if size < 2:
+        return 0.0
+    in_tree = np.zeros(size, dtype=bool)
+    nearest = np.full(size, np.inf)  # Distance of every location to the tree
+    current, total = 0, 0.0
+    for _ in range(size - 1):
+        in_tree[current] = True
+        row = haversine_array(coords[current, 0], coords[current, 1], coords[:, 0], coords[:, 1])
+        np.minimum(nearest, row, out=nearest)
+        nearest[in_tree] = np.inf
+        current = int(np.argmin(nearest))
+        total += float(nearest[current])
+    return total
+
+# Function to build a route with the matrix-free nearest-neighbour tour of SpatialIndex
+def spatial_nearest_neighbor_route(locations, start="Tarjan"):
+    """
+    Parameters:
+        locations (dict): Location names and their coordinates.
+        start (str): Name of the first location.
+
+    Returns:
+        tuple: Distance and path, like genetic_algorithm.
+    """
+    spatial_index = SpatialIndex(locations)
+    tour = spatial_index.nearest_neighbor_tour(spatial_index.names.index(start))
+    path = [spatial_index.names[location_id] for location_id in tour.tolist()]
+    coords = location_coordinates(locations, path)
+    distance = float(haversine_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1]).sum())
+    return distance, path
+
+# Benchmarks: name, function of the run context, largest size run (None: all) and whether it returns a route
+BENCHMARKS = (
+    ("load_locations", lambda context: load_locations(context["csv_path"]), None, False),
+    ("load_locations_fast", lambda context: load_locations_fast(context["csv_path"], use_cache=False), None, False),
+    ("held_karp_route", lambda context: held_karp_route(context["locations"], start="Tarjan", suppress_output=True),
+     EXACT_MAX_LOCATIONS, True),
+    ("genetic_algorithm", lambda context: genetic_algorithm(context["locations"], generations=context["generations"],
+                                                            suppress_output=True), MATRIX_MAX_LOCATIONS, True),
+    ("local_search_route", lambda context: local_search_route(context["locations"], start="Tarjan",
+                                                              suppress_output=True), None, True),
+    ("solve_route", lambda context: solve_route(context["locations"], start="Tarjan", suppress_output=True),
+     None, True),
+    ("cluster_solve_route", lambda context: cluster_solve_route(context["locations"], start="Tarjan",
+                                                                suppress_output=True), None, True),
+    ("spatial_nearest_neighbor", lambda context: spatial_nearest_neighbor_route(context["locations"]), None, True),
+    ("calculate_journey", lambda context: calculate_journey(context["locations"], context["transport_modes"],
+                                                            context["path"]), None, False),
+    ("calculate_journey_batch", lambda context: calculate_journey_batch(context["locations"], context["transport_modes"],
+                                                                        context["path"]), None, False),
+    ("compare_transport_modes", lambda context: [compare_transport_modes(segment, context["transport_modes"], True)
+                                                 for segment in context["segments"]], None, False),
+    ("compare_transport_modes_batch", lambda context: compare_transport_modes_batch(
+        context["distances"], context["transport_modes"], True), None, False),
+)
+
+# Function to time a call and measure its peak traced memory
+def measure(function, repeat=1, track_memory=True):
+    """
+    Wall time comes from untraced runs, since tracing slows allocation-heavy code; peak memory from one
+    extra run under tracemalloc (NumPy reports its array buffers to tracemalloc).
+
+    Parameters:
+        function (callable): Function called without arguments.
+        repeat (int): Timed runs; the fastest one is reported.
+        track_memory (bool): Whether to make the traced run.
+
+    Returns:
+        tuple: (result of the last call, seconds, peak bytes or None).
+    """
+    seconds = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak_bytes = None
+    if track_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak_bytes
+
+# Function to run every benchmark at every size
+def run_suite(sizes=DEFAULT_SIZES, seed=0, repeat=1, generations=GENERATIONS, track_memory=True,
+              transport_modes_path=TRANSPORT_MODES_PATH, progress=None):
+    """
+    Parameters:
+        sizes (iterable): Numbers of synthetic locations.
+        seed (int): Seed of the synthetic location sets.
+        repeat (int): Timed runs per benchmark.
+        generations (int): Generations of the genetic algorithm benchmarks.
+        track_memory (bool): Measure peak memory with tracemalloc.
+        transport_modes_path (str): CSV file of the transport modes used by the journey benchmarks.
+        progress (callable): Optional function called with each result as soon as it is measured.
+
+    Returns:
+        dict: Results document with "version", "created", "environment", "settings" and "results",
+              one result per benchmark and size: "benchmark", "size", "seconds", "peak_bytes",
+              and for route benchmarks "distance" and "quality" (distance / path_lower_bound).
+    """
+    transport_modes = load_transport_modes(transport_modes_path)
+    if not transport_modes:
+        raise ValueError(f"No transport modes loaded from {transport_modes_path}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # An untimed pass over a tiny set first, so lazy imports and first-call setup are not timed at the first size
+        for warm_up, size in [(True, WARM_UP_SIZE)] + [(False, size) for size in sizes]:
+            locations = synthetic_locations(size, seed)
+            csv_path = os.path.join(directory, f"locations_{size}.csv")
+            write_locations_csv(locations, csv_path)
+            path = list(locations)
+            coords = location_coordinates(locations, path)
+            distances = haversine_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+            context = {
+                "locations": locations,
+                "csv_path": csv_path,
+                "transport_modes": transport_modes,
+                "path": path,
+                "distances": distances,
+                "segments": [Segment(path[i], locations[path[i]], path[i + 1], locations[path[i + 1]], distance)
+                             for i, distance in enumerate(distances.tolist())],
+                "generations": 1 if warm_up else generations,
+            }
+            lower_bound = path_lower_bound(locations)
+
+            for name, benchmark, max_size, returns_route in BENCHMARKS:
+                if max_size is not None and size > max_size:
+                    continue
+                if warm_up:
+                    benchmark(context)
+                    continue
+                result, seconds, peak_bytes = measure(lambda: benchmark(context), repeat, track_memory)
+                row = {"benchmark": name, "size": size, "seconds": seconds, "peak_bytes": peak_bytes}
+                if returns_route:
+                    distance, route = result
+                    if sorted(route) != sorted(path):
+                        raise RuntimeError(f"{name} returned a route that does not visit every location once")
+                    row["distance"] = calculate_total_distance(route, locations)
+                    row["quality"] = row["distance"] / lower_bound if lower_bound else 1.0
+                results.append(row)
+                if progress is not None:
+                    progress(row)
+
+    return {
+        "version": BENCHMARK_VERSION,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "platform": platform.platform(), "processor": platform.processor() or platform.machine()},
+        "settings": {"sizes": list(sizes), "seed": seed, "repeat": repeat, "generations": generations,
+                     "track_memory": track_memory},
+        "results": results,
+    }
+
+# Function to find the results that got worse between two benchmark runs
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD, quality_threshold=QUALITY_THRESHOLD):
+    """
+    Parameters:
+        baseline (dict): Results document of the reference run.
+        current (dict): Results document of the new run.
+        threshold (float): Relative increase of seconds or peak_bytes flagged as a regression.
+        quality_threshold (float): Relative increase of quality (tour / lower bound) flagged as a regression.
+
+    Returns:
+        list: One dictionary per benchmark, size and metric present in both runs, with "benchmark",
+              "size", "metric", "baseline", "current", "change" (relative) and "regression" (bool).
+    """
+    reference = {(row["benchmark"], row["size"]): row for row in baseline["results"]}
+    limits = (("seconds", threshold, NOISE_FLOOR_SECONDS), ("peak_bytes", threshold, NOISE_FLOOR_BYTES),
+              ("quality", quality_threshold, 0.0))
+    comparisons = []
+    for row in current["results"]:
+        old = reference.get((row["benchmark"], row["size"]))
+        if old is None:
+            continue
+        for metric, limit, noise_floor in limits:
+            before, after = old.get(metric), row.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            comparisons.append({"benchmark": row["benchmark"], "size": row["size"], "metric": metric,
+                                "baseline": before, "current": after, "change": change,
+                                "regression": change > limit and after - before > noise_floor})
+    return comparisons
+
+# Function to print benchmark times as scaling curves, one line per benchmark
+def print_scaling(document):
+    """
+    Prints the seconds per size and the empirical exponent k of time ~ n^k between the two largest sizes.
+
+    Parameters:
+        document (dict): Results document from run_suite.
+    """
+    sizes = sorted({row["size"] for row in document["results"]})
+    times = {}
+    for row in document["results"]:
+        times.setdefault(row["benchmark"], {})[row["size"]] = row["seconds"]
+    print(f"{'Benchmark':<30}" + "".join(f"{f'n={size}':>12}" for size in sizes) + f"{'Exponent':>10}")
+    for name, by_size in times.items():
+        cells = "".join(f"{by_size[size]:>12.4f}" if size in by_size else f"{'-':>12}" for size in sizes)
+        measured = sorted(by_size)
+        exponent = ""
+        if len(measured) >= 2 and by_size[measured[-2]] > 0:
+            exponent = f"{math.log(by_size[measured[-1]] / by_size[measured[-2]]) / math.log(measured[-1] / measured[-2]):.2f}"
+        print(f"{name:<30}{cells}{exponent:>10}")
+
+# Function to read a results document
+def load_results(file_path):
+    """
+    Parameters:
+        file_path (str): JSON file written by the run command.
+
+    Returns:
+        dict: Results document.
+    """
+    with open(file_path, "r") as file:
+        document = json.load(file)
+    if document.get("version") != BENCHMARK_VERSION:
+        raise ValueError(f"{file_path} has benchmark format version {document.get('version')}, expected {BENCHMARK_VERSION}")
+    return document
+
+# Command-line entry point: "run" writes a results file, "compare" checks one against a baseline
+def run_benchmarks(argv=None):
+    """
+    Parameters:
+        argv (list): Command-line arguments (default: sys.argv[1:]).
+
+    Returns:
+        int: Exit status, 1 when compare found regressions.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark TarjanPlanner on synthetic Seoul location sets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the benchmarks and write a results file")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Numbers of locations")
+    run.add_argument("--seed", type=int, default=0, help="Seed of the synthetic location sets")
+    run.add_argument("--repeat", type=int, default=1, help="Timed runs per benchmark (fastest is kept)")
+    run.add_argument("--generations", type=int, default=GENERATIONS, help="Genetic algorithm generations")
+    run.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak memory runs")
+    run.add_argument("-o", "--output", default=BASELINE_PATH, help=f"Results file (default {BASELINE_PATH})")
+    compare = commands.add_parser("compare", help="Flag regressions of a results file against a baseline")
+    compare.add_argument("baseline", help="Reference results file")
+    compare.add_argument("current", help="New results file")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                         help=f"Relative time / memory increase flagged (default {REGRESSION_THRESHOLD})")
+    compare.add_argument("--quality-threshold", type=float, default=QUALITY_THRESHOLD,
+                         help=f"Relative tour quality loss flagged (default {QUALITY_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        def progress(row):
+            memory = "-" if row["peak_bytes"] is None else f"{row['peak_bytes'] / 1e6:.1f} MB"
+            quality = f"  quality {row['quality']:.3f}" if "quality" in row else ""
+            print(f"{row['benchmark']:<30}n={row['size']:<8}{row['seconds']:>10.4f} s  {memory:>10}{quality}")
+
+        document = run_suite(args.sizes, args.seed, args.repeat, args.generations, not args.no_memory,
+                             progress=progress)
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=2)
+        print()
+        print_scaling(document)
+        print(f"\nResults written to {args.output}")
+        return 0
+
+    comparisons = compare_results(load_results(args.baseline), load_results(args.current), args.threshold,
+                                  args.quality_threshold)
+    regressions = [row for row in comparisons if row["regression"]]
+    print(f"{'Benchmark':<30}{'Size':>8}{'Metric':>12}{'Baseline':>14}{'Current':>14}{'Change':>9}")
+    for row in comparisons:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<30}{row['size']:>8}{row['metric']:>12}{row['baseline']:>14.6g}"
+              f"{row['current']:>14.6g}{row['change']:>+9.1%}{flag}")
+    print(f"\n{len(regressions)} regression(s) out of {len(comparisons)} comparisons")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(run_benchmarks())
@@ -1,5 +1,8 @@
-from shortest_path_calculation import calculate_total_distance, haversine, Segment
-from compare_transport_modes import compare_transport_modes
+import numpy as np
+from shortest_path_calculation import calculate_total_distance, haversine, haversine_array, location_coordinates
+from compare_transport_modes import compare_transport_modes_batch, get_transport_mode_index
+
+CRITERIA = ("Minimum Cost", "Minimum Time", "Both Cost and Time")
 
 def calculate_journey(locations, transport_modes, journey_path):
     """
@@ -22,6 +25,8 @@ def calculate_journey(locations, transport_modes, journey_path):
     """
     results = []  # List to store detailed results for each segment
     total_distance = calculate_total_distance(journey_path, locations)  # Calculate total journey distance
+    # Breakpoint index of the mode set, so each segment is a bisect instead of a scan over every mode
+    mode_index = get_transport_mode_index(transport_modes, use_custom_logic=True)
 
     # Iterate through the journey path to process each segment
     for i in range(len(journey_path) - 1):
@@ -33,11 +38,8 @@ def calculate_journey(locations, transport_modes, journey_path):
         # Calculate the distance between the two locations using the haversine formula
         distance = haversine(start_coords[0], start_coords[1], end_coords[0], end_coords[1])
 
-        # Create a Segment object to represent the journey between the two locations
-        segment = Segment(start_name, start_coords, end_name, end_coords, distance=distance)
-
         # Compare transport modes for the segment, using custom logic for optimization
-        segment_results = compare_transport_modes(segment, transport_modes, use_custom_logic=True)
+        segment_results = mode_index.best(distance)
 
         # Append the segment results to the results list
         results.append({
@@ -49,3 +51,101 @@ def calculate_journey(locations, transport_modes, journey_path):
         })
 
     return results, total_distance  # Return the segment-wise results and total distance
+
+def calculate_journey_batch(locations, transport_modes, journey_path, as_records=False):
+    """
+    Vectorized calculate_journey: computes all segment distances as one array and evaluates the
+    segments x modes cost and time matrices in one pass, with the same custom rules.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+        transport_modes (list): List of available TransportMode objects.
+        journey_path (list): List of location names in the order of travel.
+        as_records (bool): Return the list-of-dicts view produced by calculate_journey instead of columns.
+
+    Returns:
+        columns (dict): Columnar results with one entry per segment:
+                        - "Start", "End": Arrays of location names.
+                        - "Distance": Array of segment distances in kilometers.
+                        - "Minimum Cost", "Minimum Time", "Both Cost and Time": Dictionaries of
+                          "Mode", "Cost" and "Time" arrays.
+                        (A list of dictionaries like calculate_journey when as_records is True.)
+        total_distance (float): The total distance for the entire journey in kilometers.
+    """
+    coords = location_coordinates(locations, journey_path)
+    distances = haversine_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    columns = {
+        "Start": np.array(journey_path[:-1], dtype=object),
+        "End": np.array(journey_path[1:], dtype=object),
+        "Distance": distances,
+    }
+    columns.update(compare_transport_modes_batch(distances, transport_modes, use_custom_logic=True))
+    total_distance = float(distances.sum())
+
+    if as_records:
+        return journey_records(columns), total_distance
+    return columns, total_distance
+
+def journey_records(columns):
+    """
+    Converts columnar journey results from calculate_journey_batch into the list-of-dicts format
+    returned by calculate_journey.
+
+    Parameters:
+        columns (dict): Columnar results from calculate_journey_batch.
+
+    Returns:
+        list: One dictionary per segment with "Segment", the three criteria and "Distance".
+    """
+    records = []
+    for i in range(len(columns["Distance"])):
+        record = {"Segment": f"{columns['Start'][i]} -> {columns['End'][i]}"}
+        for criterion in CRITERIA:
+            best = columns[criterion]
+            record[criterion] = {"Mode": best["Mode"][i], "Cost": float(best["Cost"][i]), "Time": float(best["Time"][i])}
+        record["Distance"] = float(columns["Distance"][i])
+        records.append(record)
+    return records
+
+def update_journey(locations, transport_modes, journey_path, previous_results, changed_legs=None):
+    """
+    Updates calculate_journey results after the route changed (e.g. with route_repair.repair_route),
+    re-evaluating only the segments that are new and reusing the others.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude).
+        transport_modes (list): List of available TransportMode objects.
+        journey_path (list): New list of location names in the order of travel.
+        previous_results (list): Segment results of the old route from calculate_journey.
+        changed_legs (list): Indices of the legs of journey_path to re-evaluate, as returned by
+                             repair_route. When omitted, every segment missing from previous_results is.
+
+    Returns:
+        results (list): Segment-wise journey details, as returned by calculate_journey.
+        total_distance (float): The total distance for the entire journey in kilometers.
+    """
+    previous = {record["Segment"]: record for record in previous_results}
+    changed = None if changed_legs is None else set(changed_legs)
+    mode_index = get_transport_mode_index(transport_modes, use_custom_logic=True)
+    results = []
+    for i in range(len(journey_path) - 1):
+        segment = f"{journey_path[i]} -> {journey_path[i + 1]}"
+        if (changed is None or i not in changed) and segment in previous:
+            results.append(previous[segment])  # Unchanged leg: same distance and same best modes
+            continue
+        start_coords = locations[journey_path[i]]
+        end_coords = locations[journey_path[i + 1]]
+        distance = haversine(start_coords[0], start_coords[1], end_coords[0], end_coords[1])
+        best = mode_index.best(distance)
+        results.append({
+            "Segment": segment,
+            "Minimum Cost": best["Minimum Cost"],
+            "Minimum Time": best["Minimum Time"],
+            "Both Cost and Time": best["Both Cost and Time"],
+            "Distance": distance
+        })
+    # Summed leg by leg in route order, so the total matches calculate_total_distance
+    total_distance = 0
+    for record in results:
+        total_distance += record["Distance"]
+    return results, total_distance
@@ -0,0 +1,205 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from shortest_path_calculation import (EARTH_RADIUS_KM, haversine_array, location_coordinates, local_search,
+                                       nearest_neighbor_tour)
+from route_repair import REPAIR_WINDOW, improve_around
+from exceptions_and_decorators import execution_time_decorator
+
+CLUSTER_SIZE = 500  # Target number of locations per cluster; each cluster solve builds a CLUSTER_SIZE^2 matrix
+KMEANS_ITERATIONS = 25  # Maximum Lloyd iterations of the k-means partition
+KMEANS_BLOCK_ROWS = 8192  # Points assigned per vectorized k-means step to bound temporary arrays
+PARTITION_METHODS = ("kmeans", "grid")
+
+# Function to project latitudes and longitudes onto a local plane in kilometers
+def _project(coords):
+    """
+    Equirectangular projection centred on the mean latitude, accurate enough to group city locations.
+    :param coords: (n, 2) latitude/longitude array.
+    :return: (n, 2) array of x/y kilometers.
+    """
+    cos_reference = math.cos(math.radians(float(coords[:, 0].mean())))
+    return np.radians(coords[:, ::-1]) * EARTH_RADIUS_KM * np.array([cos_reference, 1.0])
+
+# Function to split locations into geographic clusters
+def partition_locations(coords, cluster_count, method="kmeans", seed=42):
+    """
+    Assign every location to a cluster, either with k-means (Lloyd's algorithm on projected
+    coordinates, seeded from random locations) or with a balanced grid: equal-count latitude bands,
+    each cut into equal-count longitude cells.
+    :param coords: (n, 2) latitude/longitude array.
+    :param cluster_count: Number of clusters wanted; empty clusters are dropped.
+    :param method: "kmeans" or "grid".
+    :param seed: Seed of the k-means initialisation.
+    :return: NumPy int64 array with the cluster number (0 .. clusters - 1) of every location.
+    """
+    if method not in PARTITION_METHODS:
+        raise ValueError(f"Unknown partition method {method}; expected one of {PARTITION_METHODS}")
+    size = len(coords)
+    cluster_count = max(1, min(cluster_count, size))
+    points = _project(coords)
+
+    if method == "grid":
+        rows = max(1, round(math.sqrt(cluster_count)))
+        columns = max(1, math.ceil(cluster_count / rows))
+        labels = np.empty(size, dtype=np.int64)
+        by_latitude = np.argsort(points[:, 1], kind="stable")
+        for row, band in enumerate(np.array_split(by_latitude, rows)):
+            by_longitude = band[np.argsort(points[band, 0], kind="stable")]
+            for column, cell in enumerate(np.array_split(by_longitude, columns)):
+                labels[cell] = row * columns + column
+    else:
+        rng = np.random.default_rng(seed)
+        centroids = points[rng.choice(size, cluster_count, replace=False)]
+        labels = np.full(size, -1, dtype=np.int64)
+        for _ in range(KMEANS_ITERATIONS):
+            new_labels = np.empty(size, dtype=np.int64)
+            for start in range(0, size, KMEANS_BLOCK_ROWS):
+                block = points[start:start + KMEANS_BLOCK_ROWS]
+                squared = ((block[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+                new_labels[start:start + KMEANS_BLOCK_ROWS] = squared.argmin(axis=1)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            counts = np.bincount(labels, minlength=cluster_count)
+            filled = counts > 0  # An empty cluster keeps its centroid
+            for axis in range(2):
+                sums = np.bincount(labels, weights=points[:, axis], minlength=cluster_count)
+                centroids[filled, axis] = sums[filled] / counts[filled]
+
+    # Renumber the non-empty clusters consecutively
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels.astype(np.int64)
+
+# Function to solve the open path through one cluster from its entry to its exit, run in a worker process
+def _solve_cluster(task):
+    """
+    Nearest-neighbour construction from the entry followed by 2-opt / Or-opt local search. The exit is
+    kept last by adding a penalty larger than any real path to all of its edges: a path pays it once
+    with the exit at the end and twice with the exit anywhere else.
+    :param task: Tuple (coords, entry, exit) of the cluster's latitude/longitude array and the local
+                 indices of its first and last location (exit None for a free end).
+    :return: NumPy int32 array with the cluster's local indices in path order.
+    """
+    coords, entry, exit_ = task
+    if len(coords) == 1:
+        return np.zeros(1, dtype=np.int32)
+    distance_matrix = haversine_array(coords[:, None, 0], coords[:, None, 1], coords[None, :, 0], coords[None, :, 1])
+    if exit_ is not None:
+        penalty = (float(distance_matrix.max()) + 1.0) * len(coords)
+        distance_matrix[exit_, :] += penalty
+        distance_matrix[:, exit_] += penalty
+        distance_matrix[exit_, exit_] = 0.0
+    tour = nearest_neighbor_tour(distance_matrix, entry)  # The penalized exit is the last location reached
+    local_search(tour, distance_matrix, fixed_start=True)
+    return tour
+
+# Function to order the clusters with a coarse route over their centroids
+def _cluster_order(coords, labels, start_cluster):
+    """
+    :param coords: (n, 2) latitude/longitude array.
+    :param labels: Cluster number of every location.
+    :param start_cluster: Cluster the route starts in.
+    :return: List of cluster numbers in route order, starting with start_cluster.
+    """
+    cluster_count = int(labels.max()) + 1
+    counts = np.bincount(labels, minlength=cluster_count)
+    centroids = np.stack([np.bincount(labels, weights=coords[:, axis], minlength=cluster_count) / counts
+                          for axis in range(2)], axis=1)
+    distance_matrix = haversine_array(centroids[:, None, 0], centroids[:, None, 1],
+                                      centroids[None, :, 0], centroids[None, :, 1])
+    tour = nearest_neighbor_tour(distance_matrix, start_cluster)
+    local_search(tour, distance_matrix, fixed_start=True)
+    return tour.tolist()
+
+# Function to choose where the route enters and leaves every cluster
+def _cluster_gates(coords, members, order, start_id):
+    """
+    The route leaves a cluster at the location closest to any location of the next cluster, which
+    becomes the next cluster's entry. An exit is never its cluster's entry unless the cluster has a
+    single location.
+    :param coords: (n, 2) latitude/longitude array.
+    :param members: Location ids of every cluster.
+    :param order: Cluster numbers in route order.
+    :param start_id: Location id the route starts from.
+    :return: List of (entry, exit) location ids per cluster in route order; the last exit is None.
+    """
+    gates = []
+    entry = start_id
+    for position, cluster in enumerate(order):
+        if position == len(order) - 1:
+            gates.append((entry, None))
+            break
+        here = members[cluster]
+        if len(here) > 1:
+            here = here[here != entry]
+        following = members[order[position + 1]]
+        distances = haversine_array(coords[here, None, 0], coords[here, None, 1],
+                                    coords[None, following, 0], coords[None, following, 1])
+        row, column = np.unravel_index(np.argmin(distances), distances.shape)
+        gates.append((entry, int(here[row])))
+        entry = int(following[column])
+    return gates
+
+# Decorated function solving very large routes by clustering, solving clusters in parallel and stitching them
+@execution_time_decorator
+def cluster_solve_route(locations, start="Tarjan", cluster_size=CLUSTER_SIZE, method="kmeans", workers=None,
+                        seed=42, stitch_window=REPAIR_WINDOW):
+    """
+    Hierarchical solver for tens of thousands of locations, where one genetic algorithm permutation
+    cannot converge and an n x n distance matrix does not fit in memory:
+      1. partition the locations geographically (k-means or grid),
+      2. order the clusters with a coarse route over their centroids and pick each cluster's entry and
+         exit at the closest pair of locations between consecutive clusters,
+      3. solve every cluster's entry-to-exit path independently on a process pool,
+      4. concatenate the paths and repair the seams with a windowed 2-opt / Or-opt pass.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+        start (str): Name of the location the route starts from, or None to start anywhere.
+        cluster_size (int): Target number of locations per cluster.
+        method (str): "kmeans" or "grid" partitioning.
+        workers (int): Worker processes (default: one per CPU; 1 solves in this process).
+        seed (int): Seed of the k-means initialisation.
+        stitch_window (int): Positions on each side of a seam that the repair pass may rearrange.
+
+    Returns:
+        tuple: Total distance in kilometers and the path as a list of location names, as returned by
+               genetic_algorithm.
+    """
+    names = list(locations.keys())
+    if start is not None and start not in locations:
+        raise ValueError(f"Start location {start} is not in the locations")
+    if not names:
+        return 0.0, []
+    coords = np.array(location_coordinates(locations), dtype=np.float64)
+    start_id = names.index(start) if start is not None else 0
+
+    labels = partition_locations(coords, math.ceil(len(names) / cluster_size), method, seed)
+    members = [np.flatnonzero(labels == cluster) for cluster in range(int(labels.max()) + 1)]
+    order = _cluster_order(coords, labels, int(labels[start_id]))
+    gates = _cluster_gates(coords, members, order, start_id)
+
+    # Each task only carries its cluster's coordinates, with entry and exit as local indices
+    tasks = []
+    for cluster, (entry, exit_) in zip(order, gates):
+        ids = members[cluster]
+        local = {location_id: index for index, location_id in enumerate(ids.tolist())}
+        tasks.append((coords[ids], local[entry], None if exit_ is None else local[exit_]))
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            tours = list(executor.map(_solve_cluster, tasks))
+    else:
+        tours = [_solve_cluster(task) for task in tasks]
+
+    # Concatenate the cluster paths, then repair around every seam
+    path = np.concatenate([members[cluster][tour] for cluster, tour in zip(order, tours)]).tolist()
+    seams = np.cumsum([len(tour) for tour in tours])[:-1].tolist()
+    path_coords = coords[path]
+    improve_around(path, path_coords, seams, stitch_window, fixed_start=start is not None)
+
+    distance = float(haversine_array(path_coords[:-1, 0], path_coords[:-1, 1],
+                                     path_coords[1:, 0], path_coords[1:, 1]).sum())
+    return distance, [names[location_id] for location_id in path]
@@ -1,4 +1,7 @@
 import math
+from bisect import bisect_left
+from collections import OrderedDict
+import numpy as np
 
 def compare_transport_modes(segment, transport_modes, use_custom_logic=False):
     """
@@ -69,3 +72,238 @@ def compare_transport_modes(segment, transport_modes, use_custom_logic=False):
         "Minimum Time": best_time,
         "Both Cost and Time": best_cost_time
     }
+
+# Options chosen by the custom rules, numbered after the real transport modes (len(transport_modes) + offset)
+FORCED_WALKING = 0  # Walking forced as the Minimum Time baseline under 1 km
+CUSTOM_BICYCLE = 1  # Custom "Both Cost and Time" choice up to 5 km
+CUSTOM_BUS = 2  # Custom "Both Cost and Time" choice above 5 km
+NO_MODE = 3  # No eligible transport mode
+
+def _mode_choices(distances, transport_modes, use_custom_logic):
+    """
+    Chooses the option of every segment for each criterion with the rules of compare_transport_modes.
+
+    Parameters:
+        distances (ndarray): Segment distances in kilometers.
+        transport_modes (list): List of available TransportMode objects.
+        use_custom_logic (bool): Whether to use custom logic for both cost and time criteria.
+
+    Returns:
+        dict: Criterion -> int array of options; values below len(transport_modes) are mode positions,
+              the others are len(transport_modes) + FORCED_WALKING / CUSTOM_BICYCLE / CUSTOM_BUS / NO_MODE.
+    """
+    count = len(transport_modes)
+    speeds = np.array([mode.speed_kmh for mode in transport_modes], dtype=np.float64)
+    costs_per_km = np.array([mode.cost_per_km for mode in transport_modes], dtype=np.float64)
+    transfer_hours = np.array([mode.transfer_time_min / 60 for mode in transport_modes], dtype=np.float64)
+
+    # Segments x modes matrices of cost and total time (travel time + transfer time)
+    cost = costs_per_km[None, :] * distances[:, None]
+    total_time = distances[:, None] / speeds[None, :] + transfer_hours[None, :]
+
+    # Walking is skipped for segments under 1 km, where it is forced as the Minimum Time baseline
+    is_walking = np.array([mode.name == "Walking" for mode in transport_modes], dtype=bool)
+    short = distances < 1
+    eligible = ~(short[:, None] & is_walking[None, :])
+
+    # Pick the first mode with the smallest key per segment, like the strict "<" in the scalar loop
+    def pick(key, allowed):
+        key = np.concatenate([np.where(allowed, key, np.inf), np.full((len(distances), 1), np.inf)], axis=1)
+        choice = np.argmin(key, axis=1)
+        return np.where(np.isfinite(key[np.arange(len(distances)), choice]), choice, count + NO_MODE)
+
+    choices = {"Minimum Cost": pick(cost, eligible)}
+
+    # Minimum Time: a forced Walking entry resets the best, so only modes listed after the last
+    # Walking mode can still beat it on short segments
+    walking_positions = np.flatnonzero(is_walking)
+    forced_walking = short & (len(walking_positions) > 0)
+    time_allowed = eligible.copy()
+    if len(walking_positions):
+        time_allowed[forced_walking, :walking_positions[-1] + 1] = False
+    best_time = pick(total_time, time_allowed)
+    chosen_time = np.full(len(distances), np.nan)
+    found = best_time < count
+    chosen_time[found] = total_time[np.flatnonzero(found), best_time[found]]
+    walking_wins = forced_walking & ~(chosen_time < distances / 5)  # NaN (no other mode) also loses
+    choices["Minimum Time"] = np.where(walking_wins, count + FORCED_WALKING, best_time)
+
+    if use_custom_logic:
+        # Bicycle for short distances (<= 5 km), Bus with fixed cost and time calculations otherwise
+        choices["Both Cost and Time"] = np.where(distances <= 5, count + CUSTOM_BICYCLE, count + CUSTOM_BUS)
+    else:
+        choices["Both Cost and Time"] = pick(cost + total_time, eligible)
+    return choices
+
+def _option_result(option, distance, transport_modes):
+    """
+    Computes the result dictionary of one chosen option, with the arithmetic of compare_transport_modes.
+
+    Parameters:
+        option (int): Option from _mode_choices.
+        distance (float): Segment distance in kilometers.
+        transport_modes (list): The transport modes the option refers to.
+
+    Returns:
+        dict: {"Mode", "Cost", "Time"}, or None when no mode was eligible.
+    """
+    count = len(transport_modes)
+    if option < count:
+        mode = transport_modes[option]
+        return {"Mode": mode.name, "Cost": mode.cost_per_km * distance,
+                "Time": distance / mode.speed_kmh + (mode.transfer_time_min / 60)}
+    if option == count + FORCED_WALKING:
+        return {"Mode": "Walking", "Cost": 0.0, "Time": distance / 5}
+    if option == count + CUSTOM_BICYCLE:
+        return {"Mode": "Bicycle", "Cost": 0.0, "Time": distance / 15 + (1 / 60)}
+    if option == count + CUSTOM_BUS:
+        return {"Mode": "Bus", "Cost": distance * 2, "Time": distance / 40 + (5 / 60)}
+    return None
+
+def compare_transport_modes_batch(distances, transport_modes, use_custom_logic=False):
+    """
+    Vectorized compare_transport_modes: evaluates every segment against every transport mode at once,
+    applying the same rules (walking under 1 km, custom Bicycle/Bus choice for both cost and time).
+
+    Parameters:
+        distances (array-like): Segment distances in kilometers.
+        transport_modes (list): List of available TransportMode objects.
+        use_custom_logic (bool): Whether to use custom logic for both cost and time criteria.
+
+    Returns:
+        dict: For each of "Minimum Cost", "Minimum Time" and "Both Cost and Time", a dictionary of
+              arrays {"Mode": names, "Cost": costs, "Time": times} with one entry per segment.
+              Segments without any eligible mode get Mode None and NaN cost and time.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    count = len(transport_modes)
+    names = np.array([mode.name for mode in transport_modes] + ["Walking", "Bicycle", "Bus", None], dtype=object)
+    speeds = np.array([mode.speed_kmh for mode in transport_modes] + [5, 15, 40, 1], dtype=np.float64)
+    costs_per_km = np.array([mode.cost_per_km for mode in transport_modes] + [0, 0, 2, 0], dtype=np.float64)
+    transfer_hours = np.array([mode.transfer_time_min / 60 for mode in transport_modes] + [0, 1 / 60, 5 / 60, 0],
+                              dtype=np.float64)
+
+    results = {}
+    for criterion, option in _mode_choices(distances, transport_modes, use_custom_logic).items():
+        missing = option == count + NO_MODE
+        results[criterion] = {
+            "Mode": names[option],
+            "Cost": np.where(missing, np.nan, costs_per_km[option] * distances),
+            "Time": np.where(missing, np.nan, distances / speeds[option] + transfer_hours[option]),
+        }
+    return results
+
+BREAKPOINT_TOLERANCE = 1e-9  # Relative distance to a breakpoint within which rounding could flip the winner
+TRANSPORT_MODE_INDEX_CACHE_SIZE = 8  # Mode sets whose indexes are kept by get_transport_mode_index
+
+# Function to fingerprint a mode set, so an index is rebuilt whenever a mode is added, removed or edited
+def transport_modes_fingerprint(transport_modes, use_custom_logic=False):
+    """
+    Parameters:
+        transport_modes (list): List of TransportMode objects.
+        use_custom_logic (bool): Whether custom logic is used for both cost and time criteria.
+
+    Returns:
+        tuple: Hashable snapshot of every parameter that affects the best-mode choice.
+    """
+    return (bool(use_custom_logic),) + tuple(
+        (mode.name, mode.speed_kmh, mode.cost_per_km, mode.transfer_time_min) for mode in transport_modes)
+
+# Class answering compare_transport_modes queries by bisecting precomputed distance breakpoints
+class TransportModeIndex:
+    def __init__(self, transport_modes, use_custom_logic=False):
+        """
+        Precompute, for each criterion, the winning option between consecutive distance breakpoints.
+        Cost, time and cost + time are linear in distance for every mode, so the winner can only change
+        where two of these lines cross or at the 1 km walking and 5 km bicycle thresholds.
+
+        Parameters:
+            transport_modes (list): List of available TransportMode objects.
+            use_custom_logic (bool): Whether to use custom logic for both cost and time criteria.
+        """
+        self.transport_modes = list(transport_modes)
+        self.use_custom_logic = use_custom_logic
+        self.fingerprint = transport_modes_fingerprint(self.transport_modes, use_custom_logic)
+
+        # (slope, offset) of every mode's key as a function of distance, per criterion
+        costs_per_km = [mode.cost_per_km for mode in self.transport_modes]
+        hours_per_km = [1 / mode.speed_kmh for mode in self.transport_modes]
+        transfer_hours = [mode.transfer_time_min / 60 for mode in self.transport_modes]
+        lines = [
+            [(cost, 0.0) for cost in costs_per_km],
+            [(hours, transfer) for hours, transfer in zip(hours_per_km, transfer_hours)] + [(1 / 5, 0.0)],
+            [(cost + hours, transfer) for cost, hours, transfer in zip(costs_per_km, hours_per_km, transfer_hours)],
+        ]
+        points = {0.0, 1.0, 5.0}  # Thresholds of the custom walking and bicycle rules
+        for criterion_lines in lines:
+            for i, (slope_i, offset_i) in enumerate(criterion_lines):
+                for slope_j, offset_j in criterion_lines[i + 1:]:
+                    if slope_i != slope_j:
+                        crossing = (offset_j - offset_i) / (slope_i - slope_j)
+                        if np.isfinite(crossing):
+                            points.add(float(crossing))
+        self.breakpoints = sorted(points)
+
+        # Region 2i is the open interval before breakpoint i (2k: after the last one), region 2i + 1
+        # is breakpoint i itself; the winner is constant inside each region
+        breakpoints = np.array(self.breakpoints)
+        samples = np.empty(2 * len(breakpoints) + 1)
+        samples[1::2] = breakpoints
+        samples[2:-1:2] = (breakpoints[:-1] + breakpoints[1:]) / 2
+        samples[0] = breakpoints[0] - 1
+        samples[-1] = breakpoints[-1] * 2 + 1
+        self._winners = {criterion: option.tolist() for criterion, option in
+                         _mode_choices(samples, self.transport_modes, use_custom_logic).items()}
+
+    # Winning option of every criterion at one distance
+    def _options(self, distance):
+        position = bisect_left(self.breakpoints, distance)
+        if position < len(self.breakpoints) and self.breakpoints[position] == distance:
+            region = 2 * position + 1
+        else:
+            # Computed crossings can be off by a rounding error: settle near-ties with a direct scan
+            tolerance = BREAKPOINT_TOLERANCE * max(1.0, abs(distance))
+            neighbours = self.breakpoints[max(position - 1, 0):position + 1]
+            if any(abs(distance - point) <= tolerance for point in neighbours):
+                choices = _mode_choices(np.array([distance], dtype=np.float64), self.transport_modes,
+                                        self.use_custom_logic)
+                return {criterion: int(option[0]) for criterion, option in choices.items()}
+            region = 2 * position
+        return {criterion: winners[region] for criterion, winners in self._winners.items()}
+
+    def best(self, distance):
+        """
+        Find the best transport modes for a segment length in O(log m) for m modes.
+
+        Parameters:
+            distance (float): Segment distance in kilometers.
+
+        Returns:
+            dict: Same result as compare_transport_modes for a segment of this distance.
+        """
+        return {criterion: _option_result(option, distance, self.transport_modes)
+                for criterion, option in self._options(distance).items()}
+
+# Indexes of recently used mode sets, keyed by fingerprint, least recently used first
+_transport_mode_indexes = OrderedDict()
+
+# Function to get the breakpoint index of a mode set, building it on first use or after any change
+def get_transport_mode_index(transport_modes, use_custom_logic=False):
+    """
+    Parameters:
+        transport_modes (list): List of available TransportMode objects.
+        use_custom_logic (bool): Whether to use custom logic for both cost and time criteria.
+
+    Returns:
+        TransportModeIndex: Index matching the current parameters of transport_modes.
+    """
+    fingerprint = transport_modes_fingerprint(transport_modes, use_custom_logic)
+    index = _transport_mode_indexes.get(fingerprint)
+    if index is None:
+        index = TransportModeIndex(transport_modes, use_custom_logic)
+        _transport_mode_indexes[fingerprint] = index
+        if len(_transport_mode_indexes) > TRANSPORT_MODE_INDEX_CACHE_SIZE:
+            _transport_mode_indexes.popitem(last=False)
+    else:
+        _transport_mode_indexes.move_to_end(fingerprint)
+    return index
@@ -0,0 +1,30 @@
+import importlib
+
+# Colorama module, imported and initialized on first use so that importing the planner stays cheap
+_colorama = None
+
+# Function to import and initialize colorama the first time a color is printed
+def _load_colorama():
+    """
+    Returns:
+        module: The colorama module, initialized to reset colors after every print.
+    """
+    global _colorama
+    if _colorama is None:
+        _colorama = importlib.import_module("colorama")
+        _colorama.init(autoreset=True)  # Initialize colorama for colored console output
+    return _colorama
+
+# Class standing in for colorama.Fore / colorama.Style until a color is actually used
+class _LazyColors:
+    def __init__(self, group):
+        """
+        :param group: Name of the colorama attribute to forward to ("Fore" or "Style").
+        """
+        self._group = group
+
+    def __getattr__(self, name):
+        return getattr(getattr(_load_colorama(), self._group), name)
+
+Fore = _LazyColors("Fore")
+Style = _LazyColors("Style")
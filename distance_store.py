@@ -0,0 +1,189 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+from shortest_path_calculation import DISTANCE_MATRIX_BLOCK_ROWS, haversine_array, location_coordinates
+
+DISTANCE_STORE_DIRECTORY = os.path.join(".planner_cache", "distance_matrices")  # Default store location
+INCREMENTAL_CANDIDATES = 8  # Stored matrices checked as a base for an incremental rebuild
+DISTANCE_STORE_MAX_BYTES = 1 << 30  # Store size above which least recently used matrices are deleted
+DISTANCE_STORE_MIN_LOCATIONS = 500  # Smaller sets are computed in memory by build_distance_matrix (a few ms)
+FILE_MODE = 0o644  # Stored files are readable by workers running as other users
+
+# Class keeping distance matrices on disk, content-addressed by the location coordinates
+class DistanceMatrixStore:
+    def __init__(self, directory=DISTANCE_STORE_DIRECTORY, dtype=np.float64, max_bytes=DISTANCE_STORE_MAX_BYTES,
+                 min_locations=DISTANCE_STORE_MIN_LOCATIONS):
+        """
+        Each matrix is an .npy file named after a hash of the coordinates (in order) and the dtype.
+        Loading memory-maps it read-only, so every process using the same catalogue shares one copy
+        through the page cache instead of allocating and filling its own n x n matrix. Files are
+        written to a temporary name and renamed, so concurrent builders never expose partial files.
+        Every load marks its matrix as recently used; after a build, the least recently used
+        matrices are deleted until the store fits in max_bytes.
+        :param directory: Folder holding the matrices.
+        :param dtype: np.float64, or np.float32 to halve the footprint (distances keep about 7
+                      significant digits, i.e. sub-meter precision at city scale).
+        :param max_bytes: Total size of the stored files above which eviction starts.
+        :param min_locations: Smallest location set build_distance_matrix loads from the store.
+        """
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError("dtype must be float64 or float32")
+        self.max_bytes = max_bytes
+        self.min_locations = min_locations
+        self.hits = 0  # Matrices mapped from disk
+        self.builds = 0  # Matrices computed from scratch
+        self.incremental_builds = 0  # Matrices extended from a stored matrix of a subset of the locations
+        self.evictions = 0  # Matrices deleted to stay within max_bytes
+
+    # Hash of the coordinates and the storage type
+    def key(self, coordinates):
+        digest = hashlib.blake2b(np.ascontiguousarray(coordinates, dtype=np.float64).tobytes(), digest_size=16)
+        digest.update(self.dtype.str.encode())
+        return digest.hexdigest()
+
+    # Path of a stored file: <key>-<count>-<dtype><suffix>
+    def _path(self, key, count, suffix):
+        return os.path.join(self.directory, f"{key}-{count}-{self.dtype.name}{suffix}")
+
+    def load(self, locations):
+        """
+        Map the distance matrix of a location set, computing and storing it first if needed.
+        :param locations: Dictionary of location names and their coordinates, or a LocationTable.
+        :return: Tuple (location_names, distance_matrix) like build_distance_matrix, with the matrix a
+                 read-only memory map of self.dtype.
+        """
+        names = list(locations.keys())
+        coordinates = np.ascontiguousarray(location_coordinates(locations), dtype=np.float64)
+        key = self.key(coordinates)
+        matrix_path = self._path(key, len(names), ".npy")
+        if not os.path.exists(matrix_path):
+            self._build(coordinates, key)
+            matrix = np.load(matrix_path, mmap_mode="r")
+            self._evict(keep=matrix_path)
+            return names, matrix
+        self.hits += 1
+        self._touch(matrix_path)
+        return names, np.load(matrix_path, mmap_mode="r")
+
+    # Mark a stored matrix as recently used; it may have been evicted by another process meanwhile
+    @staticmethod
+    def _touch(matrix_path):
+        try:
+            os.utime(matrix_path)
+        except OSError:
+            pass
+
+    # Compute a matrix, reusing the largest stored matrix whose locations are all among the new ones
+    def _build(self, coordinates, key):
+        os.makedirs(self.directory, exist_ok=True)
+        count = len(coordinates)
+        handle, temporary_path = tempfile.mkstemp(suffix=".npy", dir=self.directory)
+        os.close(handle)
+        try:
+            matrix = np.lib.format.open_memmap(temporary_path, mode="w+", dtype=self.dtype, shape=(count, count))
+            base = self._find_base(coordinates)
+            if base is None:
+                missing = np.arange(count)
+                self.builds += 1
+            else:
+                # Copy the known distances into their new positions, then fill only the new rows and columns
+                old_ids, old_matrix = base
+                if np.array_equal(old_ids, np.arange(len(old_ids))):
+                    matrix[:len(old_ids), :len(old_ids)] = old_matrix  # Appended locations: one block copy
+                else:
+                    matrix[np.ix_(old_ids, old_ids)] = old_matrix
+                known = np.zeros(count, dtype=bool)
+                known[old_ids] = True
+                missing = np.flatnonzero(~known)
+                self.incremental_builds += 1
+            latitudes, longitudes = coordinates[:, 0], coordinates[:, 1]
+            for start in range(0, len(missing), DISTANCE_MATRIX_BLOCK_ROWS):
+                rows = missing[start:start + DISTANCE_MATRIX_BLOCK_ROWS]
+                distances = haversine_array(latitudes[rows, None], longitudes[rows, None],
+                                            latitudes[None, :], longitudes[None, :])
+                matrix[rows] = distances
+                matrix[:, rows] = distances.T
+            matrix.flush()
+            del matrix
+            os.chmod(temporary_path, FILE_MODE)  # mkstemp creates files readable by their owner only
+
+            # Coordinates first: the matrix file's appearance marks the entry as complete
+            self._write_coordinates(coordinates, self._path(key, count, ".coords.npy"))
+            os.replace(temporary_path, self._path(key, count, ".npy"))
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    # Write the coordinates file through a temporary file of this writer, so concurrent builders never collide
+    def _write_coordinates(self, coordinates, coordinates_path):
+        if os.path.exists(coordinates_path) and np.array_equal(np.load(coordinates_path), coordinates):
+            return  # Already written by another builder of the same catalogue
+        handle, temporary_path = tempfile.mkstemp(suffix=".npy", dir=self.directory)
+        try:
+            with os.fdopen(handle, "wb") as file:
+                np.save(file, coordinates)
+            os.chmod(temporary_path, FILE_MODE)
+            os.replace(temporary_path, coordinates_path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    # Stored entries of every dtype as (key, count, dtype name) tuples, from the coordinates file names
+    def _entries(self):
+        entries = []
+        for file_name in os.listdir(self.directory):
+            parts = file_name[:-len(".coords.npy")].split("-") if file_name.endswith(".coords.npy") else None
+            if parts and len(parts) == 3 and parts[1].isdigit():
+                entries.append((parts[0], int(parts[1]), parts[2]))
+        return entries
+
+    # Delete the least recently used matrices until the store fits in max_bytes
+    def _evict(self, keep):
+        sizes = []
+        for key, count, dtype_name in self._entries():
+            paths = [os.path.join(self.directory, f"{key}-{count}-{dtype_name}{suffix}")
+                     for suffix in (".npy", ".coords.npy")]
+            try:
+                stats = [os.stat(path) for path in paths]
+            except OSError:
+                continue  # Being written or deleted by another process
+            sizes.append((stats[0].st_mtime, sum(stat.st_size for stat in stats), paths))
+        excess = sum(size for _, size, _ in sizes) - self.max_bytes
+        for _, size, paths in sorted(sizes, key=lambda entry: entry[0]):
+            if excess <= 0:
+                break
+            if paths[0] == keep:
+                continue
+            try:
+                for path in paths:  # Matrix first: without it the entry no longer counts as complete
+                    os.remove(path)
+            except OSError:
+                continue  # Already deleted, or still open on a platform that forbids it
+            excess -= size
+            self.evictions += 1
+
+    # Find a stored matrix over a subset of the coordinates, largest first
+    def _find_base(self, coordinates):
+        positions = {}
+        for location_id, point in enumerate(map(tuple, coordinates.tolist())):
+            positions.setdefault(point, location_id)
+        candidates = [(count, key) for key, count, dtype_name in self._entries()
+                      if dtype_name == self.dtype.name and count < len(coordinates)]
+
+        for count, key in sorted(candidates, reverse=True)[:INCREMENTAL_CANDIDATES]:
+            matrix_path = self._path(key, count, ".npy")
+            try:
+                old_coordinates = np.load(self._path(key, count, ".coords.npy"))
+                old_matrix = np.load(matrix_path, mmap_mode="r")
+            except OSError:
+                continue  # Incomplete, or evicted by another process
+            old_ids = np.array([positions.get(point, -1) for point in map(tuple, old_coordinates.tolist())],
+                               dtype=np.int64)
+            # Every stored location must appear in the new set, each at a distinct position
+            if len(old_ids) and old_ids.min() >= 0 and len(np.unique(old_ids)) == len(old_ids):
+                self._touch(matrix_path)
+                return old_ids, old_matrix
+        return None
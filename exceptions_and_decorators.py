@@ -1,6 +1,6 @@
 import time
-from datetime import datetime
-from colorama import Fore, Style  # Used for colored console output (not currently used in this script)
+from functools import wraps
+from metrics import record_call
 
 # A logging decorator that can be temporarily disabled for debugging purposes
 def logging_decorator(func):
@@ -9,6 +9,7 @@ def logging_decorator(func):
     When required, this decorator can be enabled to log function execution
     details for debugging or troubleshooting.
     """
+    @wraps(func)
     def wrapper(*args, **kwargs):
         return func(*args, **kwargs)  # Simply calls the original function
     return wrapper
@@ -31,35 +32,24 @@ def logging_decorator(func):
 # Decorator to measure and log the execution time of a function
 def execution_time_decorator(func):
     """
-    Measures the execution time of a function and logs the time to both the console
-    and a log file. Optionally suppresses console output if needed.
+    Measures the execution time of a function, prints it to the console and records it in the
+    metrics registry. Optionally suppresses console output if needed.
 
-    Logs include:
-    - Function name
-    - Execution time
-    - Timestamp
+    The registry aggregates calls in memory (count, sum, min/max, latency histogram) and a
+    background thread appends them to journey_metrics.jsonl; see metrics.py for the p50/p95/p99 report.
     """
+    @wraps(func)
     def wrapper(*args, suppress_output=False, **kwargs):  # Allow suppress_output flag for optional console logging
-        start_time = time.time()  # Record the start time
+        start_time = time.perf_counter_ns()  # Record the start time
         result = func(*args, **kwargs)  # Execute the function
-        end_time = time.time()  # Record the end time
-        elapsed_time = end_time - start_time  # Calculate the elapsed time
-
-        # Get the current date and time for logging
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        elapsed_ns = time.perf_counter_ns() - start_time  # Calculate the elapsed time
 
         # Print execution details to the console unless suppressed
         if not suppress_output:
-            print(f"{func.__name__} executed in {elapsed_time:.4f} seconds")
+            print(f"{func.__name__} executed in {elapsed_ns / 1e9:.4f} seconds")
 
-        # Log execution details to a file
-        with open("journey_log.txt", "a") as log_file:
-            log_file.write(
-                f"Date and Time: {timestamp}\n"
-                f"Function: {func.__name__}\n"
-                f"Execution Time: {elapsed_time:.4f} seconds\n"
-                "--------------------------------------------\n"
-            )
+        # Aggregate in memory; the file is written in batches by the metrics thread
+        record_call(func.__name__, elapsed_ns)
 
         return result  # Return the result of the function
     return wrapper
@@ -71,6 +61,7 @@ def error_handling_decorator(func):
     Catches and logs exceptions raised during the execution of a function.
     Prints an error message to the console and re-raises the exception.
     """
+    @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)  # Attempt to execute the function
@@ -0,0 +1,346 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import tempfile
+import numpy as np
+from shortest_path_calculation import TransportMode, LocationTable
+from console_colors import Fore
+
+CACHE_DIRECTORY = ".planner_cache"  # Cache folder created next to each loaded CSV file
+CACHE_VERSION = 2  # Bump when the cache layout changes so old caches are rebuilt
+HASH_CHUNK_BYTES = 1 << 20  # Read size when hashing a CSV file
+MAX_REPORTED_ROWS = 20  # Invalid line numbers printed per file
+NAME_PATTERN = r"[\w\s-]+"  # Location and transport mode names accepted by the loaders
+
+# Function to split the wanted columns of a CSV file into lists of strings
+def read_csv_columns(file_path, columns):
+    """
+    Parse a CSV file in bulk. Files without quotes and with the same number of fields on every
+    line are split by two C-level string operations over the whole text; other files go through
+    the csv module. Either way no dictionary is built per row.
+
+    Parameters:
+        file_path (str): Path to the CSV file.
+        columns (tuple): Header names of the columns to return.
+
+    Returns:
+        tuple: (values, line_numbers, malformed) where values holds one list of strings per column,
+               line_numbers the file line of every row and malformed the line numbers of rows with the
+               wrong number of fields (returned as empty strings). Blank lines are skipped.
+    """
+    with open(file_path, mode="r", newline="") as file:
+        text = file.read()
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    header_line, _, body = text.partition("\n")
+    header = next(csv.reader([header_line]), [])
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"Missing column(s) {', '.join(missing)} in {file_path}")
+    positions = [header.index(column) for column in columns]
+    width = len(header)
+    body = body.rstrip("\n")
+
+    if not body:
+        return [[] for _ in columns], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if '"' not in body:
+        lines = body.split("\n")
+        commas = np.fromiter(map(str.count, lines, itertools.repeat(",")), dtype=np.int64, count=len(lines))
+        if width > 1 and np.all(commas == width - 1):
+            # Every line has exactly `width` fields, so each column is a strided slice
+            fields = body.replace("\n", ",").split(",")
+            return ([fields[position::width] for position in positions], np.arange(2, len(lines) + 2),
+                    np.empty(0, dtype=np.int64))
+
+    # General path: quoted fields, blank lines or rows with the wrong number of fields
+    rows = list(csv.reader(body.split("\n")))
+    line_numbers = np.arange(2, len(rows) + 2)
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    present = lengths > 0
+    malformed = present & (lengths != width)
+    empty_row = [""] * width
+    for index in np.flatnonzero(malformed).tolist():
+        rows[index] = empty_row
+    kept = np.flatnonzero(present)
+    if len(kept) < len(rows):
+        rows = [rows[index] for index in kept.tolist()]
+    values = [[row[position] for row in rows] for position in positions]
+    return values, line_numbers[kept], line_numbers[malformed]
+
+# Function to convert a column of strings to floats, flagging the entries that are not numbers
+def parse_float_column(values):
+    """
+    Parameters:
+        values (list): Strings to convert.
+
+    Returns:
+        tuple: (floats, invalid) with NaN and True wherever the text is not a finite number.
+    """
+    try:
+        floats = np.array(values, dtype=np.float64).reshape(-1)
+    except ValueError:
+        # Only files with bad entries pay for the element-by-element pass
+        floats = np.empty(len(values), dtype=np.float64)
+        for index, text in enumerate(values):
+            try:
+                floats[index] = float(text)
+            except ValueError:
+                floats[index] = np.nan
+    invalid = ~np.isfinite(floats)
+    floats[invalid] = np.nan
+    return floats, invalid
+
+# Function to flag names that the row-by-row loaders would reject
+def invalid_names(names):
+    """
+    Parameters:
+        names (list): Names to check.
+
+    Returns:
+        ndarray: Boolean mask of names not matching NAME_PATTERN.
+    """
+    invalid = np.zeros(len(names), dtype=bool)
+    # One regex pass over all names joined by NUL, which no valid name contains
+    if not names or re.fullmatch(f"{NAME_PATTERN}(?:\x00{NAME_PATTERN})*", "\x00".join(names)):
+        return invalid
+    pattern = re.compile(NAME_PATTERN)
+    for index, name in enumerate(names):
+        invalid[index] = pattern.fullmatch(name) is None
+    return invalid
+
+# Function to flag every repetition of a name after its first row
+def duplicate_names(names, skip):
+    """
+    Parameters:
+        names (list): Names to check.
+        skip (ndarray): Boolean mask of rows to ignore (already invalid).
+
+    Returns:
+        ndarray: Boolean mask, True for rows repeating the name of an earlier row that is not skipped.
+    """
+    duplicate = np.zeros(len(names), dtype=bool)
+    if len(set(names)) == len(names):
+        return duplicate
+    seen = set()
+    for index, name in enumerate(names):
+        if skip[index]:
+            continue
+        duplicate[index] = name in seen
+        seen.add(name)
+    return duplicate
+
+# Function to keep the names of valid rows
+def _select(names, valid):
+    if valid.all():
+        return names
+    return [names[index] for index in np.flatnonzero(valid).tolist()]
+
+# Function to parse and validate a locations CSV file into columns
+def parse_locations(file_path):
+    """
+    Parameters:
+        file_path (str): Path to a CSV file with Name, Latitude and Longitude columns.
+
+    Returns:
+        tuple: (names, coordinates, invalid_lines): list of valid names, their (n, 2) float64 coordinates and the
+               file line numbers of skipped rows (bad format, out-of-range coordinates or repeated names).
+    """
+    (names, latitudes, longitudes), line_numbers, malformed = read_csv_columns(
+        file_path, ("Name", "Latitude", "Longitude"))
+    latitudes, bad_latitudes = parse_float_column(latitudes)
+    longitudes, bad_longitudes = parse_float_column(longitudes)
+    invalid = (invalid_names(names) | bad_latitudes | bad_longitudes
+               | (np.abs(latitudes) > 90) | (np.abs(longitudes) > 180))
+    invalid |= duplicate_names(names, invalid)
+    valid = ~invalid
+    coordinates = np.stack([latitudes[valid], longitudes[valid]], axis=1)
+    invalid_lines = np.union1d(line_numbers[invalid], malformed)
+    return _select(names, valid), coordinates, invalid_lines
+
+# Function to parse and validate a transport modes CSV file into columns
+def parse_transport_modes(file_path):
+    """
+    Parameters:
+        file_path (str): Path to a CSV file with Name, Speed_kmh, Cost_per_km and Transfer_Time_min columns.
+
+    Returns:
+        tuple: (names, values, invalid_lines): valid names, an (n, 3) float64 array of speed, cost per km
+               and transfer minutes, and the file line numbers of skipped rows.
+    """
+    (names, speeds, costs, transfers), line_numbers, malformed = read_csv_columns(
+        file_path, ("Name", "Speed_kmh", "Cost_per_km", "Transfer_Time_min"))
+    speeds, bad_speeds = parse_float_column(speeds)
+    costs, bad_costs = parse_float_column(costs)
+    transfers, bad_transfers = parse_float_column(transfers)
+    invalid = (invalid_names(names) | bad_speeds | bad_costs | bad_transfers | ~(speeds > 0) | (costs < 0)
+               | (transfers < 0) | (transfers != np.round(transfers)))  # Transfer minutes are whole numbers
+    valid = ~invalid
+    values = np.stack([speeds[valid], costs[valid], transfers[valid]], axis=1)
+    invalid_lines = np.union1d(line_numbers[invalid], malformed)
+    return _select(names, valid), values, invalid_lines
+
+# Function to fingerprint a file's contents
+def file_hash(file_path):
+    """
+    Parameters:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: BLAKE2b hex digest of the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to find the cache folder of a CSV file
+def cache_path(file_path, cache_dir=None):
+    """
+    Parameters:
+        file_path (str): Path to the CSV file.
+        cache_dir (str): Folder holding the caches (default: CACHE_DIRECTORY next to the file).
+
+    Returns:
+        str: Folder for this file's cache, named after the file and a hash of its absolute path.
+    """
+    absolute = os.path.abspath(file_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(absolute), CACHE_DIRECTORY)
+    path_key = hashlib.blake2b(absolute.encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, f"{os.path.basename(absolute)}-{path_key}")
+
+# Function to load parsed columns from a cache, or parse the file and write the cache
+def _cached_columns(file_path, parser, kind, cache_dir, use_cache):
+    """
+    The cache holds the names as one NUL-separated UTF-8 blob and the numbers as a .npy array that
+    is memory-mapped on load. It is valid while the file's size and mtime match, or, if only the
+    mtime changed, while its content hash does. Both arrays are named after the content hash and
+    never rewritten in place: every file is written to a temporary name and renamed, and meta.json,
+    which points readers at the arrays, is replaced last. A reader holding older arrays keeps them
+    intact while the cache is rebuilt.
+
+    Returns:
+        tuple: (names, values, invalid_lines) as returned by parser.
+    """
+    status = os.stat(file_path)
+    folder = cache_path(file_path, cache_dir)
+    meta_path = os.path.join(folder, "meta.json")
+    content_hash = None
+    if use_cache:
+        try:
+            with open(meta_path, "r") as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            meta = None
+        if meta is not None and meta.get("version") == CACHE_VERSION and meta.get("kind") == kind:
+            fresh = meta["size"] == status.st_size and meta["mtime_ns"] == status.st_mtime_ns
+            if not fresh and meta["size"] == status.st_size:
+                content_hash = file_hash(file_path)
+                fresh = meta["hash"] == content_hash
+            if fresh:
+                try:
+                    values = np.load(os.path.join(folder, f"values-{meta['hash']}.npy"), mmap_mode="r")
+                    blob = np.load(os.path.join(folder, f"names-{meta['hash']}.npy"), mmap_mode="r")
+                    names = blob.tobytes().decode("utf-8").split("\x00") if len(values) else []
+                    return names, values, np.array(meta["invalid_lines"], dtype=np.int64)
+                except OSError:
+                    pass  # Replaced by another process meanwhile: parse the file
+
+    names, values, invalid_lines = parser(file_path)
+    if use_cache:
+        try:
+            os.makedirs(folder, exist_ok=True)
+            content_hash = content_hash or file_hash(file_path)
+            _replace_file(folder, f"values-{content_hash}.npy",
+                          lambda file: np.save(file, np.ascontiguousarray(values)))
+            _replace_file(folder, f"names-{content_hash}.npy",
+                          lambda file: np.save(file, np.frombuffer("\x00".join(names).encode("utf-8"), dtype=np.uint8)))
+            meta = {"version": CACHE_VERSION, "kind": kind, "size": status.st_size,
+                    "mtime_ns": status.st_mtime_ns, "hash": content_hash, "invalid_lines": invalid_lines.tolist()}
+            _replace_file(folder, "meta.json", lambda file: file.write(json.dumps(meta).encode()))
+
+            # Arrays of earlier contents are no longer referenced; mapped copies stay readable until closed
+            for file_name in os.listdir(folder):
+                if file_name.endswith(".npy") and not file_name.endswith(f"-{content_hash}.npy"):
+                    try:
+                        os.remove(os.path.join(folder, file_name))
+                    except OSError:
+                        pass
+        except OSError as e:
+            print(Fore.RED + f"Could not write the cache for {file_path}: {e}")
+    return names, values, invalid_lines
+
+# Function to write a cache file under a temporary name of this writer, then rename it into place
+def _replace_file(folder, file_name, write):
+    handle, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write(file)
+        os.replace(temporary_path, os.path.join(folder, file_name))
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+# Function to print the skipped line numbers of a file
+def _report_invalid_lines(file_path, invalid_lines, what):
+    if len(invalid_lines):
+        shown = ", ".join(str(line) for line in invalid_lines[:MAX_REPORTED_ROWS].tolist())
+        more = f" and {len(invalid_lines) - MAX_REPORTED_ROWS} more" if len(invalid_lines) > MAX_REPORTED_ROWS else ""
+        print(Fore.RED + f"Invalid {what} on line(s) {shown}{more} of {file_path}")
+
+# Load location coordinates from a CSV file through the columnar parser and its binary cache
+def load_locations_fast(file_path, cache_dir=None, use_cache=True):
+    """
+    Columnar counterpart of main.load_locations for large files. Rows with an invalid name,
+    non-numeric or out-of-range coordinates, or a name already seen are skipped and their line
+    numbers reported.
+
+    Parameters:
+        file_path (str): Path to the CSV file containing location data.
+        cache_dir (str): Folder for the binary cache (default: .planner_cache next to the file).
+        use_cache (bool): Read and write the binary cache.
+
+    Returns:
+        LocationTable: The valid locations, in file order (empty if the file cannot be read).
+    """
+    try:
+        names, coordinates, invalid_lines = _cached_columns(file_path, parse_locations, "locations",
+                                                            cache_dir, use_cache)
+    except FileNotFoundError:
+        print(Fore.RED + f"Error: The file {file_path} was not found.")
+        return LocationTable([], np.empty((0, 2)))
+    except Exception as e:
+        print(Fore.RED + f"An error occurred while reading the file {file_path}: {e}")
+        return LocationTable([], np.empty((0, 2)))
+    _report_invalid_lines(file_path, invalid_lines, "location")
+    return LocationTable(names, coordinates)
+
+# Load transport modes from a CSV file through the columnar parser and its binary cache
+def load_transport_modes_fast(file_path, cache_dir=None, use_cache=True):
+    """
+    Columnar counterpart of main.load_transport_modes.
+
+    Parameters:
+        file_path (str): Path to the CSV file containing transport modes.
+        cache_dir (str): Folder for the binary cache (default: .planner_cache next to the file).
+        use_cache (bool): Read and write the binary cache.
+
+    Returns:
+        list: List of TransportMode objects (empty if the file cannot be read).
+    """
+    try:
+        names, values, invalid_lines = _cached_columns(file_path, parse_transport_modes, "transport_modes",
+                                                       cache_dir, use_cache)
+    except FileNotFoundError:
+        print(Fore.RED + f"Error: The file {file_path} was not found.")
+        return []
+    except Exception as e:
+        print(Fore.RED + f"An error occurred while reading the file {file_path}: {e}")
+        return []
+    _report_invalid_lines(file_path, invalid_lines, "transport mode")
+    return [TransportMode(name, speed, cost, int(transfer))
+            for name, (speed, cost, transfer) in zip(names, np.asarray(values).tolist())]
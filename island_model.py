@@ -0,0 +1,151 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from shortest_path_calculation import build_distance_matrix, GeneticSearch, Individual
+from exceptions_and_decorators import execution_time_decorator
+
+# Distance matrix attached by each worker process from the parent's shared memory block
+_worker_shared_memory = None
+_worker_distance_matrix = None
+
+# Function run once in every worker to map the shared distance matrix without copying it
+def _attach_distance_matrix(shared_memory_name, shape, dtype):
+    """
+    Attach the shared memory block created by the parent and view it as the distance matrix.
+    :param shared_memory_name: Name of the shared memory block holding the matrix.
+    :param shape: Shape of the distance matrix.
+    :param dtype: Data type of the distance matrix (float32 with a float32 DistanceMatrixStore).
+    """
+    global _worker_shared_memory, _worker_distance_matrix
+    _worker_shared_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    _worker_distance_matrix = np.ndarray(shape, dtype=dtype, buffer=_worker_shared_memory.buf)
+
+# Function to evolve one island for a number of generations inside a worker process
+def _evolve_island(task):
+    """
+    Evolve one island's population between two migrations.
+    :param task: Tuple (tours, distances, rng_state, generations, settings). tours is None for the
+                 first epoch, in which case the island creates its initial population.
+    :return: Tuple (tours, distances, rng_state) describing the evolved island.
+    """
+    tours, distances, rng_state, generations, settings = task
+    rng = random.Random()
+    rng.setstate(rng_state)
+    search = GeneticSearch(_worker_distance_matrix, rng=rng, **settings)
+
+    if tours is None:
+        population = search.create_population()
+    else:
+        population = [Individual(tour, distance) for tour, distance in zip(tours, distances)]
+
+    for _ in range(generations):
+        population = search.next_generation(population)
+
+    return (np.array([individual.tour for individual in population], dtype=np.int32),
+            np.array([individual.distance for individual in population], dtype=np.float64),
+            rng.getstate())
+
+# Function to copy the best individuals of each island over the worst of the next island
+def _migrate(islands, migration_size):
+    """
+    Ring migration: the top migration_size tours of island i replace the worst tours of island i + 1.
+    :param islands: List of (tours, distances) per island, modified in place.
+    :param migration_size: Number of individuals sent from each island.
+    """
+    emigrants = []
+    for tours, distances in islands:
+        best = np.argsort(distances, kind="stable")[:migration_size]
+        emigrants.append((tours[best].copy(), distances[best].copy()))
+
+    for index, (tours, distances) in enumerate(islands):
+        incoming_tours, incoming_distances = emigrants[index - 1]  # From the previous island in the ring
+        worst = np.argsort(distances, kind="stable")[::-1][:len(incoming_distances)]
+        tours[worst] = incoming_tours
+        distances[worst] = incoming_distances
+
+# Decorated function running the genetic algorithm as parallel islands with periodic migration
+@execution_time_decorator
+def island_genetic_algorithm(locations, islands=4, population_size=100, generations=500, mutation_rate=0.01,
+                             seed=42, migration_interval=50, migration_size=2, crossover="ox", mutation="swap",
+                             elite_size=0, max_workers=None):
+    """
+    Solve the traveling salesman problem with an island-model genetic algorithm. Each island evolves
+    its own population in a process pool, reading the distance matrix from shared memory, and the
+    best individuals migrate around a ring of islands every migration_interval generations.
+    The result depends only on seed and islands, not on max_workers or scheduling.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude).
+        islands (int): Number of sub-populations.
+        population_size (int): Number of individuals on each island.
+        generations (int): Number of generations each island evolves.
+        mutation_rate (float): Probability of mutation for each individual.
+        seed (int): Seed for random number generation for reproducibility.
+        migration_interval (int): Generations between migrations.
+        migration_size (int): Number of top individuals each island sends per migration.
+        crossover (str): Name of the crossover operator ("ox", "pmx" or "erx").
+        mutation (str): Name of the mutation operator ("swap", "insertion" or "two_opt").
+        elite_size (int): Number of best individuals each island carries unchanged into its next generation.
+        max_workers (int): Size of the process pool (default: one worker per island, up to the CPU count).
+
+    Returns:
+        tuple: Best distance and path found across all islands, as returned by genetic_algorithm.
+    """
+    if islands < 1:
+        raise ValueError("islands must be at least 1")
+    if migration_interval < 1:
+        raise ValueError("migration_interval must be at least 1")
+
+    location_names, distance_matrix = build_distance_matrix(locations)
+    # Validate the operator names in the parent before starting any worker
+    GeneticSearch(distance_matrix, population_size, crossover=crossover, mutation=mutation, elite_size=elite_size)
+    settings = {
+        "population_size": population_size,
+        "mutation_rate": mutation_rate,
+        "crossover": crossover,
+        "mutation": mutation,
+        "elite_size": elite_size,
+    }
+    if max_workers is None:
+        max_workers = min(islands, os.cpu_count() or 1)
+
+    # Copy the distance matrix once into shared memory; workers map it read-only
+    block = shared_memory.SharedMemory(create=True, size=max(distance_matrix.nbytes, 1))
+    shared_matrix = None
+    try:
+        shared_matrix = np.ndarray(distance_matrix.shape, dtype=distance_matrix.dtype, buffer=block.buf)
+        shared_matrix[:] = distance_matrix
+
+        # Each island gets its own seeded generator so the run is reproducible for (seed, islands)
+        states = [random.Random(f"{seed}-island-{index}").getstate() for index in range(islands)]
+        populations = [(None, None)] * islands
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_distance_matrix,
+                                 initargs=(block.name, distance_matrix.shape, distance_matrix.dtype.str)) as executor:
+            completed = 0
+            while completed < generations or populations[0][0] is None:
+                epoch = min(migration_interval, generations - completed)
+                tasks = [(tours, distances, state, epoch, settings)
+                         for (tours, distances), state in zip(populations, states)]
+                results = list(executor.map(_evolve_island, tasks))  # Collected in island order
+                populations = [(tours, distances) for tours, distances, _ in results]
+                states = [state for _, _, state in results]
+                completed += epoch
+
+                if completed < generations and islands > 1:
+                    _migrate(populations, migration_size)
+    finally:
+        del shared_matrix  # Release the view before closing the block, also when a worker failed
+        block.close()
+        block.unlink()
+
+    # Find the best individual across all islands
+    best_distance, best_tour = None, None
+    for tours, distances in populations:
+        index = int(np.argmin(distances))
+        if best_distance is None or distances[index] < best_distance:
+            best_distance, best_tour = float(distances[index]), tours[index]
+
+    return best_distance, [location_names[location_id] for location_id in best_tour]
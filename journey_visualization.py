@@ -1,6 +1,22 @@
-import matplotlib.pyplot as plt
+import io
+import math
+import numpy as np
+from shortest_path_calculation import location_coordinates
 
-def visualize_optimal_transport_modes(locations, optimal_modes, title="Optimal Transport Modes Visualization"):
+# Define colors for each transport mode to differentiate visually; other modes are drawn in gray
+MODE_COLORS = {
+    "Bus": "blue",
+    "Train": "green",
+    "Bicycle": "orange",
+    "Walking": "red"
+}
+UNKNOWN_MODE_COLOR = "gray"
+MAX_LABELS = 100  # Most location names drawn on one map (each label costs about 2 ms to draw)
+LABEL_SPACING_PX = 60  # Labels are thinned to at most one per square of this many pixels
+VIEWPORT_MARGIN = 0.05  # Padding around the route when no viewport is given, relative to its extent
+
+def visualize_optimal_transport_modes(locations, optimal_modes, title="Optimal Transport Modes Visualization",
+                                      output_path=None):
     """
     Visualizes the optimal transport modes for a journey.
 
@@ -11,17 +27,20 @@ def visualize_optimal_transport_modes(locations, optimal_modes, title="Optimal T
                               [(start, end, mode), ...].
                               Example: [("A", "B", "Bus"), ("B", "C", "Walking")].
         title (str): Title for the visualization graph (default is "Optimal Transport Modes Visualization").
+        output_path (str): Save the map to this file (e.g. "route.png" or "route.svg") with the headless
+                           batched renderer instead of showing it; suited to long routes and servers.
     """
+    if output_path is not None:
+        render_journey(locations, optimal_modes, output_path, title=title)
+        return
+
+    import matplotlib.pyplot as plt  # Imported here so that only visualizing pays for matplotlib
+
     # Set the size of the plot for better visibility
     plt.figure(figsize=(14, 9))  # Width and height of the figure in inches
 
-    # Define colors for each transport mode to differentiate visually
-    mode_colors = {
-        "Bus": "blue",
-        "Train": "green",
-        "Bicycle": "orange",
-        "Walking": "red"
-    }
+    # Colors for each transport mode to differentiate visually
+    mode_colors = MODE_COLORS
 
     # Plot each segment and use a distinct color for each transport mode
     for segment in optimal_modes:
@@ -91,3 +110,231 @@ def visualize_optimal_transport_modes(locations, optimal_modes, title="Optimal T
 
     # Display the plot
     plt.show()
+
+def plot_search_trace(trace, output_path=None, title="Genetic Algorithm Convergence"):
+    """
+    Plots a genetic algorithm trace: best/mean distance and diversity per generation on top,
+    time per phase per generation below.
+
+    Parameters:
+        trace: SearchProfiler, or the dictionary of arrays returned by load_search_trace.
+        output_path (str): Save the figure to this file (e.g. "trace.png") instead of showing it.
+        title (str): Title for the figure.
+    """
+    import matplotlib.pyplot as plt  # Imported here so that only visualizing pays for matplotlib
+    from search_profiler import PHASES
+
+    # Accept a live profiler as well as a loaded trace
+    if hasattr(trace, "to_arrays"):
+        trace = trace.to_arrays()
+    generations = trace["generation"]
+
+    figure, (distance_axis, time_axis) = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
+
+    # Convergence: best and mean distance, with diversity on a second axis
+    distance_axis.plot(generations, trace["best_so_far"], color="green", label="Best so far")
+    distance_axis.plot(generations, trace["best_distance"], color="blue", alpha=0.5, label="Best of generation")
+    distance_axis.plot(generations, trace["mean_distance"], color="orange", label="Mean of generation")
+    distance_axis.set_ylabel("Distance (km)")
+    diversity_axis = distance_axis.twinx()
+    diversity_axis.plot(generations, trace["diversity"], color="gray", linestyle="--", label="Diversity")
+    diversity_axis.set_ylabel("Diversity")
+    lines = distance_axis.get_legend_handles_labels()
+    diversity_lines = diversity_axis.get_legend_handles_labels()
+    distance_axis.legend(lines[0] + diversity_lines[0], lines[1] + diversity_lines[1], loc="upper right")
+    distance_axis.set_title(title)
+    distance_axis.grid(True, linestyle="--", alpha=0.6)
+
+    # Cost: stacked milliseconds per phase
+    time_axis.stackplot(generations, *[trace[f"{phase}_ns"] / 1e6 for phase in PHASES], labels=PHASES)
+    time_axis.set_xlabel("Generation")
+    time_axis.set_ylabel("Time per phase (ms)")
+    time_axis.legend(loc="upper right")
+    time_axis.grid(True, linestyle="--", alpha=0.6)
+
+    figure.tight_layout()
+    if output_path is None:
+        plt.show()
+    else:
+        figure.savefig(output_path)
+        plt.close(figure)
+
+# Class rendering journey maps headlessly with one reusable Agg figure
+class JourneyRenderer:
+    def __init__(self, figsize=(14, 9), dpi=100, max_labels=MAX_LABELS, label_spacing_px=LABEL_SPACING_PX):
+        """
+        Draws each transport mode's segments as a single LineCollection and all stops as a single
+        scatter, so the number of artists does not grow with the route length. The figure is drawn
+        on a FigureCanvasAgg without pyplot: no display is needed and nothing blocks.
+
+        Parameters:
+            figsize (tuple): Figure width and height in inches.
+            dpi (int): Resolution of raster output.
+            max_labels (int): Most stop names drawn on one map (0 for none).
+            label_spacing_px (int): Labels are thinned to at most one per square of this many pixels.
+        """
+        # Imported here so that only rendering pays for matplotlib
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)  # Attaches itself to the figure
+        self.axes = self.figure.add_subplot()
+        self.max_labels = max_labels
+        self.label_spacing_px = label_spacing_px
+
+    def render(self, locations, optimal_modes, output=None, format=None, title="Optimal Transport Modes Visualization",
+               viewport=None):
+        """
+        Render one journey, replacing whatever the figure showed before.
+
+        Parameters:
+            locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+            optimal_modes (list): Segments and transport modes as [(start, end, mode), ...].
+            output (str): File to write; the format follows its extension unless given. None returns bytes.
+            format (str): "png", "svg", "pdf", ... (default: from output, or "png" for bytes).
+            title (str): Title of the map.
+            viewport (tuple): Optional (min_latitude, max_latitude, min_longitude, max_longitude) to zoom to.
+                              Segments and labels outside it are culled; zooming in shows more labels.
+
+        Returns:
+            bytes: The rendered image when output is None, otherwise None.
+        """
+        from matplotlib.collections import LineCollection
+        from matplotlib.lines import Line2D
+
+        axes = self.axes
+        axes.clear()
+
+        starts = location_coordinates(locations, [start for start, _, _ in optimal_modes])
+        ends = location_coordinates(locations, [end for _, end, _ in optimal_modes])
+        modes = np.array([mode for _, _, mode in optimal_modes], dtype=object)
+        stops = np.unique(np.concatenate([starts, ends]), axis=0) if len(optimal_modes) else np.empty((0, 2))
+        if viewport is None:
+            viewport = self._fit_viewport(stops if len(stops) else location_coordinates(locations))
+        min_latitude, max_latitude, min_longitude, max_longitude = viewport
+
+        # Cull segments whose bounding box misses the viewport, then draw one collection per mode
+        visible = ((np.maximum(starts[:, 0], ends[:, 0]) >= min_latitude)
+                   & (np.minimum(starts[:, 0], ends[:, 0]) <= max_latitude)
+                   & (np.maximum(starts[:, 1], ends[:, 1]) >= min_longitude)
+                   & (np.minimum(starts[:, 1], ends[:, 1]) <= max_longitude))
+        lines = np.stack([starts[:, ::-1], ends[:, ::-1]], axis=1)  # (segments, 2 points, (longitude, latitude))
+        handles = []
+        for mode in dict.fromkeys(modes.tolist()):
+            color = MODE_COLORS.get(mode, UNKNOWN_MODE_COLOR)
+            selected = visible & (modes == mode)
+            if selected.any():
+                axes.add_collection(LineCollection(lines[selected], colors=color, linewidths=2))
+            handles.append(Line2D([0], [0], color=color, lw=2, label=mode))
+        if len(stops):
+            axes.scatter(stops[:, 1], stops[:, 0], color="black", s=12, zorder=3)
+
+        # Highlight Tarjan's home if it's included in the locations
+        if "Tarjan" in locations:
+            tarjan_coords = locations["Tarjan"]
+            axes.scatter(tarjan_coords[1], tarjan_coords[0], color="green", s=150, zorder=4)
+            handles.append(Line2D([0], [0], color="green", marker="o", linestyle="", markersize=9,
+                                  label="Tarjan's Home"))
+
+        # Label the journey's stops in route order (every location when there are no segments)
+        stop_names = list(dict.fromkeys(name for start, end, _ in optimal_modes for name in (start, end)))
+        stop_names = stop_names or list(locations.keys())
+        for name, (latitude, longitude) in self._thinned_labels(stop_names, location_coordinates(locations, stop_names),
+                                                                viewport):
+            axes.text(longitude, latitude, name, fontsize=10, ha="center", va="bottom", clip_on=True)
+
+        axes.set_xlim(min_longitude, max_longitude)
+        axes.set_ylim(min_latitude, max_latitude)
+        axes.legend(handles=handles, loc="upper right", fontsize=10, title="Transport Modes and Locations")
+        axes.set_title(title, fontsize=18)
+        axes.set_xlabel("Longitude", fontsize=16)
+        axes.set_ylabel("Latitude", fontsize=16)
+        axes.grid(True, linestyle="--", alpha=0.6)
+
+        if output is None:
+            buffer = io.BytesIO()
+            self.figure.savefig(buffer, format=format or "png")
+            return buffer.getvalue()
+        self.figure.savefig(output, format=format)
+        return None
+
+    # Bounding box of the points with a margin, as (min_latitude, max_latitude, min_longitude, max_longitude)
+    def _fit_viewport(self, coords):
+        if not len(coords):
+            return 0.0, 1.0, 0.0, 1.0
+        low, high = coords.min(axis=0), coords.max(axis=0)
+        margin = np.maximum((high - low) * VIEWPORT_MARGIN, 1e-3)
+        return low[0] - margin[0], high[0] + margin[0], low[1] - margin[1], high[1] + margin[1]
+
+    # Location names to draw: inside the viewport, at most one per label cell, Tarjan first then in order
+    def _thinned_labels(self, names, coords, viewport):
+        if not self.max_labels or not len(names):
+            return []
+        min_latitude, max_latitude, min_longitude, max_longitude = viewport
+        inside = np.flatnonzero((coords[:, 0] >= min_latitude) & (coords[:, 0] <= max_latitude)
+                                & (coords[:, 1] >= min_longitude) & (coords[:, 1] <= max_longitude))
+        if "Tarjan" in names:
+            inside = np.concatenate([inside[[names[i] == "Tarjan" for i in inside]],
+                                     inside[[names[i] != "Tarjan" for i in inside]]])
+
+        # The label grid has a fixed size in pixels, so a smaller viewport gets finer cells
+        width_px, height_px = self.figure.get_size_inches() * self.figure.dpi
+        columns = max(math.ceil(width_px / self.label_spacing_px), 1)
+        rows = max(math.ceil(height_px / self.label_spacing_px), 1)
+        column = np.floor((coords[inside, 1] - min_longitude) / max(max_longitude - min_longitude, 1e-12) * columns)
+        row = np.floor((coords[inside, 0] - min_latitude) / max(max_latitude - min_latitude, 1e-12) * rows)
+        _, first = np.unique(row.astype(np.int64) * (columns + 1) + column.astype(np.int64), return_index=True)
+        kept = inside[np.sort(first)][:self.max_labels]  # First location of each cell, in priority order
+        return [(names[i], (coords[i, 0], coords[i, 1])) for i in kept.tolist()]
+
+    def close(self):
+        """
+        Release the figure.
+        """
+        self.figure.clear()
+
+# Function to render one journey map headlessly to a file or to bytes
+def render_journey(locations, optimal_modes, output=None, format=None, title="Optimal Transport Modes Visualization",
+                   viewport=None, **renderer_options):
+    """
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+        optimal_modes (list): Segments and transport modes as [(start, end, mode), ...].
+        output (str): File to write ("route.png", "route.svg", ...), or None to return the image bytes.
+        format (str): Output format when it cannot be taken from output (default "png").
+        title (str): Title of the map.
+        viewport (tuple): Optional (min_latitude, max_latitude, min_longitude, max_longitude) to zoom to.
+        renderer_options: figsize, dpi, max_labels or label_spacing_px for JourneyRenderer.
+
+    Returns:
+        bytes: The rendered image when output is None, otherwise None.
+    """
+    return JourneyRenderer(**renderer_options).render(locations, optimal_modes, output, format, title, viewport)
+
+# Generator rendering many journeys with one reused figure
+def render_journeys(journeys, outputs=None, format=None, **renderer_options):
+    """
+    Parameters:
+        journeys (iterable): (locations, optimal_modes) or (locations, optimal_modes, title) tuples.
+        outputs (iterable): File per journey, or None to yield the image bytes of each journey.
+        format (str): Output format (default: from each file name, or "png" for bytes).
+        renderer_options: figsize, dpi, max_labels or label_spacing_px for JourneyRenderer.
+
+    Yields:
+        bytes or str: Image bytes, or the file written, for each journey in order.
+    """
+    renderer = JourneyRenderer(**renderer_options)
+    outputs = iter(outputs) if outputs is not None else None
+    try:
+        for journey in journeys:
+            locations, optimal_modes = journey[0], journey[1]
+            title = journey[2] if len(journey) > 2 else "Optimal Transport Modes Visualization"
+            if outputs is None:
+                yield renderer.render(locations, optimal_modes, format=format, title=title)
+            else:
+                output = next(outputs)
+                renderer.render(locations, optimal_modes, output, format, title)
+                yield output
+    finally:
+        renderer.close()
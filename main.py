@@ -1,15 +1,20 @@
 import time
 import csv
 import re
-from colorama import Fore, Style, init
-from calculate_journey import calculate_journey
-from shortest_path_calculation import genetic_algorithm, TransportMode
+from shortest_path_calculation import TransportMode, use_distance_matrix_store
+from distance_store import DistanceMatrixStore
+from planning_cache import PLAN_CACHE_PATH, PlanningCache, plan_journey
 from journey_visualization import visualize_optimal_transport_modes
 from collections import Counter
 from exceptions_and_decorators import execution_time_decorator, logging_decorator, error_handling_decorator
+from console_colors import Fore, Style  # Colorama is only imported once a color is printed
 
-# Initialize colorama for colored console output
-init(autoreset=True)
+# Optimization criteria offered to the user, keyed by menu choice
+CRITERIA_MAPPING = {
+    "1": "Minimum Cost",
+    "2": "Minimum Time",
+    "3": "Both Cost and Time"
+}
 
 # Load location coordinates from a CSV file
 @logging_decorator
@@ -29,7 +34,8 @@ def load_locations(file_path):
         with open(file_path, mode='r') as file:
             reader = csv.DictReader(file)  # Automatically handles headers
             for row in reader:
-                match = re.match(r"^([\w\s-]+),([-+]?\d*\.\d+),([-+]?\d*\.\d+)$",
+                # Coordinates may be integers ("37") as well as decimals ("37.5", ".5", "37.")
+                match = re.match(r"^([\w\s-]+),([-+]?(?:\d+\.?\d*|\.\d+)),([-+]?(?:\d+\.?\d*|\.\d+))$",
                                  f"{row['Name']},{row['Latitude']},{row['Longitude']}")
                 if match:
                     name, latitude, longitude = match.groups()
@@ -95,17 +101,17 @@ def main():
     locations = load_locations("locations.csv")
     transport_modes = load_transport_modes("transport_modes.csv")
 
+    # Reuse the distance matrix stored by earlier runs over the same (large enough) locations
+    use_distance_matrix_store(DistanceMatrixStore())
+
     try:
-        # Calculate the shortest route using a genetic algorithm
-        total_distance, shortest_path = genetic_algorithm(locations, seed=120)
+        # Calculate the shortest route from Tarjan's home: exactly for small visit lists, otherwise
+        # with a 2-opt / Or-opt local search from a nearest-neighbour tour.
+        # The transport modes of every segment are optimized with it; an unchanged plan comes from the cache
+        total_distance, shortest_path, journey_results, journey_distance = plan_journey(
+            locations, transport_modes, start="Tarjan", seed=120, cache=PlanningCache(path=PLAN_CACHE_PATH))
 
         # Prompt the user to choose optimization criteria
-        criteria_mapping = {
-            "1": "Minimum Cost",
-            "2": "Minimum Time",
-            "3": "Both Cost and Time"
-        }
-
         chosen_criterion = None
         while not chosen_criterion:
             print(Fore.YELLOW + "\nPlease select optimization criteria or press Enter to exit:")
@@ -120,15 +126,12 @@ def main():
 
             # Validate user input using regex
             if re.match(r"^[123]$", choice):  
-                chosen_criterion = criteria_mapping[choice]
+                chosen_criterion = CRITERIA_MAPPING[choice]
             else:
                 print(Fore.RED + "Invalid choice. Please enter 1, 2, or 3.")
 
         print(Fore.GREEN + f"\nYou selected: Optimize for: {Fore.YELLOW + Style.BRIGHT}{chosen_criterion}")
 
-        # Optimize transport modes for the journey
-        journey_results, journey_distance = calculate_journey(locations, transport_modes, shortest_path)
-
         print(Fore.GREEN + Style.BRIGHT + f"\nOptimal Route Summary ({chosen_criterion}):")
         total_cost = 0
         total_time = 0
@@ -180,5 +183,6 @@ def main():
     except Exception as e:
         print(Fore.RED + f"An unexpected error occurred: {e}")
 
-# Run the main function
-main(suppress_output=True)  # Suppress final wrapper output for cleaner logs
+# Run the main function only when executed as a script, so the loaders can be imported
+if __name__ == "__main__":
+    main(suppress_output=True)  # Suppress final wrapper output for cleaner logs
@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import threading
+from datetime import datetime
+
+METRICS_PATH = "journey_metrics.jsonl"  # Default JSONL file receiving the flushed metrics
+FLUSH_INTERVAL_SECONDS = 1.0  # How often the background thread writes the aggregated metrics
+SIGNIFICANT_BITS = 5  # Histogram buckets per power of two are 2 ** (SIGNIFICANT_BITS - 1): about 3% resolution
+_HALF_BUCKETS = 1 << (SIGNIFICANT_BITS - 1)
+
+# Function to find the histogram bucket of a latency
+def bucket_index(value_ns):
+    """
+    HDR-style log-linear bucketing: exact below 2 ** SIGNIFICANT_BITS ns, then a fixed number of
+    equal-width buckets in every power of two, so the relative error is bounded at any scale.
+
+    Parameters:
+        value_ns (int): Latency in nanoseconds.
+
+    Returns:
+        int: Bucket index.
+    """
+    value_ns = max(int(value_ns), 0)
+    shift = max(value_ns.bit_length() - SIGNIFICANT_BITS, 0)
+    return shift * _HALF_BUCKETS + (value_ns >> shift)
+
+# Function to find the range of latencies counted in a histogram bucket
+def bucket_bounds(index):
+    """
+    Parameters:
+        index (int): Bucket index from bucket_index.
+
+    Returns:
+        tuple: Lowest and highest latency in nanoseconds that fall into the bucket.
+    """
+    shift = max(index // _HALF_BUCKETS - 1, 0)
+    low = (index - shift * _HALF_BUCKETS) << shift
+    return low, low + (1 << shift) - 1
+
+# Class aggregating the latencies of one function in memory
+class FunctionMetrics:
+    def __init__(self):
+        """
+        Count, sum, min/max and a sparse latency histogram ({bucket index: count}).
+        """
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+        self.histogram = {}
+
+    def record(self, elapsed_ns):
+        """
+        Add one call.
+        :param elapsed_ns: Duration of the call in nanoseconds.
+        """
+        self.count += 1
+        self.total_ns += elapsed_ns
+        self.min_ns = elapsed_ns if self.min_ns is None else min(self.min_ns, elapsed_ns)
+        self.max_ns = elapsed_ns if self.max_ns is None else max(self.max_ns, elapsed_ns)
+        index = bucket_index(elapsed_ns)
+        self.histogram[index] = self.histogram.get(index, 0) + 1
+
+    def merge(self, other):
+        """
+        Add the calls aggregated by another FunctionMetrics.
+        :param other: FunctionMetrics to merge into this one.
+        """
+        if not other.count:
+            return
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.min_ns = other.min_ns if self.min_ns is None else min(self.min_ns, other.min_ns)
+        self.max_ns = other.max_ns if self.max_ns is None else max(self.max_ns, other.max_ns)
+        for index, count in other.histogram.items():
+            self.histogram[index] = self.histogram.get(index, 0) + count
+
+    def percentile(self, percent):
+        """
+        Estimate a latency percentile from the histogram.
+        :param percent: Percentile between 0 and 100.
+        :return: Latency in nanoseconds (midpoint of the bucket, clamped to min/max), or None without calls.
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percent // 100))  # Ceiling: the call at this 1-based rank
+        seen = 0
+        for index in sorted(self.histogram):
+            seen += self.histogram[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min(max((low + high) // 2, self.min_ns), self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {"count": self.count, "total_ns": self.total_ns, "min_ns": self.min_ns, "max_ns": self.max_ns,
+                "histogram": {str(index): count for index, count in sorted(self.histogram.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls()
+        metrics.count = data["count"]
+        metrics.total_ns = data["total_ns"]
+        metrics.min_ns = data["min_ns"]
+        metrics.max_ns = data["max_ns"]
+        metrics.histogram = {int(index): count for index, count in data["histogram"].items()}
+        return metrics
+
+# Class collecting per-function metrics in memory and flushing them in batches from a background thread
+class MetricsRegistry:
+    def __init__(self, path=METRICS_PATH, flush_interval=FLUSH_INTERVAL_SECONDS):
+        """
+        Recording a call only updates in-memory aggregates under a lock. Every flush_interval seconds a
+        daemon thread appends one JSONL line per function with the calls since the previous flush.
+        :param path: JSONL file receiving the metrics.
+        :param flush_interval: Seconds between background flushes.
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self._reset()
+
+    # Fresh state; also used in forked children, which inherit the parent's state but not its thread
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Keeps the lines of concurrent flushes together
+        self._pending = {}
+        self._totals = {}
+        self._thread = None
+        self._stop = None
+        self._finalizer = None  # Exit flush registered by the first _start of this process
+
+    def _start(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="metrics-flush", daemon=True)
+        self._thread.start()
+        # Flush at exit; multiprocessing finalizers also run in pool workers, which skip atexit handlers
+        if self._finalizer is None:
+            from multiprocessing import util
+            self._finalizer = util.Finalize(self, self.close, exitpriority=10)
+
+    def _run(self, stop):
+        while not stop.wait(self.flush_interval):
+            self.flush()
+
+    def record(self, name, elapsed_ns):
+        """
+        Aggregate one call of a function.
+        :param name: Function name.
+        :param elapsed_ns: Duration of the call in nanoseconds.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            metrics = self._pending.get(name)
+            if metrics is None:
+                metrics = self._pending[name] = FunctionMetrics()
+            metrics.record(elapsed_ns)
+            if self._thread is None:
+                self._start()
+
+    def snapshot(self):
+        """
+        :return: Dictionary of function name -> FunctionMetrics for every call recorded by this process.
+        """
+        with self._lock:
+            result = {}
+            for source in (self._totals, self._pending):
+                for name, metrics in source.items():
+                    result.setdefault(name, FunctionMetrics()).merge(metrics)
+            return result
+
+    def flush(self):
+        """
+        Append the calls recorded since the last flush to the JSONL file.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for name, metrics in pending.items():
+                self._totals.setdefault(name, FunctionMetrics()).merge(metrics)
+        if not pending:
+            return
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        lines = [json.dumps({"timestamp": timestamp, "pid": self._pid, "function": name, **metrics.to_dict()})
+                 for name, metrics in pending.items()]
+        with self._write_lock, open(self.path, "a") as log_file:
+            log_file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        """
+        Stop the background thread and write any remaining metrics.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            thread, stop = self._thread, self._stop
+            self._thread = self._stop = None  # A later record starts a new flush thread
+        if thread is not None:
+            stop.set()
+            thread.join()
+        self.flush()
+
+# Registry used by execution_time_decorator
+registry = MetricsRegistry()
+
+# Function to record the duration of one call in the shared registry
+def record_call(name, elapsed_ns):
+    """
+    Parameters:
+        name (str): Function name.
+        elapsed_ns (int): Duration in nanoseconds, e.g. from time.perf_counter_ns().
+    """
+    registry.record(name, elapsed_ns)
+
+# Function to merge the JSONL metrics written by every flush and process
+def read_metrics(path=METRICS_PATH):
+    """
+    Parameters:
+        path (str): JSONL metrics file.
+
+    Returns:
+        dict: Function name -> FunctionMetrics with all recorded calls.
+    """
+    merged = {}
+    with open(path, "r") as log_file:
+        for line in log_file:
+            if line.strip():
+                data = json.loads(line)
+                merged.setdefault(data["function"], FunctionMetrics()).merge(FunctionMetrics.from_dict(data))
+    return merged
+
+# Function to summarize latency percentiles per function from a metrics file
+def summarize_metrics(path=METRICS_PATH):
+    """
+    Parameters:
+        path (str): JSONL metrics file.
+
+    Returns:
+        dict: Function name -> {"count", "mean_ms", "min_ms", "max_ms", "p50_ms", "p95_ms", "p99_ms"}.
+    """
+    summary = {}
+    for name, metrics in sorted(read_metrics(path).items()):
+        summary[name] = {
+            "count": metrics.count,
+            "mean_ms": metrics.total_ns / metrics.count / 1e6,
+            "min_ms": metrics.min_ns / 1e6,
+            "max_ms": metrics.max_ns / 1e6,
+            "p50_ms": metrics.percentile(50) / 1e6,
+            "p95_ms": metrics.percentile(95) / 1e6,
+            "p99_ms": metrics.percentile(99) / 1e6,
+        }
+    return summary
+
+# Command-line entry point printing the latency summary of a metrics file
+def run_metrics_report(argv=None):
+    """
+    Parameters:
+        argv (list): Command-line arguments (default: sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(description="Summarize TarjanPlanner function latencies.")
+    parser.add_argument("path", nargs="?", default=METRICS_PATH, help=f"JSONL metrics file (default {METRICS_PATH})")
+    args = parser.parse_args(argv)
+
+    print(f"{'Function':<32}{'Count':>8}{'Mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'Max ms':>12}")
+    for name, row in summarize_metrics(args.path).items():
+        print(f"{name:<32}{row['count']:>8}{row['mean_ms']:>12.3f}{row['p50_ms']:>12.3f}"
+              f"{row['p95_ms']:>12.3f}{row['p99_ms']:>12.3f}{row['max_ms']:>12.3f}")
+
+if __name__ == "__main__":
+    run_metrics_report()
@@ -0,0 +1,167 @@
+import numpy as np
+from shortest_path_calculation import haversine_array, location_coordinates
+
+# Function to keep only the Pareto-optimal (cost, time) labels of a label set
+def pareto_front(costs, times):
+    """
+    Dominance pruning: a label is dropped when another label is no more expensive and no slower.
+    Of several identical labels only the first one is kept.
+
+    Parameters:
+        costs (ndarray): Label costs.
+        times (ndarray): Label times in hours.
+
+    Returns:
+        ndarray: Indices of the non-dominated labels, sorted by increasing cost (and decreasing time).
+    """
+    order = np.lexsort((np.arange(len(costs)), times, costs))  # By cost, then time, then position
+    sorted_times = times[order]
+    keep = np.ones(len(order), dtype=bool)
+    # After sorting by cost, a label survives only if it is strictly faster than every cheaper label
+    keep[1:] = sorted_times[1:] < np.minimum.accumulate(sorted_times)[:-1]
+    return order[keep]
+
+# Function to thin a frontier to at most max_labels labels spread evenly along it
+def _thin(front, max_labels):
+    """
+    Parameters:
+        front (ndarray): Label indices sorted along the frontier, as returned by pareto_front.
+        max_labels (int): Maximum number of labels to keep, or None to keep all.
+
+    Returns:
+        ndarray: The cheapest and fastest labels and evenly spaced labels in between.
+    """
+    if max_labels is None or len(front) <= max_labels:
+        return front
+    return front[np.unique(np.linspace(0, len(front) - 1, max_labels).round().astype(np.int64))]
+
+# Function to find every Pareto-optimal assignment of transport modes to the legs of a route
+def pareto_journey(locations, transport_modes, journey_path, switch_time_min=5.0, switch_cost=0.0,
+                   max_labels=None):
+    """
+    Label-setting dynamic programming over the legs of a route. A label is the (cost, time) of one way
+    to travel the legs so far, ending on a given mode. Staying on a mode costs only the leg itself;
+    boarding a mode (on the first leg or after a switch) adds its transfer time, and every mode switch
+    adds switch_time_min and switch_cost. After each leg only non-dominated labels per mode are kept,
+    so the label sets stay small even for hundreds of legs and dozens of modes.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+        transport_modes (list): List of available TransportMode objects.
+        journey_path (list): List of location names in the order of travel.
+        switch_time_min (float): Extra time in minutes for every change of transport mode.
+        switch_cost (float): Extra cost for every change of transport mode.
+        max_labels (int): Optional cap on labels kept per mode and leg; trades exactness for speed.
+
+    Returns:
+        list: The Pareto frontier as dictionaries sorted by increasing cost (and decreasing time):
+              - "Cost", "Time": Journey totals (time in hours).
+              - "Modes": Transport mode name of every leg.
+              - "Switches": Number of mode changes.
+              - "Segments": Per-leg "Segment", "Mode", "Cost", "Time" and "Distance", where "Time"
+                includes boarding and switching on that leg.
+    """
+    if not transport_modes:
+        raise ValueError("No transport modes to choose from")
+    if len(journey_path) < 2:
+        return [{"Cost": 0.0, "Time": 0.0, "Modes": [], "Switches": 0, "Segments": []}]
+
+    coords = location_coordinates(locations, journey_path)
+    distances = haversine_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    costs_per_km = np.array([mode.cost_per_km for mode in transport_modes], dtype=np.float64)
+    speeds = np.array([mode.speed_kmh for mode in transport_modes], dtype=np.float64)
+    boarding_hours = np.array([mode.transfer_time_min / 60 for mode in transport_modes], dtype=np.float64)
+    switch_hours = switch_time_min / 60
+
+    # Legs x modes cost and riding time; boarding and switching are added by the transitions
+    leg_costs = distances[:, None] * costs_per_km[None, :]
+    leg_times = distances[:, None] / speeds[None, :]
+    mode_count = len(transport_modes)
+
+    # labels[m] = (costs, times) of the labels ending on mode m after the current leg. Labels of a leg
+    # are also numbered flat, mode by mode; parents[leg] holds each label's flat parent on the previous leg
+    labels = [(leg_costs[0, m:m + 1].copy(), leg_times[0, m:m + 1] + boarding_hours[m]) for m in range(mode_count)]
+    label_modes = [np.arange(mode_count)]
+    parents = [np.full(mode_count, -1)]
+
+    for leg in range(1, len(distances)):
+        # Frontier over all modes: the only labels worth switching from
+        all_costs = np.concatenate([costs for costs, _ in labels])
+        all_times = np.concatenate([times for _, times in labels])
+        offsets = np.cumsum([0] + [len(costs) for costs, _ in labels])
+        front = pareto_front(all_costs, all_times)
+        front_modes = label_modes[-1][front]
+
+        new_labels, new_parents = [], []
+        for m in range(mode_count):
+            # Switching from the same mode is never better than staying on it, so leave those out
+            candidates = np.concatenate([np.arange(offsets[m], offsets[m + 1]), front[front_modes != m]])
+            stay_count = offsets[m + 1] - offsets[m]
+            costs = all_costs[candidates] + leg_costs[leg, m]
+            times = all_times[candidates] + leg_times[leg, m]
+            costs[stay_count:] += switch_cost
+            times[stay_count:] += switch_hours + boarding_hours[m]
+
+            keep = _thin(pareto_front(costs, times), max_labels)
+            new_labels.append((costs[keep], times[keep]))
+            new_parents.append(candidates[keep])
+        labels = new_labels
+        label_modes.append(np.concatenate([np.full(len(costs), m) for m, (costs, _) in enumerate(labels)]))
+        parents.append(np.concatenate(new_parents))
+
+    # Final frontier over all modes, then walk all its labels back to the first leg at once
+    all_costs = np.concatenate([costs for costs, _ in labels])
+    all_times = np.concatenate([times for _, times in labels])
+    final = pareto_front(all_costs, all_times)
+    mode_table = np.empty((len(final), len(distances)), dtype=np.int64)
+    position = final
+    for leg in range(len(distances) - 1, -1, -1):
+        mode_table[:, leg] = label_modes[leg][position]
+        position = parents[leg][position]
+
+    frontier = []
+    for label, modes in zip(final, mode_table.tolist()):
+        segments = []
+        for leg, mode in enumerate(modes):
+            cost = float(leg_costs[leg, mode])
+            time = float(leg_times[leg, mode])
+            if leg == 0 or modes[leg - 1] != mode:
+                time += float(boarding_hours[mode])
+            if leg > 0 and modes[leg - 1] != mode:
+                cost += switch_cost
+                time += switch_hours
+            segments.append({"Segment": f"{journey_path[leg]} -> {journey_path[leg + 1]}",
+                             "Mode": transport_modes[mode].name, "Cost": cost, "Time": time,
+                             "Distance": float(distances[leg])})
+        frontier.append({
+            "Cost": float(all_costs[label]),
+            "Time": float(all_times[label]),
+            "Modes": [transport_modes[mode].name for mode in modes],
+            "Switches": sum(1 for a, b in zip(modes, modes[1:]) if a != b),
+            "Segments": segments,
+        })
+    return frontier
+
+# Function to pick one trade-off from a Pareto frontier without re-solving
+def choose_journey(frontier, max_time=None, max_cost=None, cost_per_hour=None):
+    """
+    Parameters:
+        frontier (list): Frontier returned by pareto_journey.
+        max_time (float): Return the cheapest journey taking at most this many hours.
+        max_cost (float): Return the fastest journey costing at most this much.
+        cost_per_hour (float): Value of time; return the journey minimizing cost + cost_per_hour * time.
+
+    Returns:
+        dict: The chosen journey, or None if no journey meets the limits.
+              Without any argument the cheapest journey is returned.
+    """
+    options = [journey for journey in frontier
+               if (max_time is None or journey["Time"] <= max_time)
+               and (max_cost is None or journey["Cost"] <= max_cost)]
+    if not options:
+        return None
+    if cost_per_hour is not None:
+        return min(options, key=lambda journey: journey["Cost"] + cost_per_hour * journey["Time"])
+    if max_cost is not None and max_time is None:
+        return min(options, key=lambda journey: journey["Time"])
+    return min(options, key=lambda journey: journey["Cost"])
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from calculate_journey import calculate_journey, calculate_journey_batch
+from route_solver import solve_route
+from shortest_path_calculation import LocationTable, distance_matrix_dtype
+
+PLAN_CACHE_VERSION = 3  # Part of every key: bump it when the solvers' results change
+PLAN_CACHE_SIZE = 256  # Plans kept in memory per process
+PLAN_CACHE_PATH = os.path.join(".planner_cache", "plans.sqlite")  # Default disk tier used by main.py
+PLAN_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Disk tier size above which least recently used plans are evicted
+
+# Function to hash a planning problem canonically
+def plan_key(locations, transport_modes, **parameters):
+    """
+    The key covers every input the result depends on: location names and coordinates in order (the
+    solvers number locations by position, so order matters with a fixed seed), every transport mode
+    parameter, the solver parameters, the distance matrix dtype (a float32 DistanceMatrixStore can
+    lead to different tours) and PLAN_CACHE_VERSION. Floats are written with repr, so equal values
+    always give the same key and different values never do.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates, or a LocationTable.
+        transport_modes (list): List of TransportMode objects.
+        parameters: Solver parameters (start, seed, options, ...); values must be JSON-serializable.
+
+    Returns:
+        str: Hex digest identifying the planning problem.
+    """
+    if isinstance(locations, LocationTable):
+        coordinates = locations.coordinates.tolist()
+    else:
+        coordinates = [[float(latitude), float(longitude)] for latitude, longitude in locations.values()]
+    document = {
+        "version": PLAN_CACHE_VERSION,
+        "locations": [[name, *coords] for name, coords in zip(locations.keys(), coordinates)],
+        "modes": [[mode.name, float(mode.speed_kmh), float(mode.cost_per_km), float(mode.transfer_time_min)]
+                  for mode in transport_modes],
+        "parameters": parameters,
+        "distance_dtype": distance_matrix_dtype(locations).name,
+    }
+    encoded = json.dumps(document, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+# Class caching journey plans in an in-memory LRU tier and an optional SQLite tier
+class PlanningCache:
+    def __init__(self, max_entries=PLAN_CACHE_SIZE, path=None, max_bytes=PLAN_CACHE_MAX_BYTES):
+        """
+        Lookups check the in-memory tier first (a dictionary access, microseconds), then the SQLite
+        file, whose hits are promoted to memory. The file is shared by every process and run using the
+        same path; when it grows beyond max_bytes the least recently used plans are deleted.
+        Cached plans are shared with the caller and must not be modified.
+        :param max_entries: Plans kept in memory before the least recently used one is evicted.
+        :param path: SQLite file of the disk tier, or None for memory only.
+        :param max_bytes: Size of the pickled plans on disk above which eviction starts.
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_hits = 0  # Lookups answered from memory
+        self.disk_hits = 0  # Lookups answered from the SQLite tier
+        self.misses = 0  # Lookups that had to be computed
+        self.memory_evictions = 0  # Plans dropped from memory
+        self.disk_evictions = 0  # Plans deleted from the SQLite tier
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    # Pickled with the settings only: every process opens its own connection and starts with an empty memory tier
+    def __getstate__(self):
+        return {"max_entries": self.max_entries, "path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    # SQLite connection of this process, opened on first use
+    def _database(self):
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")  # Readers do not wait for writers
+            self._connection.execute("CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                                     "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used)")
+            self._pid = os.getpid()
+        return self._connection
+
+    # Insert into the memory tier, evicting the least recently used plan when full
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.memory_evictions += 1
+
+    def get(self, key):
+        """
+        Look up a plan.
+        :param key: Key from plan_key.
+        :return: The cached plan, or None.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.memory_hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if self.path is not None:
+                database = self._database()
+                row = database.execute("SELECT value FROM plans WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    database.execute("UPDATE plans SET last_used = ? WHERE key = ?", (time.time(), key))
+                    value = pickle.loads(row[0])
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Store a plan in memory and, with a disk tier, in the SQLite file.
+        :param key: Key from plan_key.
+        :param value: Picklable plan.
+        """
+        with self._lock:
+            self._remember(key, value)
+            if self.path is None:
+                return
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            database = self._database()
+            database.execute("INSERT OR REPLACE INTO plans (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                             (key, blob, len(blob), time.time()))
+            self._evict(database)
+
+    # Delete the least recently used plans until the disk tier fits in max_bytes
+    def _evict(self, database):
+        excess = (database.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]) - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in database.execute("SELECT key, size FROM plans ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        database.executemany("DELETE FROM plans WHERE key = ?", victims)
+        self.disk_evictions += len(victims)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached plan for key, or compute, store and return it.
+        :param key: Key from plan_key.
+        :param compute: Function without arguments computing the plan.
+        :return: The plan.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        """
+        :return: Dictionary with the hit/miss/eviction counters, "hit_rate", the number of plans in
+                 memory and, with a disk tier, the number and total size of plans on disk.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                     "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                     "memory_entries": len(self._entries), "memory_evictions": self.memory_evictions,
+                     "disk_evictions": self.disk_evictions}
+            if self.path is not None:
+                stats["disk_entries"], stats["disk_bytes"] = self._database().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+            return stats
+
+    def clear(self):
+        """
+        Drop every cached plan from both tiers.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self.path is not None:
+                self._database().execute("DELETE FROM plans")
+
+    def close(self):
+        """
+        Close the SQLite connection; it is reopened if the cache is used again.
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+# Cache used by plan_journey when none is given, set with use_planning_cache
+_planning_cache = PlanningCache()
+
+# Function to set the cache plan_journey uses by default
+def use_planning_cache(cache):
+    """
+    Parameters:
+        cache (PlanningCache): Cache to use from now on in this process.
+
+    Returns:
+        PlanningCache: The previously used cache.
+    """
+    global _planning_cache
+    previous, _planning_cache = _planning_cache, cache
+    return previous
+
+# Function to plan a route and its transport modes, reusing the plan of an identical earlier request
+def plan_journey(locations, transport_modes, start="Tarjan", seed=42, columnar=False, cache=None,
+                 **solver_options):
+    """
+    Cached solve_route followed by calculate_journey. The solvers are deterministic for a given seed,
+    so a cached plan is exactly what re-solving would return. All three criteria are computed
+    together, so one plan serves every criterion.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+        transport_modes (list): List of available TransportMode objects.
+        start (str): Name of the location the route starts from, or None for any start.
+        seed (int): Seed for the heuristic solvers.
+        columnar (bool): Evaluate the journey with calculate_journey_batch instead of calculate_journey.
+        cache (PlanningCache): Cache to use (default: the one set with use_planning_cache).
+        solver_options: Extra keyword arguments for solve_route; must be JSON-serializable.
+
+    Returns:
+        tuple: (distance, path, journey, journey_distance) with the route from solve_route and the
+               journey results from calculate_journey (or calculate_journey_batch).
+    """
+    cache = _planning_cache if cache is None else cache
+    key = plan_key(locations, transport_modes, start=start, seed=seed, columnar=columnar, options=solver_options)
+
+    def compute():
+        distance, path = solve_route(locations, start=start, seed=seed, suppress_output=True, **solver_options)
+        evaluate = calculate_journey_batch if columnar else calculate_journey
+        journey, journey_distance = evaluate(locations, transport_modes, path)
+        return distance, path, journey, journey_distance
+
+    return cache.get_or_compute(key, compute)
@@ -0,0 +1,186 @@
+import numpy as np
+from shortest_path_calculation import haversine_array, location_coordinates
+
+REPAIR_WINDOW = 8  # Positions on each side of an edit that the local improvement may rearrange
+REPAIR_MAX_MOVES = 50  # Improving moves applied per window at most
+REPAIR_MAX_SEGMENT_LENGTH = 3  # Longest segment moved by an Or-opt move
+REPAIR_EPSILON = 1e-10  # Minimum gain for a move to count as an improvement
+
+# Function to compute the pairwise distances of a few points
+def _pairwise_distances(coords):
+    return haversine_array(coords[:, None, 0], coords[:, None, 1], coords[None, :, 0], coords[None, :, 1])
+
+# Function to improve a short path whose first and last locations stay in place
+def _improve_window(matrix, max_moves=REPAIR_MAX_MOVES, max_segment_length=REPAIR_MAX_SEGMENT_LENGTH):
+    """
+    Best-improvement 2-opt and Or-opt on a window of a route. The window is small, so every move is
+    evaluated with array arithmetic instead of candidate lists.
+
+    Parameters:
+        matrix (ndarray): Pairwise distances of the window's locations, in their current order.
+        max_moves (int): Maximum number of improving moves to apply.
+        max_segment_length (int): Longest segment moved by an Or-opt move.
+
+    Returns:
+        ndarray: New order of the window as positions into matrix, starting with 0 and ending with m - 1.
+    """
+    size = len(matrix)
+    order = np.arange(size)
+    if size < 4:
+        return order
+    inner = np.arange(1, size - 1)
+    for _ in range(max_moves):
+        ordered = matrix[np.ix_(order, order)]
+        legs = np.diagonal(ordered, offset=1)  # legs[k]: edge between positions k and k + 1
+
+        # 2-opt: reversing positions i..j replaces edges (i-1, i) and (j, j+1) with (i-1, j) and (i, j+1)
+        i, j = inner[:, None], inner[None, :]
+        delta = ordered[i - 1, j] + ordered[i, j + 1] - legs[i - 1] - legs[j]
+        delta = np.where(j > i, delta, np.inf)
+        best_i, best_j = np.unravel_index(np.argmin(delta), delta.shape)
+        best_delta, best_move = delta[best_i, best_j], ("two_opt", inner[best_i], inner[best_j])
+
+        # Or-opt: move positions i..end between positions x and x + 1, in either orientation
+        for length in range(1, max_segment_length + 1):
+            for start in range(1, size - length):
+                end = start + length - 1
+                removal_gain = legs[start - 1] + legs[end] - ordered[start - 1, end + 1]
+                if removal_gain <= REPAIR_EPSILON:
+                    continue
+                gaps = np.concatenate([np.arange(0, start - 1), np.arange(end + 1, size - 1)])
+                if not len(gaps):
+                    continue
+                for near, far, reverse in ((start, end, False), (end, start, True)):
+                    gains = ordered[gaps, near] + ordered[far, gaps + 1] - legs[gaps] - removal_gain
+                    best = int(np.argmin(gains))
+                    if gains[best] < best_delta:
+                        best_delta, best_move = gains[best], ("or_opt", start, end, int(gaps[best]), reverse)
+
+        if best_delta >= -REPAIR_EPSILON:
+            break
+        if best_move[0] == "two_opt":
+            _, start, end = best_move
+            order[start:end + 1] = order[start:end + 1][::-1].copy()
+        else:
+            _, start, end, gap, reverse = best_move
+            segment = order[start:end + 1][::-1] if reverse else order[start:end + 1]
+            rest = np.concatenate([order[:start], order[end + 1:]])
+            insert_at = gap + 1 if gap < start else gap + 1 - (end - start + 1)  # After position gap in rest
+            order = np.concatenate([rest[:insert_at], segment, rest[insert_at:]])
+    return order
+
+# Function to rearrange the positions near some points of a route with 2-opt / Or-opt, leaving the rest in place
+def improve_around(path, coords, positions, window=REPAIR_WINDOW, fixed_start=True, max_moves=REPAIR_MAX_MOVES):
+    """
+    Windows of `window` positions on each side of the given positions are merged where they overlap and
+    improved independently with _improve_window. Also used to stitch sub-routes together.
+
+    Parameters:
+        path (list): Route as a list of location names, modified in place.
+        coords (ndarray): (len(path), 2) latitude/longitude array of the route, modified in place.
+        positions (iterable): Route positions around which to improve (e.g. edits or seams).
+        window (int): Positions on each side that may be rearranged.
+        fixed_start (bool): Keep the first location of the route in place.
+        max_moves (int): Improving moves applied per window at most.
+    """
+    size = len(path)
+    spans = sorted((max(position - window, 0), min(position + window, size - 1)) for position in positions)
+    merged = []
+    for low, high in spans:
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    for low, high in merged:
+        low = max(low, 1) if fixed_start else low
+        if high - low < 1:
+            continue
+        # The locations just outside the window stay in place; an open end is a zero-distance virtual location
+        outer = np.arange(max(low - 1, 0), min(high + 1, size - 1) + 1)
+        matrix = _pairwise_distances(coords[outer])
+        free_head, free_tail = outer[0] == low, outer[-1] == high
+        matrix = np.pad(matrix, ((int(free_head), int(free_tail)), (int(free_head), int(free_tail))))
+        order = _improve_window(matrix, max_moves)
+        moved = np.concatenate([[-1] if free_head else [], outer, [-1] if free_tail else []]).astype(np.int64)
+        moved = moved[order][int(free_head):len(order) - int(free_tail)]
+        path[outer[0]:outer[-1] + 1] = [path[position] for position in moved]
+        coords[outer] = coords[moved]
+
+# Function to update an existing route after stops are added or removed, without re-solving it
+def repair_route(locations, path, added=(), removed=(), fixed_start=True, window=REPAIR_WINDOW,
+                 max_moves=REPAIR_MAX_MOVES):
+    """
+    Removed stops are spliced out (their neighbours are joined), added stops are placed one by one at
+    their cheapest insertion position, and a bounded 2-opt / Or-opt pass then rearranges only the
+    positions within `window` of each edit. Distances are computed from the coordinates of the
+    affected locations, so an edit costs O(len(path)) array work plus a few small windows, however
+    long the route is.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a
+                          LocationTable. Must contain the added stops.
+        path (list): Current route as a list of location names.
+        added (iterable): Names of stops to add to the route.
+        removed (iterable): Names of stops to remove from the route.
+        fixed_start (bool): Keep the first location of the route (e.g. "Tarjan") in place.
+        window (int): Positions on each side of an edit that the local improvement may rearrange.
+        max_moves (int): Improving moves applied per window at most.
+
+    Returns:
+        tuple: (distance, path, changed_legs) with the new total distance in kilometers, the new route,
+               and the sorted indices of the legs of the new route (leg i goes from path[i] to
+               path[i + 1]) that are not legs of the old route. Only those need re-evaluating,
+               e.g. with calculate_journey.update_journey.
+    """
+    added, removed = list(added), set(removed)
+    if len(set(added)) != len(added):
+        raise ValueError("Stops to add must be distinct")
+    missing = removed.difference(path)
+    if missing:
+        raise ValueError(f"Cannot remove stops that are not on the route: {sorted(missing)}")
+    if fixed_start and path and path[0] in removed:
+        raise ValueError(f"Cannot remove the fixed start {path[0]}; pass fixed_start=False to move the start")
+    on_route = set(path).intersection(added)
+    if on_route:
+        raise ValueError(f"Stops to add are already on the route: {sorted(on_route)}")
+    unknown = [name for name in added if name not in locations]
+    if unknown:
+        raise ValueError(f"Stops to add have no coordinates: {unknown}")
+
+    # Splice out the removed stops; their former neighbours are the edit points
+    touched = set()
+    new_path = []
+    for position, name in enumerate(path):
+        if name in removed:
+            if new_path:
+                touched.add(new_path[-1])
+            continue
+        if position > 0 and path[position - 1] in removed:
+            touched.add(name)
+        new_path.append(name)
+    coords = location_coordinates(locations, new_path)
+
+    # Cheapest insertion of every added stop: between two neighbours, at the end, or (free start) at the front
+    for name in added:
+        point = location_coordinates(locations, [name])[0]
+        if not new_path:
+            position = 0
+        else:
+            to_point = haversine_array(point[0], point[1], coords[:, 0], coords[:, 1])
+            legs = haversine_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+            costs = np.concatenate([[np.inf if fixed_start else to_point[0]],
+                                    to_point[:-1] + to_point[1:] - legs, [to_point[-1]]])
+            position = int(np.argmin(costs))  # Insert before new_path[position]
+        new_path.insert(position, name)
+        coords = np.insert(coords, position, point, axis=0)
+        touched.add(name)
+
+    # Local improvement in merged windows around the edit points
+    index = {name: position for position, name in enumerate(new_path)}
+    improve_around(new_path, coords, [index[name] for name in touched if name in index], window, fixed_start,
+                   max_moves)
+
+    legs = haversine_array(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+    old_legs = set(zip(path, path[1:]))
+    changed_legs = [leg for leg, pair in enumerate(zip(new_path, new_path[1:])) if pair not in old_legs]
+    return float(legs.sum()), new_path, changed_legs
@@ -0,0 +1,145 @@
+import numpy as np
+from shortest_path_calculation import build_distance_matrix, genetic_algorithm, local_search_route
+from exceptions_and_decorators import execution_time_decorator
+
+HELD_KARP_MAX_LOCATIONS = 20  # Beyond this the DP tables no longer fit comfortably in memory
+HELD_KARP_BLOCK_MASKS = 4096  # Subsets relaxed per vectorized step to bound temporary arrays
+CLUSTER_MIN_LOCATIONS = 5000  # From this size on, routes are solved by clustering instead of one genetic algorithm
+
+# Function to find the exact shortest open path with bitmask dynamic programming (Held-Karp)
+def held_karp(distance_matrix, start=None):
+    """
+    Solve the open-path traveling salesman problem exactly in O(2^n * n^2) time. The DP table holds
+    float32 costs (about 84 MB at HELD_KARP_MAX_LOCATIONS with a free start); the returned distance
+    is summed in float64 along the path found.
+
+    Parameters:
+        distance_matrix (ndarray): Pairwise distance matrix from build_distance_matrix.
+        start (int): Location id the path must start from, or None to let it start anywhere.
+
+    Returns:
+        tuple: Shortest distance and the path as a NumPy int32 array of location ids.
+    """
+    size = len(distance_matrix)
+    if size > HELD_KARP_MAX_LOCATIONS:
+        raise ValueError(f"Held-Karp supports at most {HELD_KARP_MAX_LOCATIONS} locations, got {size}")
+    if size == 0:
+        return 0.0, np.empty(0, dtype=np.int32)
+
+    if start is None:
+        # A free start is a fixed start at a virtual location that is zero distance from everything
+        augmented = np.zeros((size + 1, size + 1), dtype=np.float64)
+        augmented[:size, :size] = distance_matrix
+        path = _held_karp_path(augmented, size)[1:]
+    else:
+        path = _held_karp_path(distance_matrix, start)
+    distance = float(np.asarray(distance_matrix)[path[:-1], path[1:]].sum(dtype=np.float64))
+    return distance, path
+
+# Function to run the Held-Karp dynamic programme from a fixed start location
+def _held_karp_path(distance_matrix, start):
+    """
+    :param distance_matrix: Pairwise distance matrix, possibly with a virtual start location.
+    :param start: Location id the path must start from.
+    :return: Shortest path as a NumPy int32 array of location ids, starting with start.
+    """
+    size = len(distance_matrix)
+    others = np.array([location_id for location_id in range(size) if location_id != start], dtype=np.int32)
+    count = len(others)
+    if count == 0:
+        return np.array([start], dtype=np.int32)
+    sub_matrix = np.asarray(distance_matrix[np.ix_(others, others)], dtype=np.float32)
+    bits = np.arange(count)
+
+    # dp[mask, j]: shortest path from start through the subset `mask` of others, ending at others[j]
+    dp = np.full((1 << count, count), np.inf, dtype=np.float32)
+    parent = np.full((1 << count, count), -1, dtype=np.int8)
+    dp[1 << bits, bits] = distance_matrix[start, others]
+
+    masks = np.arange(1 << count)
+    popcount = np.zeros(1 << count, dtype=np.int8)
+    for bit in bits:
+        popcount += (masks >> bit) & 1
+
+    # Extend every subset of size s by one location, layer by layer
+    for subset_size in range(1, count):
+        layer = np.flatnonzero(popcount == subset_size)
+        for block_start in range(0, len(layer), HELD_KARP_BLOCK_MASKS):
+            block = layer[block_start:block_start + HELD_KARP_BLOCK_MASKS]
+            cost = dp[block][:, :, None] + sub_matrix[None, :, :]  # (mask, last, next)
+            best_last = cost.argmin(axis=1)
+            best_cost = np.take_along_axis(cost, best_last[:, None, :], axis=1)[:, 0, :]
+            rows, nexts = np.nonzero(((block[:, None] >> bits) & 1) == 0)  # Locations not yet in the subset
+            targets = block[rows] | (1 << nexts)
+            dp[targets, nexts] = best_cost[rows, nexts]
+            parent[targets, nexts] = best_last[rows, nexts]
+
+    # Walk the parent table back from the best final location
+    mask = (1 << count) - 1
+    last = int(np.argmin(dp[mask]))
+    reversed_path = []
+    while last != -1:
+        reversed_path.append(others[last])
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous
+    return np.array([start] + reversed_path[::-1], dtype=np.int32)
+
+# Decorated function solving a route exactly with Held-Karp
+@execution_time_decorator
+def held_karp_route(locations, start="Tarjan"):
+    """
+    Find the exact shortest route through all locations.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude).
+        start (str): Name of the location the route starts from, or None for any start.
+
+    Returns:
+        tuple: Shortest distance and path, as returned by genetic_algorithm.
+    """
+    location_names, distance_matrix = build_distance_matrix(locations)
+    start_id = None if start is None else location_names.index(start)
+    distance, tour = held_karp(distance_matrix, start_id)
+    return distance, [location_names[location_id] for location_id in tour]
+
+# Decorated function choosing the exact solver for small routes and heuristics for large ones
+@execution_time_decorator
+def solve_route(locations, start="Tarjan", exact_max_locations=16, seed=42, cluster_min_locations=CLUSTER_MIN_LOCATIONS,
+                use_genetic_algorithm=False, **genetic_algorithm_options):
+    """
+    Solve a route with the best-suited solver: Held-Karp (optimal) for up to exact_max_locations
+    locations, a 2-opt / Or-opt local search from a nearest-neighbour tour up to
+    cluster_min_locations, and cluster_solve_route for larger location sets. On city-scale location
+    sets the local search alone gives shorter routes than starting it from the genetic algorithm's
+    result, at a fraction of the time, so the genetic algorithm only runs on request.
+
+    Parameters:
+        locations (dict): Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+        start (str): Name of the location the route starts from, or None for any start.
+        exact_max_locations (int): Largest number of locations solved exactly.
+        seed (int): Seed for the heuristic solvers.
+        cluster_min_locations (int): Smallest number of locations solved by cluster_solve_route.
+        use_genetic_algorithm (bool): Also improve the genetic_algorithm result with the local search and
+                                      keep the shorter of the two routes.
+        genetic_algorithm_options: Extra keyword arguments for genetic_algorithm (used with use_genetic_algorithm).
+
+    Returns:
+        tuple: Best distance and path found.
+    """
+    if start is not None and start not in locations:
+        raise ValueError(f"Start location {start} is not in the locations")
+    if len(locations) <= min(exact_max_locations, HELD_KARP_MAX_LOCATIONS):
+        return held_karp_route(locations, start=start, suppress_output=True)
+
+    if len(locations) >= cluster_min_locations:
+        from cluster_solver import cluster_solve_route  # Imported here: only very large routes need it
+        return cluster_solve_route(locations, start=start, seed=seed, suppress_output=True)
+
+    best = local_search_route(locations, start=start, suppress_output=True)
+    if use_genetic_algorithm:
+        genetic_algorithm_options.setdefault("stall_generations", 100)
+        _, path = genetic_algorithm(locations, seed=seed, suppress_output=True, **genetic_algorithm_options)
+        best = min(best, local_search_route(locations, start=start, initial_path=path, suppress_output=True),
+                   key=lambda result: result[0])
+    return best
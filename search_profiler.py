@@ -0,0 +1,127 @@
+import csv
+import time
+import numpy as np
+
+# Phases of a generation timed by SearchProfiler, in the order they appear in the trace
+PHASES = ("selection", "crossover", "mutation", "fitness")
+
+# Columns of a search trace: one row per generation, generation 0 being the initial population
+TRACE_COLUMNS = ("generation", "best_distance", "best_so_far", "mean_distance", "diversity", "evaluations",
+                 "cache_hits") + tuple(f"{phase}_ns" for phase in PHASES) + ("generation_ns",)
+
+# Trace columns holding floats; the others are integer counters and nanoseconds
+FLOAT_COLUMNS = ("best_distance", "best_so_far", "mean_distance", "diversity")
+
+# Function to pick the NumPy type of a trace column
+def _column_dtype(column):
+    return np.float64 if column in FLOAT_COLUMNS else np.int64
+
+# Class collecting per-generation counters and phase timings of a genetic algorithm run
+class SearchProfiler:
+    def __init__(self, callbacks=None):
+        """
+        Opt-in instrumentation for genetic_algorithm / iter_genetic_algorithm (pass it as profiler=).
+        Without a profiler the search takes its uninstrumented path and pays nothing.
+        :param callbacks: Optional list of functions called with each generation's row (a dict keyed
+                          by TRACE_COLUMNS) as soon as the generation ends, e.g. for live logging.
+        """
+        self.callbacks = list(callbacks or [])
+        self.rows = []
+        self._phase_ns = dict.fromkeys(PHASES, 0)
+        self._generation_start = None
+        self._evaluations = 0
+        self._hits = 0
+        self._best_so_far = None
+
+    def on_generation(self, callback):
+        """
+        Register a function called with every following generation's row.
+        :param callback: Function taking the row dictionary.
+        """
+        self.callbacks.append(callback)
+
+    def begin_generation(self):
+        """
+        Start timing a generation and reset its phase timers.
+        """
+        self._phase_ns = dict.fromkeys(PHASES, 0)
+        self._generation_start = time.perf_counter_ns()
+
+    def add_phase_time(self, phase, elapsed_ns):
+        """
+        Charge time to a phase of the current generation.
+        :param phase: One of PHASES.
+        :param elapsed_ns: Duration in nanoseconds.
+        """
+        self._phase_ns[phase] += elapsed_ns
+
+    def end_generation(self, generation, population, fitness_cache):
+        """
+        Close the current generation: record its statistics and notify the callbacks.
+        :param generation: Generation number (0 for the initial population).
+        :param population: List of Individual objects after the generation.
+        :param fitness_cache: FitnessCache of the search, whose counters give the evaluations and hits.
+        """
+        # Imported here: shortest_path_calculation calls into this class but does not import it
+        from shortest_path_calculation import population_diversity
+
+        generation_ns = time.perf_counter_ns() - self._generation_start
+        distances = np.array([individual.distance for individual in population], dtype=np.float64)
+        best_distance = float(distances.min())
+        self._best_so_far = best_distance if self._best_so_far is None else min(self._best_so_far, best_distance)
+        row = {
+            "generation": generation,
+            "best_distance": best_distance,
+            "best_so_far": self._best_so_far,
+            "mean_distance": float(distances.mean()),
+            "diversity": population_diversity(population),
+            "evaluations": fitness_cache.evaluations - self._evaluations,
+            "cache_hits": fitness_cache.hits - self._hits,
+            **{f"{phase}_ns": elapsed for phase, elapsed in self._phase_ns.items()},
+            "generation_ns": generation_ns,
+        }
+        self._evaluations = fitness_cache.evaluations
+        self._hits = fitness_cache.hits
+        self.rows.append(row)
+        for callback in self.callbacks:
+            callback(row)
+
+    def to_arrays(self):
+        """
+        :return: Dictionary of column name -> NumPy array, one entry per generation.
+        """
+        return {column: np.array([row[column] for row in self.rows], dtype=_column_dtype(column))
+                for column in TRACE_COLUMNS}
+
+    def phase_totals(self):
+        """
+        :return: Dictionary of phase -> total seconds over the whole run.
+        """
+        return {phase: sum(row[f"{phase}_ns"] for row in self.rows) / 1e9 for phase in PHASES}
+
+    def save(self, file_path):
+        """
+        Export the trace: compressed NumPy arrays for a .npz path, CSV for anything else.
+        :param file_path: Output path ending in .npz or .csv.
+        """
+        if str(file_path).endswith(".npz"):
+            np.savez_compressed(file_path, **self.to_arrays())
+            return
+        with open(file_path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=TRACE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+# Function to read a trace written by SearchProfiler.save
+def load_search_trace(file_path):
+    """
+    :param file_path: Path of a .npz or .csv trace.
+    :return: Dictionary of column name -> NumPy array, as returned by SearchProfiler.to_arrays.
+    """
+    if str(file_path).endswith(".npz"):
+        with np.load(file_path) as data:
+            return {column: data[column] for column in TRACE_COLUMNS}
+    with open(file_path, "r", newline="") as file:
+        rows = list(csv.DictReader(file))
+    return {column: np.array([float(row[column]) for row in rows], dtype=_column_dtype(column))
+            for column in TRACE_COLUMNS}
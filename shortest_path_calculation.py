@@ -1,9 +1,19 @@
+import hashlib
 import random
+import time
+from collections import OrderedDict, deque
+from collections.abc import Mapping
 from math import radians, sin, cos, sqrt, atan2
+import numpy as np
 from exceptions_and_decorators import execution_time_decorator, error_handling_decorator
 
+EARTH_RADIUS_KM = 6371.0  # Earth's radius in kilometers
+DISTANCE_MATRIX_BLOCK_ROWS = 1024  # Rows filled per block to bound temporary arrays for large location sets
+
 # Class to define a transport mode with attributes for speed, cost, and transfer time
 class TransportMode:
+    __slots__ = ("name", "speed_kmh", "cost_per_km", "transfer_time_min")  # No per-instance dict
+
     def __init__(self, name, speed_kmh, cost_per_km, transfer_time_min):
         """
         Initialize a transport mode.
@@ -17,8 +27,15 @@ class TransportMode:
         self.cost_per_km = cost_per_km
         self.transfer_time_min = transfer_time_min
 
+    def __repr__(self):
+        return (f"TransportMode({self.name!r}, {self.speed_kmh!r}, {self.cost_per_km!r}, "
+                f"{self.transfer_time_min!r})")
+
 # Class to represent a segment of a journey
 class Segment:
+    __slots__ = ("start_name", "start_latitude", "start_longitude", "end_name", "end_latitude", "end_longitude",
+                 "distance", "transport_mode")  # Coordinates stored as plain floats, no per-instance dicts
+
     def __init__(self, start_name, start_coords, end_name, end_coords, distance=0, transport_mode=None):
         """
         Initialize a journey segment between two locations.
@@ -30,12 +47,92 @@ class Segment:
         :param transport_mode: Transport mode used for the segment.
         """
         self.start_name = start_name
-        self.start = {"latitude": start_coords[0], "longitude": start_coords[1]}
+        self.start_latitude, self.start_longitude = start_coords[0], start_coords[1]
         self.end_name = end_name
-        self.end = {"latitude": end_coords[0], "longitude": end_coords[1]}
+        self.end_latitude, self.end_longitude = end_coords[0], end_coords[1]
         self.distance = distance
         self.transport_mode = transport_mode
 
+    # Starting coordinates as {"latitude": ..., "longitude": ...}, built on access
+    @property
+    def start(self):
+        return {"latitude": self.start_latitude, "longitude": self.start_longitude}
+
+    # Ending coordinates as {"latitude": ..., "longitude": ...}, built on access
+    @property
+    def end(self):
+        return {"latitude": self.end_latitude, "longitude": self.end_longitude}
+
+# Class storing locations as one contiguous coordinate array with name <-> id maps
+class LocationTable(Mapping):
+    __slots__ = ("names", "coordinates", "ids")
+
+    def __init__(self, names, coordinates):
+        """
+        Compact, read-only replacement for the name -> (latitude, longitude) dictionary. It is a Mapping,
+        so every function taking a locations dictionary also accepts it, and the array-based functions
+        (build_distance_matrix, calculate_journey_batch, SpatialIndex, ...) read the coordinates directly.
+        Location ids are positions in names, as in build_distance_matrix.
+        :param names: Sequence of unique location names.
+        :param coordinates: Array-like of shape (n, 2) with latitude and longitude in degrees.
+        """
+        self.names = list(names)
+        self.coordinates = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(self.coordinates) != len(self.names):
+            raise ValueError(f"Got {len(self.names)} names but {len(self.coordinates)} coordinates")
+        self.ids = {name: location_id for location_id, name in enumerate(self.names)}
+        if len(self.ids) != len(self.names):
+            raise ValueError("Location names must be unique")
+        self.coordinates.flags.writeable = False  # Shared freely, so keep it immutable
+
+    @classmethod
+    def from_dict(cls, locations):
+        """
+        :param locations: Dictionary of location names and their coordinates (latitude, longitude).
+        :return: LocationTable with the same locations, in the same order.
+        """
+        return cls(list(locations.keys()), [locations[name] for name in locations])
+
+    @property
+    def latitudes(self):
+        return self.coordinates[:, 0]
+
+    @property
+    def longitudes(self):
+        return self.coordinates[:, 1]
+
+    def __getitem__(self, name):
+        latitude, longitude = self.coordinates[self.ids[name]].tolist()
+        return latitude, longitude
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"LocationTable({len(self.names)} locations)"
+
+    def ids_of(self, names):
+        """
+        :param names: Iterable of location names, e.g. a path.
+        :return: NumPy int32 array of their location ids.
+        """
+        ids = self.ids
+        return np.array([ids[name] for name in names], dtype=np.int32)
+
+    def names_of(self, location_ids):
+        """
+        :param location_ids: Iterable of location ids, e.g. a tour.
+        :return: List of the corresponding location names.
+        """
+        names = self.names
+        return [names[location_id] for location_id in np.asarray(location_ids).tolist()]
+
 # Decorated function to calculate the haversine distance between two geographical points
 @error_handling_decorator
 def haversine(lat1, lon1, lat2, lon2):
@@ -47,7 +144,7 @@ def haversine(lat1, lon1, lat2, lon2):
     :param lon2: Longitude of the second point.
     :return: Distance in kilometers.
     """
-    R = 6371.0  # Earth's radius in kilometers
+    R = EARTH_RADIUS_KM  # Earth's radius in kilometers
     dlat = radians(lat2 - lat1)  # Delta latitude in radians
     dlon = radians(lon2 - lon1)  # Delta longitude in radians
     a = sin(dlat / 2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2)**2
@@ -69,9 +166,723 @@ def calculate_total_distance(path, locations):
         total_distance += haversine(loc1[0], loc1[1], loc2[0], loc2[1])
     return total_distance
 
+# Function to calculate haversine distances between arrays of points with NumPy broadcasting
+def haversine_array(lat1, lon1, lat2, lon2):
+    """
+    Vectorized haversine distance; arguments broadcast against each other like NumPy arrays.
+    :param lat1: Latitude(s) of the first point(s) in degrees.
+    :param lon1: Longitude(s) of the first point(s) in degrees.
+    :param lat2: Latitude(s) of the second point(s) in degrees.
+    :param lon2: Longitude(s) of the second point(s) in degrees.
+    :return: NumPy float64 array of distances in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    a = np.clip(a, 0.0, 1.0)  # Guard against rounding just outside [0, 1]
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+# Function to get the coordinates of locations as an (n, 2) float64 array
+def location_coordinates(locations, names=None):
+    """
+    Read coordinates in bulk from a locations dictionary or a LocationTable (without copying
+    for a whole LocationTable).
+    :param locations: Dictionary of location names and their coordinates, or a LocationTable.
+    :param names: Names to look up in order (default: every location, in the mapping's order).
+    :return: NumPy float64 array of shape (len(names), 2) with latitude and longitude columns.
+    """
+    if isinstance(locations, LocationTable):
+        return locations.coordinates if names is None else locations.coordinates[locations.ids_of(names)]
+    names = list(locations.keys()) if names is None else names
+    return np.array([locations[name] for name in names], dtype=np.float64).reshape(-1, 2)
+
+# Class computing distances from coordinates on demand, indexed like a distance matrix
+class CoordinateDistances:
+    def __init__(self, coords):
+        """
+        Matrix-free stand-in for build_distance_matrix's matrix, for searches that only look at a few
+        distances per location: distances[a, b] is the haversine distance between locations a and b,
+        computed when requested, so memory stays O(n) however many locations there are.
+        :param coords: (n, 2) latitude/longitude array, e.g. from location_coordinates.
+        """
+        self.coords = np.asarray(coords, dtype=np.float64)
+        radians_ = np.radians(self.coords)
+        # Plain lists for the scalar lookups made by local_search, which avoid NumPy call overhead
+        self._latitudes = radians_[:, 0].tolist()
+        self._longitudes = radians_[:, 1].tolist()
+        self._cos_latitudes = np.cos(radians_[:, 0]).tolist()
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, key):
+        i, j = key
+        if isinstance(i, (int, np.integer)) and isinstance(j, (int, np.integer)):
+            half_chord = (sin((self._latitudes[j] - self._latitudes[i]) / 2) ** 2 + self._cos_latitudes[i]
+                          * self._cos_latitudes[j] * sin((self._longitudes[j] - self._longitudes[i]) / 2) ** 2)
+            half_chord = min(max(half_chord, 0.0), 1.0)  # Guard against rounding just outside [0, 1]
+            return 2 * EARTH_RADIUS_KM * atan2(sqrt(half_chord), sqrt(1 - half_chord))
+        return haversine_array(self.coords[i, 0], self.coords[i, 1], self.coords[j, 0], self.coords[j, 1])
+
+# DistanceMatrixStore consulted by build_distance_matrix, set with use_distance_matrix_store
+_distance_matrix_store = None
+
+# Function to make build_distance_matrix read and write a persistent distance matrix store
+def use_distance_matrix_store(store):
+    """
+    :param store: DistanceMatrixStore to use from now on in this process (and the worker processes it
+                  forks), or None to compute every matrix in memory again.
+    :return: The previously used store.
+    """
+    global _distance_matrix_store
+    previous, _distance_matrix_store = _distance_matrix_store, store
+    return previous
+
+# Function to get the data type of the matrix build_distance_matrix returns for a location set
+def distance_matrix_dtype(locations):
+    """
+    :param locations: Dictionary of location names and their coordinates, or a LocationTable.
+    :return: The dtype of the active DistanceMatrixStore if it stores this location set, else float64.
+    """
+    if _distance_matrix_store is not None and len(locations) >= _distance_matrix_store.min_locations:
+        return _distance_matrix_store.dtype
+    return np.dtype(np.float64)
+
+# Function to precompute all pairwise haversine distances in one vectorized pass
+def build_distance_matrix(locations):
+    """
+    Precompute the haversine distance between every pair of locations using NumPy broadcasting.
+    Rows are filled in blocks so the temporary arrays stay small for large location sets.
+    :param locations: Dictionary of location names and their coordinates, or a LocationTable.
+    :return: Tuple (location_names, distance_matrix) where distance_matrix[i, j] is the float64
+             distance in kilometers between location_names[i] and location_names[j]. With a store
+             set by use_distance_matrix_store and at least its min_locations locations, the matrix
+             is a read-only memory map of the store's dtype.
+    """
+    if _distance_matrix_store is not None and len(locations) >= _distance_matrix_store.min_locations:
+        return _distance_matrix_store.load(locations)  # Read-only memory map shared across processes
+
+    location_names = list(locations.keys())
+    coords = location_coordinates(locations)
+    latitudes = coords[:, 0]
+    longitudes = coords[:, 1]
+
+    distance_matrix = np.empty((len(location_names), len(location_names)), dtype=np.float64)
+    for start in range(0, len(location_names), DISTANCE_MATRIX_BLOCK_ROWS):
+        stop = min(start + DISTANCE_MATRIX_BLOCK_ROWS, len(location_names))
+        distance_matrix[start:stop] = haversine_array(latitudes[start:stop, None], longitudes[start:stop, None],
+                                                      latitudes[None, :], longitudes[None, :])
+    return location_names, distance_matrix
+
+# Function to calculate the total distance of an integer-encoded tour from a distance matrix
+def calculate_tour_distance(tour, distance_matrix):
+    """
+    Calculate the total distance of a tour of location ids with a single fancy-indexing lookup.
+    :param tour: Sequence of integer location ids (row indices into the distance matrix).
+    :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+    :return: Total distance of the tour in kilometers.
+    """
+    tour = np.asarray(tour)
+    return float(distance_matrix[tour[:-1], tour[1:]].sum())
+
+# Class to cache tour distances with a bounded least-recently-used eviction policy
+class FitnessCache:
+    def __init__(self, max_size=10000):
+        """
+        Initialize a tour distance cache shared by the individuals of one location set.
+        :param max_size: Maximum number of tours kept before the least recently used one is evicted.
+        """
+        self.max_size = max_size
+        self.hits = 0  # Number of lookups answered from the cache
+        self.evaluations = 0  # Number of tours actually scored against the distance matrix
+        self._entries = OrderedDict()
+
+    def distance(self, tour, distance_matrix):
+        """
+        Return the total distance of a tour, scoring it only if it is not cached yet.
+        :param tour: Sequence of integer location ids.
+        :param distance_matrix: Pairwise distance matrix the tour is scored against.
+        :return: Total distance of the tour in kilometers.
+        """
+        # Fixed-size digest of the tour, so the keys take O(max_size) memory whatever the tour length
+        key = hashlib.blake2b(np.asarray(tour, dtype=np.int32).tobytes(), digest_size=16).digest()
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.evaluations += 1
+        distance = calculate_tour_distance(tour, distance_matrix)
+        self._entries[key] = distance
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)  # Evict the least recently used tour
+        return distance
+
+    def __len__(self):
+        return len(self._entries)
+
+# Class to keep an individual's tour together with its distance, scored once at creation
+class Individual:
+    def __init__(self, tour, distance):
+        """
+        Initialize an individual of the genetic algorithm population.
+        :param tour: NumPy int32 array of location ids.
+        :param distance: Total distance of the tour in kilometers.
+        """
+        self.tour = tour
+        self.distance = distance
+        self.fitness = 1 / distance  # Inverse of the total distance to favor shorter paths
+
+# Function to perform ordered crossover (OX) in linear time
+def ordered_crossover(parent1, parent2, rng):
+    """
+    Copy a random slice of the first parent, then fill the remaining positions left to right
+    with the genes of the second parent in order, skipping genes already placed.
+    :param parent1: NumPy int32 array of location ids providing the slice.
+    :param parent2: NumPy int32 array of location ids providing the fill order.
+    :param rng: random.Random instance used to pick the slice.
+    :return: Child tour as a NumPy int32 array.
+    """
+    start, end = sorted(rng.sample(range(len(parent1)), 2))
+    placed = np.zeros(len(parent1), dtype=bool)  # "Already placed" mask indexed by location id
+    placed[parent1[start:end]] = True
+    remaining = parent2[~placed[parent2]]  # Parent2 genes in order, consumed by the fill pointer
+
+    child = np.empty_like(parent1)
+    child[start:end] = parent1[start:end]
+    child[:start] = remaining[:start]
+    child[end:] = remaining[start:]
+    return child
+
+# Function to perform partially mapped crossover (PMX) in linear time
+def partially_mapped_crossover(parent1, parent2, rng):
+    """
+    Copy a random slice of the first parent and keep the second parent's genes elsewhere,
+    resolving conflicts by following the slice's gene mapping.
+    :param parent1: NumPy int32 array of location ids providing the slice.
+    :param parent2: NumPy int32 array of location ids providing the other positions.
+    :param rng: random.Random instance used to pick the slice.
+    :return: Child tour as a NumPy int32 array.
+    """
+    start, end = sorted(rng.sample(range(len(parent1)), 2))
+    placed = np.zeros(len(parent1), dtype=bool)  # "Already placed" mask indexed by location id
+    placed[parent1[start:end]] = True
+    position_in_parent1 = np.empty(len(parent1), dtype=np.int64)
+    position_in_parent1[parent1] = np.arange(len(parent1))
+
+    child = parent2.copy()
+    child[start:end] = parent1[start:end]
+    for i in np.flatnonzero(placed[parent2]):  # Positions whose parent2 gene is already in the slice
+        if start <= i < end:
+            continue
+        gene = parent2[i]
+        while placed[gene]:  # Follow parent1 -> parent2 mapping until a free gene is found
+            gene = parent2[position_in_parent1[gene]]
+        child[i] = gene
+    return child
+
+# Function to perform edge recombination crossover (ERX) in linear time
+def edge_recombination_crossover(parent1, parent2, rng):
+    """
+    Build a child that preserves as many edges of both parents as possible, always moving to
+    the neighbor with the fewest remaining edges.
+    :param parent1: NumPy int32 array of location ids; the child starts from its first gene.
+    :param parent2: NumPy int32 array of location ids.
+    :param rng: random.Random instance used to break ties and restart from dead ends.
+    :return: Child tour as a NumPy int32 array.
+    """
+    size = len(parent1)
+    neighbors = [set() for _ in range(size)]  # Edge table indexed by location id
+    for parent in (parent1.tolist(), parent2.tolist()):
+        for a, b in zip(parent, parent[1:]):
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+
+    unvisited = list(range(size))  # Unvisited ids with swap-remove, for random restarts in O(1)
+    position = list(range(size))
+    child = np.empty_like(parent1)
+    current = int(parent1[0])
+    for k in range(size):
+        child[k] = current
+        last = unvisited.pop()
+        if last != current:  # Swap-remove current from the unvisited list
+            unvisited[position[current]] = last
+            position[last] = position[current]
+        for neighbor in neighbors[current]:
+            neighbors[neighbor].discard(current)
+
+        if not unvisited:
+            break
+        if neighbors[current]:
+            fewest = min(len(neighbors[n]) for n in neighbors[current])
+            current = rng.choice(sorted(n for n in neighbors[current] if len(neighbors[n]) == fewest))
+        else:
+            current = rng.choice(unvisited)  # Dead end: restart from a random unvisited location
+    return child
+
+# Crossover operators selectable by name in genetic_algorithm
+CROSSOVER_OPERATORS = {
+    "ox": ordered_crossover,
+    "pmx": partially_mapped_crossover,
+    "erx": edge_recombination_crossover,
+}
+
+# Function to look up the distance of an edge, treating a missing endpoint as no edge
+def _edge_distance(distance_matrix, a, b):
+    if a is None or b is None:
+        return 0.0
+    return float(distance_matrix[a, b])
+
+# Function to swap two locations in place and return the change in tour distance
+def swap_mutation(tour, i, j, distance_matrix):
+    """
+    Swap the locations at positions i and j, re-scoring only the (at most four) affected edges.
+    :param tour: NumPy int32 array of location ids, modified in place.
+    :param i: First position.
+    :param j: Second position.
+    :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+    :return: Change in total tour distance in kilometers.
+    """
+    last = len(tour) - 1
+    edges = {k for p in (i, j) for k in (p - 1, p) if 0 <= k < last}  # Edge k joins positions k and k+1
+    before = sum(_edge_distance(distance_matrix, tour[k], tour[k + 1]) for k in edges)
+    tour[[i, j]] = tour[[j, i]]
+    after = sum(_edge_distance(distance_matrix, tour[k], tour[k + 1]) for k in edges)
+    return after - before
+
+# Function to move one location to another position in place and return the change in tour distance
+def insertion_mutation(tour, i, j, distance_matrix):
+    """
+    Remove the location at position i and reinsert it so that it ends up at position j,
+    re-scoring only the edges around the removal and insertion points.
+    :param tour: NumPy int32 array of location ids, modified in place.
+    :param i: Position of the location to move.
+    :param j: Target position of the location.
+    :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+    :return: Change in total tour distance in kilometers.
+    """
+    if i == j:
+        return 0.0
+    last = len(tour) - 1
+    gene = tour[i]
+    prev = tour[i - 1] if i > 0 else None
+    nxt = tour[i + 1] if i < last else None
+    delta = (_edge_distance(distance_matrix, prev, nxt)
+             - _edge_distance(distance_matrix, prev, gene) - _edge_distance(distance_matrix, gene, nxt))
+
+    # Neighbours of the insertion point in the tour with the location removed
+    if i < j:
+        left, right = tour[j], (tour[j + 1] if j < last else None)
+    else:
+        left, right = (tour[j - 1] if j > 0 else None), tour[j]
+    delta += (_edge_distance(distance_matrix, left, gene) + _edge_distance(distance_matrix, gene, right)
+              - _edge_distance(distance_matrix, left, right))
+
+    if i < j:
+        tour[i:j] = tour[i + 1:j + 1]
+    else:
+        tour[j + 1:i + 1] = tour[j:i]
+    tour[j] = gene
+    return delta
+
+# Function to reverse a section of the tour in place and return the change in tour distance
+def two_opt_mutation(tour, i, j, distance_matrix):
+    """
+    Reverse the section between positions i and j (inclusive), re-scoring only the two edges
+    at its ends. Assumes a symmetric distance matrix, as produced by build_distance_matrix.
+    :param tour: NumPy int32 array of location ids, modified in place.
+    :param i: One end of the section.
+    :param j: Other end of the section.
+    :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+    :return: Change in total tour distance in kilometers.
+    """
+    i, j = min(i, j), max(i, j)
+    prev = tour[i - 1] if i > 0 else None
+    nxt = tour[j + 1] if j < len(tour) - 1 else None
+    delta = (_edge_distance(distance_matrix, prev, tour[j]) + _edge_distance(distance_matrix, tour[i], nxt)
+             - _edge_distance(distance_matrix, prev, tour[i]) - _edge_distance(distance_matrix, tour[j], nxt))
+    tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+    return delta
+
+# Mutation operators selectable by name in genetic_algorithm
+MUTATION_OPERATORS = {
+    "swap": swap_mutation,
+    "insertion": insertion_mutation,
+    "two_opt": two_opt_mutation,
+}
+
+# Class holding the operators and settings used to evolve one genetic algorithm population
+class GeneticSearch:
+    def __init__(self, distance_matrix, population_size=100, mutation_rate=0.01, rng=None,
+                 fitness_cache=None, crossover="ox", mutation="swap", elite_size=0, profiler=None):
+        """
+        Initialize the evolution of a population of tours over a distance matrix.
+        :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+        :param population_size: Number of individuals in the population.
+        :param mutation_rate: Probability of mutation for each individual.
+        :param rng: random.Random instance driving every random choice of the search.
+        :param fitness_cache: Optional FitnessCache for this distance matrix.
+        :param crossover: Name of the crossover operator in CROSSOVER_OPERATORS.
+        :param mutation: Name of the mutation operator in MUTATION_OPERATORS.
+        :param elite_size: Number of best individuals carried unchanged into the next generation.
+        :param profiler: Optional SearchProfiler charged with the time of every phase of next_generation.
+        """
+        if not 0 <= elite_size < population_size:
+            raise ValueError("elite_size must be at least 0 and smaller than population_size")
+        if crossover not in CROSSOVER_OPERATORS:
+            raise ValueError(f"Unknown crossover operator: {crossover}")
+        if mutation not in MUTATION_OPERATORS:
+            raise ValueError(f"Unknown mutation operator: {mutation}")
+        self.distance_matrix = distance_matrix
+        self.population_size = population_size
+        self.mutation_rate = mutation_rate
+        self.rng = rng if rng is not None else random.Random()
+        self.fitness_cache = fitness_cache if fitness_cache is not None else FitnessCache()
+        self.crossover_operator = CROSSOVER_OPERATORS[crossover]
+        self.mutation_operator = MUTATION_OPERATORS[mutation]
+        self.elite_size = elite_size
+        self.profiler = profiler
+        if profiler is not None:
+            # Time the steps of this instance only; without a profiler next_generation runs uninstrumented
+            self.select_elite = _timed_step(self.select_elite, profiler, "selection")
+            self.select_parents = _timed_step(self.select_parents, profiler, "selection")
+            self.crossover_operator = _timed_step(self.crossover_operator, profiler, "crossover")
+            self.create_individual = _timed_step(self.create_individual, profiler, "fitness")
+            self.mutate = _timed_step(self.mutate, profiler, "mutation")
+
+    # Score a tour once and keep the result next to it
+    def create_individual(self, tour):
+        return Individual(tour, self.fitness_cache.distance(tour, self.distance_matrix))
+
+    # Create an initial population by generating random permutations of locations
+    def create_population(self):
+        location_ids = list(range(len(self.distance_matrix)))
+        return [self.create_individual(np.array(self.rng.sample(location_ids, len(location_ids)), dtype=np.int32))
+                for _ in range(self.population_size)]
+
+    # Select two parents using a tournament selection approach on the stored fitness
+    def select_parents(self, population):
+        tournament_size = 5
+        selected = self.rng.sample(population, tournament_size)
+        selected.sort(key=lambda individual: individual.fitness, reverse=True)
+        return selected[0].tour, selected[1].tour
+
+    # Mutate an individual in place, updating its stored distance from the changed edges only
+    def mutate(self, individual):
+        if self.rng.random() < self.mutation_rate:
+            i, j = self.rng.sample(range(len(individual.tour)), 2)
+            individual.distance += self.mutation_operator(individual.tour, i, j, self.distance_matrix)
+            individual.fitness = 1 / individual.distance
+
+    # Pick the individuals carried unchanged into the next generation
+    def select_elite(self, population):
+        if not self.elite_size:
+            return []
+        return sorted(population, key=lambda individual: individual.fitness, reverse=True)[:self.elite_size]
+
+    # Breed the next generation from the current population, carrying the elite forward unchanged
+    def next_generation(self, population):
+        new_population = self.select_elite(population)
+        while len(new_population) < self.population_size:  # Create pairs of children
+            parent1, parent2 = self.select_parents(population)
+            child1 = self.create_individual(self.crossover_operator(parent1, parent2, self.rng))
+            child2 = self.create_individual(self.crossover_operator(parent2, parent1, self.rng))
+            self.mutate(child1)
+            self.mutate(child2)
+            new_population.extend([child1, child2])
+        return new_population[:self.population_size]
+
+# Function to wrap a step of GeneticSearch so its duration is charged to a profiler phase
+def _timed_step(step, profiler, phase):
+    clock = time.perf_counter_ns
+
+    def timed(*args):
+        start = clock()
+        try:
+            return step(*args)
+        finally:
+            profiler.add_phase_time(phase, clock() - start)
+    return timed
+
+# Function to find the best individual of a population from the stored fitness
+def best_individual(population):
+    return max(population, key=lambda individual: individual.fitness)
+
+# Function to measure how different the tours of a population are from each other
+def population_diversity(population):
+    """
+    Measure population diversity from the undirected edges used by its tours.
+    :param population: List of Individual objects over the same location set.
+    :return: 0.0 when every tour uses the same edges, up to 1.0 when no two tours share an edge.
+    """
+    tours = np.array([individual.tour for individual in population], dtype=np.int64)
+    size = tours.shape[1]
+    if len(population) < 2 or size < 2:
+        return 0.0
+    a, b = tours[:, :-1], tours[:, 1:]
+    edges = np.minimum(a, b) * size + np.maximum(a, b)  # Encode each undirected edge as one integer
+    distinct = len(np.unique(edges))
+    return (distinct - (size - 1)) / ((size - 1) * (len(population) - 1))
+
+# Class reporting how a genetic_algorithm run progressed and why it stopped
+class SearchReport:
+    def __init__(self):
+        """
+        Initialize an empty report, filled in by genetic_algorithm or iter_genetic_algorithm when passed as report=.
+        """
+        self.best_generation = None  # Generation at which the returned tour was first found (0 = initial)
+        self.generations_run = 0  # Number of generations actually evolved
+        self.stopped_early = False  # Whether the run ended before `generations` (stall, deadline or cancel)
+        self.timed_out = False  # Whether the time_budget deadline ended the run
+        self.diversity = None  # population_diversity of the final population
+
+# Function to build a tour by always travelling to the nearest unvisited location
+def nearest_neighbor_tour(distance_matrix, start=0):
+    """
+    Construct a greedy tour starting from one location.
+    :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+    :param start: Location id the tour starts from.
+    :return: Tour as a NumPy int32 array of location ids.
+    """
+    size = len(distance_matrix)
+    visited = np.zeros(size, dtype=bool)
+    tour = np.empty(size, dtype=np.int32)
+    current = start
+    for k in range(size):
+        tour[k] = current
+        visited[current] = True
+        if k < size - 1:
+            current = int(np.argmin(np.where(visited, np.inf, distance_matrix[current])))
+    return tour
+
+# Function to list the k nearest locations of every location, closest first
+def build_candidate_lists(distance_matrix, k=8):
+    """
+    Build neighbor candidate lists used to restrict local search moves.
+    :param distance_matrix: Pairwise distance matrix from build_distance_matrix.
+    :param k: Number of nearest neighbors kept per location.
+    :return: NumPy int32 array of shape (n, k) with the neighbors of each location sorted by distance.
+    """
+    size = len(distance_matrix)
+    k = min(k, size - 1)
+    candidates = np.empty((size, max(k, 0)), dtype=np.int32)
+    if k <= 0:
+        return candidates
+    for start in range(0, size, DISTANCE_MATRIX_BLOCK_ROWS):
+        stop = min(start + DISTANCE_MATRIX_BLOCK_ROWS, size)
+        block = distance_matrix[start:stop].copy()
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf  # A location is not its own neighbor
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, nearest, axis=1), axis=1, kind="stable")
+        candidates[start:stop] = np.take_along_axis(nearest, order, axis=1)
+    return candidates
+
+# Function to improve a tour with 2-opt and Or-opt moves restricted to neighbor candidate lists
+def local_search(tour, distance_matrix, candidates=None, fixed_start=False, max_segment_length=3):
+    """
+    Improve an open tour in place until no 2-opt or Or-opt move between candidate neighbors helps.
+    Locations whose neighborhood has not changed since their last failed search are skipped
+    (don't-look bits), so each pass only revisits the part of the tour that moved.
+    :param tour: NumPy int32 array of location ids, modified in place.
+    :param distance_matrix: Symmetric pairwise distance matrix from build_distance_matrix.
+    :param candidates: Neighbor lists from build_candidate_lists (built with k=8 if omitted).
+    :param fixed_start: Keep the location at position 0 in place.
+    :param max_segment_length: Longest segment moved by an Or-opt move.
+    :return: Total distance of the improved tour in kilometers.
+    """
+    size = len(tour)
+    if size < 3:
+        return calculate_tour_distance(tour, distance_matrix)
+    if candidates is None:
+        candidates = build_candidate_lists(distance_matrix)
+    position = np.empty(size, dtype=np.int64)
+    position[tour] = np.arange(size)
+    first = 1 if fixed_start else 0  # First position a move may change
+    epsilon = 1e-10  # Minimum gain for a move to count as an improvement
+
+    # Location at a position, or None past either end of the open tour
+    def city(p):
+        return int(tour[p]) if 0 <= p < size else None
+
+    def dist(a, b):
+        return _edge_distance(distance_matrix, a, b)
+
+    # Reverse positions l..r so that a and one of its candidates become neighbors
+    def try_two_opt(a):
+        i = int(position[a])
+        longest = max(dist(a, city(i - 1)), dist(a, city(i + 1)))
+        for c in candidates[a].tolist():
+            if distance_matrix[a, c] >= longest:
+                break  # Neighbors are sorted, so no later candidate can shorten an edge at a
+            j = int(position[c])
+            for l, r in (((i + 1, j), (i, j - 1)) if j > i else ((j + 1, i), (j, i - 1))):
+                if l >= r or l < first:
+                    continue
+                delta = (dist(city(l - 1), city(r)) + dist(city(l), city(r + 1))
+                         - dist(city(l - 1), city(l)) - dist(city(r), city(r + 1)))
+                if delta < -epsilon:
+                    touched = {city(l - 1), city(l), city(r), city(r + 1)}
+                    tour[l:r + 1] = tour[l:r + 1][::-1].copy()
+                    position[tour[l:r + 1]] = np.arange(l, r + 1)
+                    return touched
+        return None
+
+    # Move a segment starting at a between a candidate and its neighbor, in either orientation
+    def try_or_opt(a):
+        i = int(position[a])
+        if i < first:
+            return None
+        for length in range(1, max_segment_length + 1):
+            end = i + length - 1
+            if end >= size:
+                break
+            head, tail = city(i), city(end)
+            before, after = city(i - 1), city(end + 1)
+            removal_gain = dist(before, head) + dist(tail, after) - dist(before, after)
+            if removal_gain <= epsilon:
+                continue
+            for c in set(candidates[head].tolist()) | set(candidates[tail].tolist()):
+                j = int(position[c])
+                if i <= j <= end or min(distance_matrix[head, c], distance_matrix[tail, c]) >= removal_gain:
+                    continue
+                for x_pos, y_pos in ((j - 1, j), (j, j + 1)):
+                    if i <= x_pos <= end or i <= y_pos <= end or y_pos < first:
+                        continue
+                    x, y = city(x_pos), city(y_pos)
+                    for near, far in ((head, tail), (tail, head)):
+                        delta = dist(x, near) + dist(far, y) - dist(x, y) - removal_gain
+                        if delta < -epsilon:
+                            segment = tour[i:end + 1].copy()
+                            if near != head:
+                                segment = segment[::-1]
+                            rest = np.concatenate([tour[:i], tour[end + 1:]])
+                            insert_at = y_pos - length if y_pos > end else y_pos  # Index of y in rest
+                            tour[:] = np.concatenate([rest[:insert_at], segment, rest[insert_at:]])
+                            position[tour] = np.arange(size)
+                            return {before, after, head, tail, x, y}
+        return None
+
+    # Process locations with an active don't-look bit until none can be improved
+    queue = deque(tour.tolist())
+    active = np.ones(size, dtype=bool)
+    while queue:
+        a = queue.popleft()
+        active[a] = False
+        touched = try_two_opt(a) or try_or_opt(a)
+        if touched:
+            for c in touched:
+                if c is not None and not active[c]:
+                    active[c] = True
+                    queue.append(c)
+    return calculate_tour_distance(tour, distance_matrix)
+
+# Decorated function optimizing a route with nearest-neighbor construction and local search
+@execution_time_decorator
+def local_search_route(locations, start=None, k=8, initial_path=None):
+    """
+    Solve the traveling salesman problem with 2-opt and Or-opt local search. Neighbour lists come
+    from a SpatialIndex and distances are computed from the coordinates when the search needs them,
+    so no n x n distance matrix is built.
+    :param locations: Dictionary of location names and their coordinates.
+    :param start: Optional location name the route must start from.
+    :param k: Number of nearest neighbors considered for each location's moves.
+    :param initial_path: Optional path to improve (e.g. the genetic_algorithm result); when omitted
+                         the search starts from a nearest-neighbor tour.
+    :return: Best distance and path found by the local search.
+    """
+    from spatial_index import SpatialIndex  # Imported here: spatial_index builds on this module
+
+    location_names = list(locations.keys())
+    distance_matrix = CoordinateDistances(location_coordinates(locations))
+    spatial_index = SpatialIndex(locations)  # Sub-quadratic neighbour lists and tour construction
+    index = {name: location_id for location_id, name in enumerate(location_names)}
+    if initial_path is not None:
+        path = list(initial_path)
+        if start is not None and path[0] != start:
+            path.remove(start)  # Anchor the start location at the front of the path
+            path.insert(0, start)
+        tour = np.array([index[name] for name in path], dtype=np.int32)
+    else:
+        tour = spatial_index.nearest_neighbor_tour(index[start] if start is not None else 0, k)
+
+    distance = local_search(tour, distance_matrix, spatial_index.candidate_lists(k), fixed_start=start is not None)
+    return distance, [location_names[location_id] for location_id in tour]
+
+# Generator running the genetic algorithm and yielding a snapshot whenever the best tour improves
+def iter_genetic_algorithm(locations, population_size=100, generations=500, mutation_rate=0.01, seed=42,
+                           fitness_cache=None, crossover="ox", mutation="swap", elite_size=0, stall_generations=None,
+                           stall_epsilon=1e-9, time_budget=None, post_optimize=False, report=None,
+                           profiler=None):
+    """
+    Run the genetic algorithm as an anytime search. Takes the same parameters as genetic_algorithm.
+    The first snapshot describes the initial population; closing the generator cancels the search.
+    :return: Iterator of (generation, best_distance, best_path) tuples, one per improvement.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    # Precompute all pairwise distances once; individuals are int32 arrays of location ids
+    location_names, distance_matrix = build_distance_matrix(locations)
+    search = GeneticSearch(distance_matrix, population_size, mutation_rate, random.Random(seed),
+                           fitness_cache, crossover, mutation, elite_size, profiler)
+
+    # Generate the initial population
+    if profiler is not None:
+        profiler.begin_generation()
+    population = search.create_population()
+    if profiler is not None:
+        profiler.end_generation(0, population, search.fitness_cache)
+    best = best_individual(population)
+    best_generation = 0
+    stall = 0
+    generation = 0
+    timed_out = False
+
+    try:
+        yield 0, best.distance, [location_names[location_id] for location_id in best.tour]
+
+        # Evolution loop: Evolve population over a specified number of generations
+        for generation in range(1, generations + 1):
+            if profiler is not None:
+                profiler.begin_generation()
+            population = search.next_generation(population)
+            if profiler is not None:
+                profiler.end_generation(generation, population, search.fitness_cache)
+
+            # Keep the best tour ever seen and count generations without a meaningful improvement
+            candidate = best_individual(population)
+            if candidate.distance < best.distance - stall_epsilon:
+                stall = 0
+            else:
+                stall += 1
+            if candidate.distance < best.distance:
+                best = candidate
+                best_generation = generation
+                yield generation, best.distance, [location_names[location_id] for location_id in best.tour]
+            if stall_generations is not None and stall >= stall_generations:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                timed_out = True
+                break
+
+        # Memetic post-pass: 2-opt / Or-opt local search on the best individual
+        if post_optimize and not timed_out:
+            tour = best.tour.copy()
+            distance = local_search(tour, distance_matrix)
+            if distance < best.distance:
+                best = Individual(tour, distance)
+                yield generation, best.distance, [location_names[location_id] for location_id in best.tour]
+    finally:
+        # Also runs when the caller cancels the search by closing the generator
+        if report is not None:
+            report.best_generation = best_generation
+            report.generations_run = generation
+            report.stopped_early = generation < generations
+            report.timed_out = timed_out
+            report.diversity = population_diversity(population)
+
 # Decorated function implementing the genetic algorithm for path optimization
 @execution_time_decorator
-def genetic_algorithm(locations, population_size=100, generations=500, mutation_rate=0.01, seed=42):
+def genetic_algorithm(locations, population_size=100, generations=500, mutation_rate=0.01, seed=42,
+                      fitness_cache=None, crossover="ox", mutation="swap", elite_size=0, stall_generations=None,
+                      stall_epsilon=1e-9, time_budget=None, post_optimize=False, report=None, profiler=None):
     """
     Solve the traveling salesman problem using a genetic algorithm.
     :param locations: Dictionary of location names and their coordinates.
@@ -79,62 +890,29 @@ def genetic_algorithm(locations, population_size=100, generations=500, mutation_
     :param generations: Number of generations to evolve.
     :param mutation_rate: Probability of mutation for each individual.
     :param seed: Seed for random number generation for reproducibility.
+    :param fitness_cache: Optional FitnessCache for this location set; pass one in to read its
+                          hits and evaluations counters after the run.
+    :param crossover: Name of the crossover operator: "ox" (ordered), "pmx" (partially mapped)
+                      or "erx" (edge recombination).
+    :param mutation: Name of the mutation operator: "swap", "insertion" or "two_opt". Mutated
+                     tours are re-scored from the changed edges only.
+    :param elite_size: Number of best individuals carried unchanged into each new generation.
+    :param stall_generations: Stop after this many generations without improving the best distance
+                              by more than stall_epsilon (default None: always run all generations).
+    :param stall_epsilon: Minimum improvement in kilometers that resets the stall counter.
+    :param time_budget: Optional wall-clock limit in seconds; the best tour found so far is returned
+                        once the deadline passes (checked after every generation).
+    :param post_optimize: Polish the best tour with local_search once evolution ends (memetic
+                          post-pass); skipped when the time budget ran out.
+    :param report: Optional SearchReport filled in with the generation of the best tour, the number
+                   of generations run, whether the run stopped early and the final diversity.
+    :param profiler: Optional SearchProfiler recording per-generation phase times, fitness evaluations
+                     and best/mean/diversity; export it with profiler.save("trace.npz" or "trace.csv").
     :return: Best distance and path found by the algorithm.
     """
-    random.seed(seed)
-    location_names = list(locations.keys())
-
-    # Create an initial population by generating random permutations of locations
-    def create_population():
-        return [random.sample(location_names, len(location_names)) for _ in range(population_size)]
-
-    # Fitness function: Inverse of the total distance to favor shorter paths
-    def fitness(individual):  
-        return 1 / calculate_total_distance(individual, locations)
-
-    # Select two parents using a tournament selection approach
-    def select_parents(population):  
-        tournament_size = 5
-        selected = random.sample(population, tournament_size)
-        selected.sort(key=fitness, reverse=True)
-        return selected[0], selected[1]
-
-    # Perform ordered crossover to combine parents into offspring
-    def crossover(parent1, parent2): 
-        start, end = sorted(random.sample(range(len(parent1)), 2))
-        child = [None] * len(parent1)
-        child[start:end] = parent1[start:end]
-        for gene in parent2:
-            if gene not in child:
-                for i in range(len(child)):
-                    if child[i] is None:
-                        child[i] = gene
-                        break
-        return child
-
-    # Mutate an individual by swapping two random cities
-    def mutate(individual):  
-        if random.random() < mutation_rate:
-            i, j = random.sample(range(len(individual)), 2)
-            individual[i], individual[j] = individual[j], individual[i]
-
-    # Generate the initial population
-    population = create_population()
-
-    # Evolution loop: Evolve population over a specified number of generations
-    for generation in range(generations):
-        new_population = []
-        for _ in range(population_size // 2):  # Create pairs of children
-            parent1, parent2 = select_parents(population)
-            child1 = crossover(parent1, parent2)
-            child2 = crossover(parent2, parent1)
-            mutate(child1)
-            mutate(child2)
-            new_population.extend([child1, child2])
-        population = new_population
-
-    # Find the best individual in the final population
-    best_individual = max(population, key=fitness)
-    best_distance = calculate_total_distance(best_individual, locations)
+    for _, best_distance, best_path in iter_genetic_algorithm(
+            locations, population_size, generations, mutation_rate, seed, fitness_cache, crossover, mutation,
+            elite_size, stall_generations, stall_epsilon, time_budget, post_optimize, report, profiler):
+        pass  # The last snapshot holds the best tour of the run
 
-    return best_distance, best_individual
+    return best_distance, best_path
@@ -0,0 +1,220 @@
+from math import radians, cos, sqrt
+import numpy as np
+from shortest_path_calculation import EARTH_RADIUS_KM, haversine_array, location_coordinates
+
+POINTS_PER_CELL = 4  # Target average number of locations per grid cell
+PROJECTION_MARGIN = 0.01  # Relative slack between projected and haversine distances at city scale
+
+# Class indexing locations in a uniform grid of projected coordinates for neighbour queries
+class SpatialIndex:
+    def __init__(self, locations, cell_size_km=None):
+        """
+        Bucket locations into square grid cells on an equirectangular projection centred on the
+        mean latitude. Cells only narrow down the candidates; reported distances are haversine.
+        Suited to city-scale location sets, where the projection error is far below PROJECTION_MARGIN.
+        :param locations: Dictionary of location names and their coordinates (latitude, longitude), or a LocationTable.
+                          Location ids are positions in this order, as in build_distance_matrix.
+        :param cell_size_km: Side of a grid cell in kilometers (default: about POINTS_PER_CELL
+                             locations per cell).
+        """
+        self.names = list(locations.keys())
+        coords = location_coordinates(locations)
+        self.latitudes = coords[:, 0]
+        self.longitudes = coords[:, 1]
+        self._cos_reference = cos(radians(float(self.latitudes.mean()))) if len(self.names) else 1.0
+
+        x, y = self._project(self.latitudes, self.longitudes)
+        self._origin = (float(x.min()), float(y.min())) if len(self.names) else (0.0, 0.0)
+        if cell_size_km is None:
+            width = float(x.max() - x.min()) if len(self.names) else 0.0
+            height = float(y.max() - y.min()) if len(self.names) else 0.0
+            area = max(width, 1e-3) * max(height, 1e-3)
+            cell_size_km = max(sqrt(area * POINTS_PER_CELL / max(len(self.names), 1)), 1e-3)
+        self.cell_size_km = cell_size_km
+
+        # Group location ids by cell: sort once by cell key, then slice the sorted ids per cell
+        cell_x, cell_y = self._cell_of(x, y)
+        order = np.lexsort((cell_y, cell_x))
+        keys = np.stack([cell_x[order], cell_y[order]], axis=1)
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        self._cells = {}
+        for ids in np.split(order.astype(np.int32), boundaries):
+            if len(ids):
+                self._cells[(int(cell_x[ids[0]]), int(cell_y[ids[0]]))] = ids
+        self._bounds = ((int(cell_x.min()), int(cell_x.max()), int(cell_y.min()), int(cell_y.max()))
+                        if len(self.names) else (0, -1, 0, -1))
+
+    def __len__(self):
+        return len(self.names)
+
+    # Project degrees onto a local plane in kilometers
+    def _project(self, latitudes, longitudes):
+        x = np.radians(np.asarray(longitudes, dtype=np.float64)) * EARTH_RADIUS_KM * self._cos_reference
+        y = np.radians(np.asarray(latitudes, dtype=np.float64)) * EARTH_RADIUS_KM
+        return x, y
+
+    # Grid cell coordinates of projected points
+    def _cell_of(self, x, y):
+        return (np.floor((x - self._origin[0]) / self.cell_size_km).astype(np.int64),
+                np.floor((y - self._origin[1]) / self.cell_size_km).astype(np.int64))
+
+    # Location ids in the ring of cells at Chebyshev distance `ring` from a cell
+    def _ring_ids(self, cell_x, cell_y, ring):
+        min_x, max_x, min_y, max_y = self._bounds
+        if ring == 0:
+            cells = [(cell_x, cell_y)]
+        else:
+            cells = [(cell_x + dx, cell_y + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+            cells += [(cell_x + dx, cell_y + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+        return [self._cells[cell] for cell in cells
+                if min_x <= cell[0] <= max_x and min_y <= cell[1] <= max_y and cell in self._cells]
+
+    # Smallest ring around a cell that can contain indexed locations, and the ring covering all of them
+    def _ring_range(self, cell_x, cell_y):
+        min_x, max_x, min_y, max_y = self._bounds
+        first = max(min_x - cell_x, cell_x - max_x, min_y - cell_y, cell_y - max_y, 0)
+        last = max(cell_x - min_x, max_x - cell_x, cell_y - min_y, max_y - cell_y, 0)
+        return first, last
+
+    def nearest(self, latitude, longitude, k=1, exclude=None):
+        """
+        Find the k locations closest to a point by searching rings of cells outwards.
+        :param latitude: Latitude of the query point.
+        :param longitude: Longitude of the query point.
+        :param k: Number of neighbours to return.
+        :param exclude: Optional location id left out of the result (e.g. the query location itself).
+        :return: Tuple (ids, distances) of NumPy arrays sorted by haversine distance in kilometers.
+        """
+        x, y = self._project(latitude, longitude)
+        cell_x, cell_y = (int(value) for value in self._cell_of(x, y))
+        first, last = self._ring_range(cell_x, cell_y)
+        found = []
+        count = 0
+        for ring in range(first, last + 1):
+            for ids in self._ring_ids(cell_x, cell_y, ring):
+                found.append(ids)
+                count += len(ids)
+            # Unsearched locations are at least `ring` cells away from the query point
+            if count > k:
+                ids, distances = self._sorted_by_distance(np.concatenate(found), latitude, longitude, exclude)
+                if len(ids) >= k and distances[k - 1] * (1 + PROJECTION_MARGIN) <= ring * self.cell_size_km:
+                    return ids[:k], distances[:k]
+        ids, distances = self._sorted_by_distance(
+            np.concatenate(found) if found else np.empty(0, dtype=np.int32), latitude, longitude, exclude)
+        return ids[:k], distances[:k]
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """
+        Find every location within a haversine radius of a point.
+        :param latitude: Latitude of the query point.
+        :param longitude: Longitude of the query point.
+        :param radius_km: Search radius in kilometers.
+        :return: Tuple (ids, distances) of NumPy arrays sorted by distance.
+        """
+        x, y = self._project(latitude, longitude)
+        reach = radius_km * (1 + PROJECTION_MARGIN)
+        ids = self._ids_in_cell_range(*self._cell_of(x - reach, y - reach), *self._cell_of(x + reach, y + reach))
+        ids, distances = self._sorted_by_distance(ids, latitude, longitude)
+        inside = distances <= radius_km
+        return ids[inside], distances[inside]
+
+    def within_box(self, min_latitude, max_latitude, min_longitude, max_longitude):
+        """
+        Find every location inside a latitude/longitude box, e.g. a plot viewport.
+        :param min_latitude: Southern edge of the box.
+        :param max_latitude: Northern edge of the box.
+        :param min_longitude: Western edge of the box.
+        :param max_longitude: Eastern edge of the box.
+        :return: NumPy int32 array of location ids, in ascending order.
+        """
+        low_x, low_y = self._cell_of(*self._project(min_latitude, min_longitude))
+        high_x, high_y = self._cell_of(*self._project(max_latitude, max_longitude))
+        ids = self._ids_in_cell_range(low_x, low_y, high_x, high_y)
+        inside = ((self.latitudes[ids] >= min_latitude) & (self.latitudes[ids] <= max_latitude)
+                  & (self.longitudes[ids] >= min_longitude) & (self.longitudes[ids] <= max_longitude))
+        return np.sort(ids[inside])
+
+    # Location ids in all cells of an inclusive cell rectangle
+    def _ids_in_cell_range(self, low_x, low_y, high_x, high_y):
+        min_x, max_x, min_y, max_y = self._bounds
+        low_x, low_y = max(int(low_x), min_x), max(int(low_y), min_y)
+        high_x, high_y = min(int(high_x), max_x), min(int(high_y), max_y)
+        if low_x > high_x or low_y > high_y:
+            return np.empty(0, dtype=np.int32)
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(self._cells):
+            found = [ids for (cx, cy), ids in self._cells.items() if low_x <= cx <= high_x and low_y <= cy <= high_y]
+        else:
+            found = [self._cells[(cx, cy)] for cx in range(low_x, high_x + 1) for cy in range(low_y, high_y + 1)
+                     if (cx, cy) in self._cells]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+
+    # Haversine distances from a point to some locations, sorted ascending
+    def _sorted_by_distance(self, ids, latitude, longitude, exclude=None):
+        if exclude is not None:
+            ids = ids[ids != exclude]
+        distances = haversine_array(latitude, longitude, self.latitudes[ids], self.longitudes[ids])
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    def candidate_lists(self, k=8):
+        """
+        Find the k nearest neighbours of every location, one grid cell at a time.
+        Drop-in replacement for build_candidate_lists that never builds an n x n matrix.
+        :param k: Number of neighbours per location.
+        :return: NumPy int32 array of shape (n, k) with neighbours sorted by distance.
+        """
+        size = len(self.names)
+        k = min(k, size - 1)
+        candidates = np.empty((size, max(k, 0)), dtype=np.int32)
+        if k <= 0:
+            return candidates
+        for (cell_x, cell_y), members in self._cells.items():
+            _, last = self._ring_range(cell_x, cell_y)
+            found = []
+            count = 0
+            for ring in range(0, last + 1):
+                for ids in self._ring_ids(cell_x, cell_y, ring):
+                    found.append(ids)
+                    count += len(ids)
+                if count <= k or (ring == 0 and ring < last):
+                    continue
+                pool = np.concatenate(found)
+                distances = haversine_array(self.latitudes[members, None], self.longitudes[members, None],
+                                            self.latitudes[None, pool], self.longitudes[None, pool])
+                distances[pool[None, :] == members[:, None]] = np.inf  # A location is not its own neighbour
+                nearest = np.argsort(distances, axis=1, kind="stable")[:, :k]
+                kth = np.take_along_axis(distances, nearest[:, -1:], axis=1).max()
+                # Locations outside the searched rings are at least `ring` cells from this cell's members
+                if ring == last or kth * (1 + PROJECTION_MARGIN) <= ring * self.cell_size_km:
+                    candidates[members] = pool[nearest]
+                    break
+        return candidates
+
+    def nearest_neighbor_tour(self, start=0, k=8):
+        """
+        Construct a greedy nearest-neighbour tour without a distance matrix. Each step first checks
+        the current location's k nearest candidates and only falls back to a scan of the remaining
+        locations when all of them are already visited.
+        :param start: Location id the tour starts from.
+        :param k: Number of candidates checked before falling back to a full scan.
+        :return: Tour as a NumPy int32 array of location ids.
+        """
+        size = len(self.names)
+        candidates = self.candidate_lists(k)
+        visited = np.zeros(size, dtype=bool)
+        tour = np.empty(size, dtype=np.int32)
+        current = start
+        for step in range(size):
+            tour[step] = current
+            visited[current] = True
+            if step == size - 1:
+                break
+            unvisited_candidates = [c for c in candidates[current].tolist() if not visited[c]]
+            if unvisited_candidates:
+                current = unvisited_candidates[0]  # Candidates are sorted by distance
+            else:
+                remaining = np.flatnonzero(~visited)
+                distances = haversine_array(self.latitudes[current], self.longitudes[current],
+                                            self.latitudes[remaining], self.longitudes[remaining])
+                current = int(remaining[np.argmin(distances)])
+        return tour
@@ -1,6 +1,41 @@
 import pytest
-from shortest_path_calculation import calculate_total_distance, TransportMode, Segment
-from compare_transport_modes import compare_transport_modes
+import random
+import itertools
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from shortest_path_calculation import (calculate_total_distance, TransportMode, Segment, haversine,
+                                       build_distance_matrix, calculate_tour_distance, FitnessCache,
+                                       genetic_algorithm, CROSSOVER_OPERATORS, ordered_crossover,
+                                       MUTATION_OPERATORS, GeneticSearch, SearchReport, Individual,
+                                       best_individual, population_diversity, iter_genetic_algorithm,
+                                       local_search, local_search_route, build_candidate_lists,
+                                       nearest_neighbor_tour, LocationTable, location_coordinates,
+                                       CoordinateDistances)
+from compare_transport_modes import (compare_transport_modes, compare_transport_modes_batch, TransportModeIndex,
+                                     get_transport_mode_index)
+from calculate_journey import calculate_journey, calculate_journey_batch, update_journey
+from island_model import island_genetic_algorithm
+from spatial_index import SpatialIndex
+from route_solver import HELD_KARP_MAX_LOCATIONS, held_karp, held_karp_route, solve_route
+from batch_planner import plan_stream
+from metrics import bucket_index, bucket_bounds, FunctionMetrics, MetricsRegistry, summarize_metrics
+from exceptions_and_decorators import execution_time_decorator
+from search_profiler import SearchProfiler, load_search_trace, PHASES, TRACE_COLUMNS
+from fast_loader import load_locations_fast, load_transport_modes_fast, cache_path, file_hash
+from distance_store import DistanceMatrixStore
+from route_repair import repair_route
+from planning_cache import PlanningCache, plan_key, plan_journey
+from cluster_solver import cluster_solve_route, partition_locations
+from benchmark_suite import (synthetic_locations, path_lower_bound, run_suite, compare_results, run_benchmarks,
+                             spatial_nearest_neighbor_route, SEOUL_BOUNDS)
+from shortest_path_calculation import use_distance_matrix_store
+from multimodal_journey import pareto_journey, pareto_front, choose_journey
 from main import load_locations, load_transport_modes
 
 from math import isclose
@@ -112,3 +147,983 @@ def test_load_locations_error(capsys):
     load_locations("missing.csv")
     captured = capsys.readouterr()  # Capture stdout and stderr
     assert "Error: The file missing.csv was not found." in captured.out
+
+# 8. Test build_distance_matrix against the scalar haversine
+def test_build_distance_matrix():
+    """
+    Test that the vectorized distance matrix matches the scalar haversine for every pair.
+    """
+    names, matrix = build_distance_matrix(locations)
+    assert names == list(locations.keys()), "Matrix rows should follow the location order"
+    for i, a in enumerate(names):
+        for j, b in enumerate(names):
+            expected = haversine(*locations[a], *locations[b])
+            assert isclose(matrix[i, j], expected, rel_tol=1e-9, abs_tol=1e-9), f"Mismatch for {a} -> {b}"
+
+# 9. Test calculate_tour_distance
+def test_calculate_tour_distance():
+    """
+    Test that scoring an integer-encoded tour matches calculate_total_distance on names.
+    """
+    names, matrix = build_distance_matrix(locations)
+    tour = [names.index(name) for name in path]
+    assert isclose(calculate_tour_distance(tour, matrix), calculate_total_distance(path, locations), rel_tol=1e-9)
+
+# 10. Test FitnessCache hit counting and LRU eviction
+def test_fitness_cache():
+    """
+    Test that repeated tours are answered from the cache and the oldest entries are evicted.
+    """
+    _, matrix = build_distance_matrix(locations)
+    cache = FitnessCache(max_size=2)
+    first = cache.distance([0, 1, 2], matrix)
+    assert cache.distance([0, 1, 2], matrix) == first
+    assert (cache.hits, cache.evaluations) == (1, 1)
+    cache.distance([2, 1, 0], matrix)
+    cache.distance([1, 0, 2], matrix)  # Evicts [0, 1, 2]
+    assert len(cache) == 2
+    cache.distance([0, 1, 2], matrix)
+    assert cache.evaluations == 4, "Evicted tour should be scored again"
+    assert all(len(key) == 16 for key in cache._entries), "Keys should be fixed-size digests"
+
+# 11. Test genetic_algorithm reports fitness evaluations through the cache
+def test_genetic_algorithm_fitness_cache():
+    """
+    Test that every individual is scored at most once and the counters cover the whole run.
+    """
+    cache = FitnessCache()
+    distance, route = genetic_algorithm(locations, population_size=20, generations=10, fitness_cache=cache,
+                                        suppress_output=True)
+    assert sorted(route) == sorted(locations), "Route should visit every location exactly once"
+    assert isclose(distance, calculate_total_distance(route, locations), rel_tol=1e-9)
+    assert cache.hits + cache.evaluations == 20 * (10 + 1), "Each individual should be scored exactly once"
+
+# 12. Test ordered_crossover keeps the parent1 slice and parent2 order
+def test_ordered_crossover():
+    """
+    Test that OX copies the parent1 slice and fills the rest in parent2 order.
+    """
+    parent1 = np.array([0, 1, 2, 3, 4, 5, 6, 7], dtype=np.int32)
+    parent2 = np.array([7, 6, 5, 4, 3, 2, 1, 0], dtype=np.int32)
+    rng = random.Random(3)
+    start, end = sorted(random.Random(3).sample(range(8), 2))
+    child = ordered_crossover(parent1, parent2, rng)
+    assert child[start:end].tolist() == parent1[start:end].tolist()
+    rest = [gene for gene in parent2.tolist() if gene not in parent1[start:end].tolist()]
+    assert child[:start].tolist() + child[end:].tolist() == rest
+
+# 13. Test every crossover operator returns a valid permutation
+@pytest.mark.parametrize("name", sorted(CROSSOVER_OPERATORS))
+def test_crossover_operators_permutation(name):
+    """
+    Test that each crossover operator produces a permutation of the parents' location ids.
+    """
+    rng = random.Random(7)
+    for _ in range(50):
+        parent1 = np.array(rng.sample(range(30), 30), dtype=np.int32)
+        parent2 = np.array(rng.sample(range(30), 30), dtype=np.int32)
+        child = CROSSOVER_OPERATORS[name](parent1, parent2, rng)
+        assert sorted(child.tolist()) == list(range(30)), f"{name} produced an invalid tour"
+
+# 14. Test genetic_algorithm rejects unknown crossover operators
+def test_genetic_algorithm_unknown_crossover():
+    """
+    Test that an unknown crossover operator name raises a ValueError.
+    """
+    with pytest.raises(ValueError):
+        genetic_algorithm(locations, crossover="cx", suppress_output=True)
+
+# 15. Test delta evaluation of the mutation operators
+@pytest.mark.parametrize("name", sorted(MUTATION_OPERATORS))
+def test_mutation_operators_delta(name):
+    """
+    Test that each mutation operator's returned delta matches a full re-score of the tour.
+    """
+    _, matrix = build_distance_matrix(locations)
+    rng = random.Random(11)
+    size = len(locations)
+    for _ in range(200):
+        tour = np.array(rng.sample(range(size), size), dtype=np.int32)
+        before = calculate_tour_distance(tour, matrix)
+        i, j = rng.sample(range(size), 2)
+        delta = MUTATION_OPERATORS[name](tour, i, j, matrix)
+        assert sorted(tour.tolist()) == list(range(size)), f"{name} broke the permutation"
+        assert isclose(before + delta, calculate_tour_distance(tour, matrix), abs_tol=1e-9)
+
+# 16. Test island_genetic_algorithm is deterministic for a seed and island count
+def test_island_genetic_algorithm_deterministic(monkeypatch):
+    """
+    Test that the island model returns a valid route and the same result regardless of pool size.
+    """
+    first = island_genetic_algorithm(locations, islands=3, population_size=20, generations=20,
+                                     migration_interval=5, seed=5, suppress_output=True)
+    second = island_genetic_algorithm(locations, islands=3, population_size=20, generations=20,
+                                      migration_interval=5, seed=5, max_workers=1, suppress_output=True)
+    assert first == second, "Island results should not depend on the number of workers"
+    distance, route = first
+    assert sorted(route) == sorted(locations), "Route should visit every location exactly once"
+    assert isclose(distance, calculate_total_distance(route, locations), rel_tol=1e-9)
+
+    # A failure during the run surfaces unchanged after the shared memory block is released
+    def failing_migration(populations, migration_size):
+        raise RuntimeError("migration failed")
+    monkeypatch.setattr("island_model._migrate", failing_migration)
+    with pytest.raises(RuntimeError, match="migration failed"):
+        island_genetic_algorithm(locations, islands=2, population_size=10, generations=4, migration_interval=2,
+                                 max_workers=1, suppress_output=True)
+
+# 17. Test elitism never loses the best tour
+def test_elitism_keeps_best():
+    """
+    Test that with elite_size > 0 the best distance never gets worse from one generation to the next.
+    """
+    _, matrix = build_distance_matrix(locations)
+    search = GeneticSearch(matrix, population_size=20, mutation_rate=0.5, rng=random.Random(3), elite_size=2)
+    population = search.create_population()
+    best = best_individual(population).distance
+    for _ in range(30):
+        population = search.next_generation(population)
+        assert len(population) == 20
+        assert best_individual(population).distance <= best + 1e-12, "Elitism should keep the best tour"
+        best = best_individual(population).distance
+
+# 18. Test the stall detector and SearchReport
+def test_genetic_algorithm_early_stopping():
+    """
+    Test that the run stops after stall_generations without improvement and reports where the best tour was found.
+    """
+    report = SearchReport()
+    distance, _ = genetic_algorithm(locations, population_size=20, generations=500, stall_generations=10,
+                                    report=report, suppress_output=True)
+    assert report.stopped_early, "Run should stop before 500 generations once it stalls"
+    assert report.generations_run < 500
+    assert report.best_generation <= report.generations_run - 10
+    assert 0.0 <= report.diversity <= 1.0
+
+# 19. Test population_diversity bounds
+def test_population_diversity():
+    """
+    Test that identical tours have zero diversity and tours without shared edges have diversity one.
+    """
+    tour = np.arange(4, dtype=np.int32)
+    assert population_diversity([Individual(tour, 1.0), Individual(tour.copy(), 1.0)]) == 0.0
+    other = np.array([1, 3, 0, 2], dtype=np.int32)  # Shares no undirected edge with 0-1-2-3
+    assert population_diversity([Individual(tour, 1.0), Individual(other, 1.0)]) == 1.0
+
+# 20. Test the time_budget deadline
+def test_genetic_algorithm_time_budget():
+    """
+    Test that an exhausted time budget returns the best tour found so far.
+    """
+    report = SearchReport()
+    distance, route = genetic_algorithm(locations, generations=500, time_budget=0, report=report,
+                                        suppress_output=True)
+    assert report.timed_out and report.generations_run == 1, "Deadline should stop the run after one generation"
+    assert sorted(route) == sorted(locations)
+    assert isclose(distance, calculate_total_distance(route, locations), rel_tol=1e-9)
+
+# 21. Test iter_genetic_algorithm snapshots and cancellation
+def test_iter_genetic_algorithm():
+    """
+    Test that snapshots improve monotonically, end at the genetic_algorithm result, and that closing
+    the generator cancels the search.
+    """
+    snapshots = list(iter_genetic_algorithm(locations, population_size=20, generations=50, seed=9))
+    distances = [distance for _, distance, _ in snapshots]
+    assert snapshots[0][0] == 0, "First snapshot should describe the initial population"
+    assert distances == sorted(distances, reverse=True) and len(set(distances)) == len(distances)
+    assert genetic_algorithm(locations, population_size=20, generations=50, seed=9,
+                             suppress_output=True) == snapshots[-1][1:]
+
+    report = SearchReport()
+    iterator = iter_genetic_algorithm(locations, population_size=20, generations=50, seed=9, report=report)
+    next(iterator)
+    iterator.close()
+    assert report.stopped_early and report.generations_run == 0
+
+# 22. Test local_search improves a tour and respects a fixed start
+@pytest.mark.parametrize("fixed_start", [False, True])
+def test_local_search(fixed_start):
+    """
+    Test that local search keeps a valid permutation, never worsens the tour and keeps position 0 when fixed.
+    """
+    rng = random.Random(21)
+    synthetic = {f"Stop{i}": (37.45 + rng.random() * 0.2, 126.85 + rng.random() * 0.3) for i in range(150)}
+    _, matrix = build_distance_matrix(synthetic)
+    tour = np.array(rng.sample(range(150), 150), dtype=np.int32)
+    before, first = calculate_tour_distance(tour, matrix), tour[0]
+    distance = local_search(tour, matrix, build_candidate_lists(matrix, 8), fixed_start=fixed_start)
+    assert sorted(tour.tolist()) == list(range(150))
+    assert isclose(distance, calculate_tour_distance(tour, matrix), rel_tol=1e-12)
+    assert distance < before
+    assert distance <= calculate_tour_distance(nearest_neighbor_tour(matrix), matrix) * 1.05
+    if fixed_start:
+        assert tour[0] == first, "Fixed start location should stay at position 0"
+
+    # Distances computed from coordinates on demand match the matrix
+    distances = CoordinateDistances(location_coordinates(synthetic))
+    assert len(distances) == 150 and isclose(distances[3, 7], matrix[3, 7], rel_tol=1e-12)
+    assert np.allclose(distances[tour[:-1], tour[1:]], matrix[tour[:-1], tour[1:]], rtol=1e-12)
+
+# 23. Test local_search_route as a post-pass on the genetic_algorithm route
+def test_local_search_route_post_pass(monkeypatch):
+    """
+    Test that polishing the GA route from Tarjan returns a route starting at Tarjan that is no longer than
+    the anchored input.
+    """
+    _, ga_route = genetic_algorithm(locations, population_size=20, generations=5, suppress_output=True)
+    anchored = ["Tarjan"] + [name for name in ga_route if name != "Tarjan"]
+    distance, route = local_search_route(locations, start="Tarjan", initial_path=ga_route, suppress_output=True)
+    assert route[0] == "Tarjan" and sorted(route) == sorted(locations)
+    assert distance <= calculate_total_distance(anchored, locations) + 1e-9
+
+    # No n x n distance matrix is built
+    monkeypatch.setattr("shortest_path_calculation.build_distance_matrix", None)
+    distance, route = local_search_route(locations, start="Tarjan", suppress_output=True)
+    assert isclose(distance, calculate_total_distance(route, locations), rel_tol=1e-9)
+
+# 24. Test held_karp against brute force
+@pytest.mark.parametrize("start", [None, 0])
+def test_held_karp_optimal(start):
+    """
+    Test that the Held-Karp DP matches an exhaustive search on a small instance.
+    """
+    subset = dict(list(locations.items())[:7])
+    names, matrix = build_distance_matrix(subset)
+    brute_force = min(calculate_total_distance(list(order), subset) for order in itertools.permutations(names)
+                      if start is None or order[0] == names[start])
+    distance, tour = held_karp(matrix, start)
+    assert isclose(distance, brute_force, rel_tol=1e-12)
+    assert sorted(tour.tolist()) == list(range(7))
+    assert start is None or tour[0] == start
+
+    with pytest.raises(ValueError):
+        held_karp(np.zeros((HELD_KARP_MAX_LOCATIONS + 1,) * 2), start)
+    if start is None:
+        # The limit counts real locations: a free start at the maximum size adds a virtual one internally
+        largest = synthetic_locations(HELD_KARP_MAX_LOCATIONS, seed=2)
+        distance, route = solve_route(largest, start=None, exact_max_locations=HELD_KARP_MAX_LOCATIONS,
+                                      suppress_output=True)
+        assert sorted(route) == sorted(largest) and isclose(distance, calculate_total_distance(route, largest))
+
+# 25. Test solve_route dispatches between the exact and heuristic solvers
+def test_solve_route_dispatch():
+    """
+    Test that small routes are solved exactly from Tarjan and large ones still start at Tarjan.
+    """
+    exact_distance, exact_route = solve_route(locations, suppress_output=True)
+    assert (exact_distance, exact_route) == held_karp_route(locations, suppress_output=True)
+    assert exact_route[0] == "Tarjan"
+
+    distance, route = solve_route(locations, exact_max_locations=5, suppress_output=True)
+    assert route[0] == "Tarjan" and sorted(route) == sorted(locations)
+    assert distance >= exact_distance - 1e-9, "Heuristics cannot beat the exact optimum"
+    assert (distance, route) == local_search_route(locations, start="Tarjan", suppress_output=True)
+
+    ga_distance, ga_route = solve_route(locations, exact_max_locations=5, use_genetic_algorithm=True,
+                                        population_size=20, generations=20, suppress_output=True)
+    assert ga_route[0] == "Tarjan" and sorted(ga_route) == sorted(locations)
+    assert exact_distance - 1e-9 <= ga_distance <= distance, "The shorter of both routes is kept"
+    with pytest.raises(ValueError):
+        solve_route(locations, start="Nowhere", suppress_output=True)
+
+# 26. Test SpatialIndex queries against brute force
+def test_spatial_index_queries():
+    """
+    Test k-nearest, radius and box queries and candidate lists against exhaustive haversine scans.
+    """
+    rng = random.Random(4)
+    synthetic = {f"Stop{i}": (37.43 + rng.random() * 0.26, 126.76 + rng.random() * 0.42) for i in range(400)}
+    index = SpatialIndex(synthetic)
+    names, matrix = build_distance_matrix(synthetic)
+    latitudes = np.array([synthetic[name][0] for name in names])
+    longitudes = np.array([synthetic[name][1] for name in names])
+
+    for _ in range(20):
+        lat, lon = 37.4 + rng.random() * 0.3, 126.7 + rng.random() * 0.5
+        exact = np.array([haversine(lat, lon, a, b) for a, b in zip(latitudes, longitudes)])
+        ids, distances = index.nearest(lat, lon, k=5)
+        assert np.allclose(distances, np.sort(exact)[:5])
+        ids, _ = index.within_radius(lat, lon, 2.0)
+        assert set(ids.tolist()) == set(np.flatnonzero(exact <= 2.0).tolist())
+        box = index.within_box(lat - 0.03, lat + 0.03, lon - 0.03, lon + 0.03)
+        inside = (abs(latitudes - lat) <= 0.03) & (abs(longitudes - lon) <= 0.03)
+        assert box.tolist() == np.flatnonzero(inside).tolist()
+
+    expected = build_candidate_lists(matrix, 6)
+    assert np.allclose(np.take_along_axis(matrix, index.candidate_lists(6).astype(int), axis=1),
+                       np.take_along_axis(matrix, expected.astype(int), axis=1))
+
+# 27. Test the matrix-free nearest-neighbour tour
+def test_spatial_index_nearest_neighbor_tour():
+    """
+    Test that the grid-based greedy tour matches the distance-matrix version.
+    """
+    index = SpatialIndex(locations)
+    _, matrix = build_distance_matrix(locations)
+    assert index.nearest_neighbor_tour(0).tolist() == nearest_neighbor_tour(matrix, 0).tolist()
+
+# 28. Test the headless batch planner
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_planner_stream(workers):
+    """
+    Test that JSONL requests are planned in input order and failures become error results.
+    """
+    modes = [{"name": mode.name, "speed_kmh": mode.speed_kmh, "cost_per_km": mode.cost_per_km,
+              "transfer_time_min": mode.transfer_time_min} for mode in transport_modes]
+    lines = [json.dumps({"request_id": f"r{i}", "locations": {name: list(coords) for name, coords in locations.items()},
+                         "transport_modes": modes, "criterion": criterion})
+             for i, criterion in enumerate(["1", "Minimum Time", "Both Cost and Time"])]
+    lines.insert(1, "\n")
+    lines.append(json.dumps({"request_id": "bad", "locations": {"Tarjan": [37.5, 126.9]}, "transport_modes": modes,
+                             "criterion": "Cheapest"}))
+
+    results = list(plan_stream(lines, workers=workers))
+    assert [result["request_id"] for result in results] == ["r0", "r1", "r2", "bad"]
+    assert results[0]["criterion"] == "Minimum Cost" and results[0]["path"][0] == "Tarjan"
+    assert isclose(results[0]["total_distance"], 34.38, rel_tol=0.01)
+    assert len(results[1]["segments"]) == len(locations) - 1
+    assert "error" in results[3]
+
+# 29. Test compare_transport_modes_batch against the scalar version
+@pytest.mark.parametrize("use_custom_logic", [False, True])
+def test_compare_transport_modes_batch(use_custom_logic):
+    """
+    Test that the vectorized comparison picks the same modes, costs and times as the per-segment loop.
+    """
+    distances = [0.0, 0.4, 0.8, 1.0, 2.5, 5.0, 5.5, 12.0, 30.0]
+    batch = compare_transport_modes_batch(distances, transport_modes, use_custom_logic)
+    for i, distance in enumerate(distances):
+        segment = Segment("A", (0, 0), "B", (0, 0), distance=distance)
+        expected = compare_transport_modes(segment, transport_modes, use_custom_logic)
+        for criterion, best in expected.items():
+            assert batch[criterion]["Mode"][i] == best["Mode"], f"{criterion} at {distance} km"
+            assert batch[criterion]["Cost"][i] == best["Cost"] and batch[criterion]["Time"][i] == best["Time"]
+
+# 30. Test calculate_journey_batch records match calculate_journey
+def test_calculate_journey_batch():
+    """
+    Test that the columnar journey and its list-of-dicts view agree with calculate_journey.
+    """
+    expected, expected_total = calculate_journey(locations, transport_modes, path)
+    records, total = calculate_journey_batch(locations, transport_modes, path, as_records=True)
+    columns, _ = calculate_journey_batch(locations, transport_modes, path)
+    assert isclose(total, expected_total, rel_tol=1e-9)
+    assert len(columns["Distance"]) == len(path) - 1
+    for record, reference in zip(records, expected):
+        assert record["Segment"] == reference["Segment"]
+        assert isclose(record["Distance"], reference["Distance"], rel_tol=1e-9)
+        for criterion in ("Minimum Cost", "Minimum Time", "Both Cost and Time"):
+            assert record[criterion]["Mode"] == reference[criterion]["Mode"]
+            assert isclose(record[criterion]["Cost"], reference[criterion]["Cost"], rel_tol=1e-9, abs_tol=1e-12)
+            assert isclose(record[criterion]["Time"], reference[criterion]["Time"], rel_tol=1e-9)
+
+# 31. Test TransportModeIndex against the scalar comparison
+@pytest.mark.parametrize("use_custom_logic", [False, True])
+def test_transport_mode_index(use_custom_logic):
+    """
+    Test that bisecting the breakpoints gives the same result as scanning every mode, including
+    at the breakpoints themselves and with many overlapping modes.
+    """
+    rng = random.Random(7)
+    modes = transport_modes + [TransportMode(f"Operator {i}", rng.uniform(3, 90), rng.choice([0, 0.5, 1, 2, 5]),
+                                             rng.randint(0, 10)) for i in range(30)]
+    index = TransportModeIndex(modes, use_custom_logic)
+    distances = index.breakpoints + [rng.uniform(0, 40) for _ in range(300)] + [0.5, 1.0, 5.0, 100.0]
+    for distance in distances:
+        segment = Segment("A", (0, 0), "B", (0, 0), distance=distance)
+        assert index.best(distance) == compare_transport_modes(segment, modes, use_custom_logic), f"{distance} km"
+
+# 32. Test get_transport_mode_index rebuilds when the mode set changes
+def test_transport_mode_index_rebuild():
+    """
+    Test that the cached index is reused for an unchanged mode set and rebuilt after edits.
+    """
+    modes = [TransportMode(mode.name, mode.speed_kmh, mode.cost_per_km, mode.transfer_time_min)
+             for mode in transport_modes]
+    index = get_transport_mode_index(modes)
+    assert get_transport_mode_index(modes) is index
+    assert get_transport_mode_index(modes, use_custom_logic=True) is not index
+
+    modes.append(TransportMode("Helicopter", 200, 50, 0))
+    rebuilt = get_transport_mode_index(modes)
+    assert rebuilt is not index and rebuilt.best(3.0)["Minimum Time"]["Mode"] == "Helicopter"
+
+    modes[-1].speed_kmh = 20
+    assert get_transport_mode_index(modes).best(3.0)["Minimum Time"]["Mode"] == "Train"
+
+# 33. Test pareto_journey against brute force over every mode assignment
+@pytest.mark.parametrize("switch_time_min, switch_cost", [(0, 0), (5, 1), (20, 3)])
+def test_pareto_journey(switch_time_min, switch_cost):
+    """
+    Test that the label-setting DP finds exactly the Pareto frontier of all mode assignments.
+    """
+    legs = path[:6]
+    frontier = pareto_journey(locations, transport_modes, legs, switch_time_min, switch_cost)
+    totals = []
+    for assignment in itertools.product(range(len(transport_modes)), repeat=len(legs) - 1):
+        cost = time = 0.0
+        for leg, mode_id in enumerate(assignment):
+            mode = transport_modes[mode_id]
+            distance = haversine(*locations[legs[leg]], *locations[legs[leg + 1]])
+            cost += mode.cost_per_km * distance
+            time += distance / mode.speed_kmh
+            if leg == 0 or assignment[leg - 1] != mode_id:
+                time += mode.transfer_time_min / 60
+            if leg > 0 and assignment[leg - 1] != mode_id:
+                cost += switch_cost
+                time += switch_time_min / 60
+        totals.append((cost, time))
+    totals = np.array(totals)
+    expected = totals[pareto_front(totals[:, 0], totals[:, 1])]
+    assert np.allclose([(journey["Cost"], journey["Time"]) for journey in frontier], expected)
+    for journey in frontier:
+        assert len(journey["Modes"]) == len(legs) - 1
+        assert isclose(sum(segment["Cost"] for segment in journey["Segments"]), journey["Cost"], abs_tol=1e-9)
+        assert isclose(sum(segment["Time"] for segment in journey["Segments"]), journey["Time"], rel_tol=1e-9)
+
+# 34. Test choose_journey trade-offs
+def test_choose_journey():
+    """
+    Test picking the cheapest, fastest and value-of-time journeys from one frontier.
+    """
+    frontier = pareto_journey(locations, transport_modes, path)
+    assert choose_journey(frontier) is frontier[0]
+    assert choose_journey(frontier, max_cost=float("inf")) is frontier[-1]
+    within = choose_journey(frontier, max_time=frontier[0]["Time"] / 2)
+    assert within is None or within["Time"] <= frontier[0]["Time"] / 2
+    assert choose_journey(frontier, max_time=0) is None
+    assert choose_journey(frontier, cost_per_hour=1e9) is frontier[-1]
+
+# 35. Test that importing the planner stays fast and skips matplotlib and colorama
+IMPORT_TIME_BUDGET_US = 500_000  # Cumulative import time allowed for each entry module, in microseconds
+
+@pytest.mark.parametrize("module", ["main", "batch_planner"])
+def test_import_time_budget(module):
+    """
+    Test with python -X importtime that the entry modules import without running the program,
+    without loading matplotlib or colorama, and within the import-time budget.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, timeout=60, stdin=subprocess.DEVNULL)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout == ""  # Nothing printed, no prompt shown
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                timings[name.strip()] = int(cumulative)
+    assert not any(name.split(".")[0] in ("matplotlib", "colorama") for name in timings)
+    assert timings[module] < IMPORT_TIME_BUDGET_US, f"{module} took {timings[module] / 1000:.0f} ms to import"
+
+# 36. Test the latency histogram buckets and percentiles
+def test_latency_histogram():
+    """
+    Test that every latency falls inside its bucket and percentiles stay within the bucket resolution.
+    """
+    for value in list(range(200)) + [10 ** exponent + offset for exponent in range(3, 12) for offset in (-1, 0, 1)]:
+        low, high = bucket_bounds(bucket_index(value))
+        assert low <= value <= high
+        assert high - low <= max(value, 1) / 8
+    rng = random.Random(3)
+    samples = [int(rng.lognormvariate(13, 1)) for _ in range(5000)]
+    metrics = FunctionMetrics()
+    for sample in samples:
+        metrics.record(sample)
+    samples.sort()
+    for percent in (50, 95, 99):
+        exact = samples[-(-len(samples) * percent // 100) - 1]
+        assert isclose(metrics.percentile(percent), exact, rel_tol=0.05)
+    assert metrics.min_ns == samples[0] and metrics.max_ns == samples[-1] and metrics.count == len(samples)
+
+# 37. Test that the metrics registry flushes JSONL that the reader summarizes
+def test_metrics_registry(tmp_path):
+    """
+    Test batched flushing from several threads and the p50/p95/p99 summary of the written file.
+    """
+    path = tmp_path / "metrics.jsonl"
+    registry = MetricsRegistry(path=str(path), flush_interval=0.01)
+
+    def record_many(offset):
+        for i in range(1000):
+            registry.record("solve", 1_000_000 * (1 + i % 2) + offset)  # Half 1 ms, half 2 ms
+
+    threads = [threading.Thread(target=record_many, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.record("load", 5_000)
+    registry.close()
+
+    summary = summarize_metrics(str(path))
+    assert summary["solve"]["count"] == 4000 and summary["load"]["count"] == 1
+    assert isclose(summary["solve"]["p50_ms"], 1.0, rel_tol=0.05)
+    assert isclose(summary["solve"]["p95_ms"], 2.0, rel_tol=0.05)
+    assert summary["solve"]["min_ms"] <= summary["solve"]["p50_ms"] <= summary["solve"]["p99_ms"] <= summary["solve"]["max_ms"]
+    assert registry.snapshot()["solve"].count == 4000
+
+    # Recording again after close restarts the flush thread but keeps the one exit finalizer
+    finalizer = registry._finalizer
+    registry.record("load", 5_000)
+    registry.close()
+    assert registry._finalizer is finalizer and finalizer.still_active()
+
+# 38. Test that the decorators keep the wrapped function's name
+def test_decorators_preserve_names():
+    """
+    Test that execution_time_decorator reports and records the real function name, not "wrapper".
+    """
+    @execution_time_decorator
+    def sample_function():
+        return 42
+
+    assert sample_function.__name__ == "sample_function"
+    assert sample_function(suppress_output=True) == 42
+    assert genetic_algorithm.__name__ == "genetic_algorithm" and load_locations.__name__ == "load_locations"
+
+# 39. Test that the GA profiler records every generation without changing the result
+def test_search_profiler():
+    """
+    Test per-generation rows, phase timings, evaluation counters and callbacks of SearchProfiler.
+    """
+    expected = genetic_algorithm(locations, generations=60, seed=5, suppress_output=True)
+    profiler = SearchProfiler()
+    seen = []
+    profiler.on_generation(lambda row: seen.append(row["generation"]))
+    cache = FitnessCache()
+    result = genetic_algorithm(locations, generations=60, seed=5, fitness_cache=cache, profiler=profiler,
+                               suppress_output=True)
+    assert result == expected
+    assert seen == list(range(61)) and len(profiler.rows) == 61
+    trace = profiler.to_arrays()
+    assert np.all(np.diff(trace["best_so_far"]) <= 0) and isclose(trace["best_so_far"][-1], result[0])
+    assert np.all(trace["mean_distance"] >= trace["best_distance"] - 1e-9)  # Equal once converged
+    assert trace["evaluations"].sum() == cache.evaluations and trace["cache_hits"].sum() == cache.hits
+    assert all(total > 0 for total in profiler.phase_totals().values())
+    assert np.all(trace["generation_ns"][1:] >= sum(trace[f"{phase}_ns"][1:] for phase in PHASES))
+
+# 40. Test trace export to NPZ and CSV and the convergence plot
+@pytest.mark.parametrize("extension", ["npz", "csv"])
+def test_search_trace_export(tmp_path, extension):
+    """
+    Test that a saved trace loads back unchanged and can be plotted to a file.
+    """
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    from journey_visualization import plot_search_trace
+
+    profiler = SearchProfiler()
+    genetic_algorithm(locations, generations=20, seed=1, profiler=profiler, suppress_output=True)
+    trace_path = tmp_path / f"trace.{extension}"
+    profiler.save(str(trace_path))
+    loaded = load_search_trace(str(trace_path))
+    for column, values in profiler.to_arrays().items():
+        assert np.array_equal(loaded[column], values), column
+    assert set(loaded) == set(TRACE_COLUMNS)
+
+    plot_search_trace(loaded, output_path=str(tmp_path / "trace.png"))
+    assert (tmp_path / "trace.png").stat().st_size > 0
+
+# 41. Test the slotted TransportMode and Segment
+def test_slotted_core_classes():
+    """
+    Test that TransportMode and Segment carry no per-instance dict and keep their attributes.
+    """
+    mode = TransportMode("Bus", 40, 2, 5)
+    segment = Segment("Tarjan", (37.5219, 126.9245), "Bukhan-ro", (37.58, 126.9844), distance=8.34)
+    for instance in (mode, segment):
+        assert not hasattr(instance, "__dict__")
+        with pytest.raises(AttributeError):
+            instance.unknown_attribute = 1
+    assert segment.start == {"latitude": 37.5219, "longitude": 126.9245}
+    assert segment.end == {"latitude": 37.58, "longitude": 126.9844}
+    copy = pickle.loads(pickle.dumps(mode))
+    assert (copy.name, copy.speed_kmh, copy.cost_per_km, copy.transfer_time_min) == ("Bus", 40, 2, 5)
+
+# 42. Test LocationTable as a drop-in replacement for the locations dictionary
+def test_location_table():
+    """
+    Test the mapping interface, the id maps and that solvers and journeys give the same results.
+    """
+    table = LocationTable.from_dict(locations)
+    assert len(table) == len(locations) and list(table) == list(locations)
+    assert table["Tarjan"] == locations["Tarjan"] and "Tarjan" in table and "Nowhere" not in table
+    assert dict(table.items()) == locations
+    assert table.coordinates.flags.c_contiguous and table.coordinates.dtype == np.float64
+    assert table.names_of(table.ids_of(path)) == path
+    assert np.array_equal(location_coordinates(table, path), location_coordinates(locations, path))
+    with pytest.raises(ValueError):
+        LocationTable(["A", "A"], [(0, 0), (1, 1)])
+
+    assert np.array_equal(build_distance_matrix(table)[1], build_distance_matrix(locations)[1])
+    assert solve_route(table, suppress_output=True) == solve_route(locations, suppress_output=True)
+    assert (genetic_algorithm(table, generations=30, seed=2, suppress_output=True)
+            == genetic_algorithm(locations, generations=30, seed=2, suppress_output=True))
+    assert calculate_journey(table, transport_modes, path) == calculate_journey(locations, transport_modes, path)
+    nearest_ids, _ = SpatialIndex(table).nearest(37.55, 127.0, k=3)
+    assert nearest_ids.tolist() == SpatialIndex(locations).nearest(37.55, 127.0, k=3)[0].tolist()
+
+# 43. Test the columnar loaders against the row-by-row loaders and their validation
+def test_fast_loaders(tmp_path, capsys):
+    """
+    Test that the columnar loaders read the project files like the originals, accept integer
+    coordinates and report the line numbers of invalid rows.
+    """
+    cache_dir = str(tmp_path / "cache")
+    assert dict(load_locations_fast("locations.csv", cache_dir=cache_dir).items()) == load_locations("locations.csv")
+    modes = load_transport_modes_fast("transport_modes.csv", cache_dir=cache_dir)
+    assert [(mode.name, mode.speed_kmh, mode.cost_per_km, mode.transfer_time_min) for mode in modes] == \
+           [(mode.name, mode.speed_kmh, mode.cost_per_km, mode.transfer_time_min)
+            for mode in load_transport_modes("transport_modes.csv")]
+
+    file_path = tmp_path / "locations.csv"
+    file_path.write_text("Name,Latitude,Longitude\nTarjan,37.5219,126.9245\nA,37,127\n\nB,x,127\n"
+                         "C,95,1\nA,1,1\nbad!,1,1\nD,1,2,3\n")
+    capsys.readouterr()
+    table = load_locations_fast(str(file_path), use_cache=False)
+    assert dict(table.items()) == {"Tarjan": (37.5219, 126.9245), "A": (37.0, 127.0)}
+    assert "line(s) 5, 6, 7, 8, 9 of" in capsys.readouterr().out
+    assert "A" in load_locations(str(file_path))  # Integer coordinates are valid for the original loader too
+
+    # An extra field on one line and a missing field on the next must not cancel out
+    file_path.write_text("Name,Latitude,Longitude\nTarjan,37.5219,126.9245\nA,37.5,127.0,B\n37.6,127.1\n")
+    capsys.readouterr()
+    assert list(load_locations_fast(str(file_path), use_cache=False)) == ["Tarjan"]
+    assert "line(s) 3, 4 of" in capsys.readouterr().out
+
+# 44. Test the binary cache of the columnar loader
+def test_fast_loader_cache(tmp_path):
+    """
+    Test that the cache is written, reused while the file is unchanged (even if only touched)
+    and rebuilt when the contents change.
+    """
+    file_path = tmp_path / "locations.csv"
+    file_path.write_text("Name,Latitude,Longitude\nA,1.5,2.5\nB,3.5,4.5\n")
+    first = load_locations_fast(str(file_path))
+    folder = cache_path(str(file_path))
+    assert os.path.dirname(folder) == str(tmp_path / ".planner_cache")
+    assert os.path.exists(os.path.join(folder, "meta.json"))
+
+    # Poison the cached values: a cache hit returns them, a rebuild does not
+    values_path = os.path.join(folder, f"values-{file_hash(str(file_path))}.npy")
+    mapped = np.load(values_path, mmap_mode="r")
+    np.save(values_path, np.load(values_path) + 10)
+    stat = file_path.stat()
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_locations_fast(str(file_path))["A"] == (11.5, 12.5)  # Touched only: same hash, cache used
+
+    file_path.write_text("Name,Latitude,Longitude\nA,1.5,2.5\nB,3.5,4.6\n")  # Same size, new contents
+    assert dict(load_locations_fast(str(file_path)).items()) == {"A": (1.5, 2.5), "B": (3.5, 4.6)}
+    assert list(first) == ["A", "B"]
+    # The rebuild wrote new files: arrays mapped from the old cache are left intact
+    assert mapped[1, 1] == 14.5 and sorted(os.listdir(folder)) == sorted(
+        ["meta.json", f"values-{file_hash(str(file_path))}.npy", f"names-{file_hash(str(file_path))}.npy"])
+
+# 45. Test the persistent distance matrix store
+def test_distance_matrix_store(tmp_path):
+    """
+    Test that stored matrices equal the in-memory matrix, are mapped read-only on later loads,
+    are extended incrementally when locations are added, can be stored as float32, are shared
+    with other users and evicted least recently used first.
+    """
+    locations = load_locations("locations.csv")
+    names, expected = build_distance_matrix(locations)
+    store = DistanceMatrixStore(str(tmp_path), min_locations=0)
+    store_names, matrix = store.load(locations)
+    assert store_names == names and np.array_equal(matrix, expected) and store.builds == 1
+    assert all(os.stat(tmp_path / file_name).st_mode & 0o777 == 0o644 for file_name in os.listdir(tmp_path))
+    _, matrix = store.load(LocationTable.from_dict(locations))
+    assert store.hits == 1 and isinstance(matrix, np.memmap) and not matrix.flags.writeable
+
+    # Added locations (also in the middle, with the order changed) reuse the stored distances
+    grown = dict(reversed(list(locations.items())))
+    grown["Extra 1"] = (37.6, 127.1)
+    grown = {"Extra 2": (37.4, 126.8), **grown}
+    grown_names, grown_matrix = store.load(grown)
+    assert store.incremental_builds == 1 and store.builds == 1
+    assert np.allclose(grown_matrix, build_distance_matrix(grown)[1], rtol=0, atol=1e-9)
+
+    # Poisoned stored matrix: an incremental build copies it, proving the old block is not recomputed
+    key = store.key(location_coordinates(grown))
+    poisoned = np.array(grown_matrix) + 1000
+    poisoned[np.diag_indices_from(poisoned)] = 0
+    np.save(f"{tmp_path}/{key}-{len(grown)}-float64.npy", poisoned)
+    grown["Extra 3"] = (37.5, 127.0)
+    _, extended = store.load(grown)
+    assert extended[0, 1] == poisoned[0, 1] and extended[0, -1] < 1000
+
+    # Concurrent builders of the same catalogue each write through their own temporary files
+    shared_store = DistanceMatrixStore(str(tmp_path / "shared"))
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        matrices = list(executor.map(shared_store.load, [locations] * 8))
+    assert all(np.array_equal(shared, expected) for _, shared in matrices)
+
+    float_store = DistanceMatrixStore(str(tmp_path), dtype=np.float32, min_locations=0)
+    _, small = float_store.load(locations)
+    assert small.dtype == np.float32 and float_store.builds == 1
+    assert np.allclose(small, expected, rtol=1e-6, atol=1e-4)
+
+    previous = use_distance_matrix_store(store)
+    try:
+        assert isinstance(build_distance_matrix(locations)[1], np.memmap)
+        use_distance_matrix_store(DistanceMatrixStore(str(tmp_path)))  # Too few locations to be stored
+        assert not isinstance(build_distance_matrix(locations)[1], np.memmap)
+        use_distance_matrix_store(float_store)
+        distance, path = island_genetic_algorithm(locations, islands=2, population_size=10, generations=4,
+                                                  migration_interval=2, max_workers=2, suppress_output=True)
+        assert sorted(path) == sorted(locations) and distance > 0
+    finally:
+        use_distance_matrix_store(previous)
+    assert previous is None and not isinstance(build_distance_matrix(locations)[1], np.memmap)
+
+    # Adding a matrix to a full store evicts the least recently used one
+    bounded_store = DistanceMatrixStore(str(tmp_path / "bounded"))
+    first, second, third = (dict(list(grown.items())[:-1]), dict(list(grown.items())[1:]),
+                            {**grown, "Extra 4": (37.45, 126.9)})
+    for catalogue in (first, second, first):
+        bounded_store.load(catalogue)
+    used = sum(entry.stat().st_size for entry in os.scandir(tmp_path / "bounded"))
+    bounded_store.max_bytes = used + 8 * len(third) ** 2  # Too small for the new matrix's header and coordinates
+    bounded_store.load(third)
+    assert bounded_store.evictions == 1 and len(os.listdir(tmp_path / "bounded")) == 4
+    bounded_store.load(first)
+    assert bounded_store.hits == 2
+
+# 46. Test incremental route repair
+def test_repair_route():
+    """
+    Test that repaired routes visit exactly the new stop set, keep the start, report the right
+    distance and changed legs, and that the local improvement never makes the route longer.
+    """
+    locations = load_locations("locations.csv")
+    names = list(locations)
+    for seed in range(50):
+        rng = random.Random(seed)
+        path = rng.sample(names, rng.randint(2, len(names)))
+        others = [name for name in names if name not in path]
+        added = rng.sample(others, min(len(others), rng.randint(0, 4)))
+        removed = rng.sample(path[1:], rng.randint(0, min(3, len(path) - 1)))
+        distance, new_path, changed_legs = repair_route(locations, path, added, removed)
+        assert sorted(new_path) == sorted([name for name in path if name not in removed] + added)
+        assert new_path[0] == path[0]
+        assert distance == pytest.approx(calculate_total_distance(new_path, locations))
+        old_legs = set(zip(path, path[1:]))
+        assert changed_legs == [leg for leg, pair in enumerate(zip(new_path, new_path[1:])) if pair not in old_legs]
+        assert distance <= repair_route(locations, path, added, removed, window=0)[0] + 1e-9
+
+    # A crossing next to the edit is untangled
+    square = {"A": (0.0, 0.0), "B": (0.0, 1.0), "C": (1.0, 0.0), "D": (1.0, 1.0), "E": (2.0, 0.5)}
+    distance, new_path, _ = repair_route(square, ["A", "C", "B", "D"], added=["E"])
+    assert new_path == ["A", "B", "C", "D", "E"] or new_path == ["A", "B", "D", "C", "E"]
+    assert distance == pytest.approx(min(calculate_total_distance(["A", *order, "E"], square)
+                                         for order in itertools.permutations("BCD")))
+
+    with pytest.raises(ValueError):
+        repair_route(locations, names[:3], removed=[names[5]])
+    with pytest.raises(ValueError):
+        repair_route(locations, names[:3], added=[names[1]])
+    with pytest.raises(ValueError):
+        repair_route(locations, names[:4], removed=[names[0]])  # The fixed start
+    assert repair_route(locations, names[:4], removed=[names[0]], fixed_start=False)[1][0] != names[0]
+
+# 47. Test re-evaluating only the changed segments of a journey
+def test_update_journey():
+    """
+    Test that update_journey after a repair equals a full calculate_journey of the new route.
+    """
+    locations = load_locations("locations.csv")
+    transport_modes = load_transport_modes("transport_modes.csv")
+    names = list(locations)
+    path = names[:10]
+    previous, _ = calculate_journey(locations, transport_modes, path)
+    _, new_path, changed_legs = repair_route(locations, path, added=names[10:12], removed=[path[4]])
+    expected = calculate_journey(locations, transport_modes, new_path)
+    assert update_journey(locations, transport_modes, new_path, previous, changed_legs) == expected
+    assert update_journey(locations, transport_modes, new_path, previous) == expected
+
+# 48. Test the synthetic instances and the lower bound of the benchmark suite
+def test_benchmark_instances():
+    """
+    Test that synthetic location sets are seeded and inside Seoul, and that the spanning tree bound
+    never exceeds the optimal route.
+    """
+    locations = synthetic_locations(10, seed=3)
+    assert locations == synthetic_locations(10, seed=3) and locations != synthetic_locations(10, seed=4)
+    assert len(locations) == 10 and next(iter(locations)) == "Tarjan"
+    coords = location_coordinates(locations)
+    assert np.all((coords[:, 0] >= SEOUL_BOUNDS[0]) & (coords[:, 0] <= SEOUL_BOUNDS[1]))
+    assert np.all((coords[:, 1] >= SEOUL_BOUNDS[2]) & (coords[:, 1] <= SEOUL_BOUNDS[3]))
+    optimum, _ = held_karp_route(locations, start=None, suppress_output=True)
+    assert 0 < path_lower_bound(locations) <= optimum + 1e-9
+
+# 49. Test a benchmark run and the regression comparison
+def test_benchmark_suite(tmp_path, capsys):
+    """
+    Test that a small run records time, memory and quality, and that compare flags a slowdown
+    and a worse tour but not noise.
+    """
+    document = run_suite(sizes=[10], generations=3)
+    rows = {row["benchmark"]: row for row in document["results"]}
+    assert {"load_locations", "genetic_algorithm", "held_karp_route", "calculate_journey",
+            "compare_transport_modes"} <= set(rows)
+    assert all(row["seconds"] >= 0 and row["peak_bytes"] >= 0 for row in rows.values())
+    assert rows["held_karp_route"]["quality"] >= 1.0
+    assert rows["genetic_algorithm"]["quality"] >= rows["held_karp_route"]["quality"] - 1e-9
+
+    slower = json.loads(json.dumps(document))
+    for row in slower["results"]:
+        if row["benchmark"] == "genetic_algorithm":
+            row["seconds"] = row["seconds"] * 2 + 1
+            row["quality"] *= 1.5
+        elif row["benchmark"] == "calculate_journey":
+            row["seconds"] *= 1.5  # Relative change above the threshold, but below the noise floor
+    flagged = {(row["benchmark"], row["metric"]) for row in compare_results(document, slower) if row["regression"]}
+    assert flagged == {("genetic_algorithm", "seconds"), ("genetic_algorithm", "quality")}
+
+    baseline_path, current_path = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline_path.write_text(json.dumps(document))
+    current_path.write_text(json.dumps(slower))
+    assert run_benchmarks(["compare", str(baseline_path), str(baseline_path)]) == 0
+    assert run_benchmarks(["compare", str(baseline_path), str(current_path)]) == 1
+    assert "2 regression(s)" in capsys.readouterr().out
+
+# 50. Test headless batched rendering of journey maps
+def test_render_journey(tmp_path):
+    """
+    Test that each mode becomes one LineCollection, labels are thinned and culled by the viewport,
+    output goes to PNG/SVG bytes or files, and a batch reuses one figure.
+    """
+    from journey_visualization import JourneyRenderer, render_journey, render_journeys
+
+    locations = synthetic_locations(2000, seed=1)
+    _, names = spatial_nearest_neighbor_route(locations)  # Mostly short legs, like a real route
+    modes = ["Bus", "Train", "Walking", "Bicycle", "Scooter"]
+    optimal_modes = [(names[i], names[i + 1], modes[i % len(modes)]) for i in range(len(names) - 1)]
+
+    renderer = JourneyRenderer(max_labels=50)
+    image = renderer.render(locations, optimal_modes)
+    assert image.startswith(b"\x89PNG")
+    assert len(renderer.axes.collections) == len(modes) + 2  # One per mode, the stops and Tarjan's home
+    assert len(renderer.axes.texts) == 50 and renderer.axes.texts[0].get_text() == "Tarjan"
+    full_view_labels = len(renderer.axes.texts)
+
+    # Zooming in culls segments outside the viewport but still labels up to the cap
+    renderer.max_labels = 1000
+    renderer.render(locations, optimal_modes, viewport=(37.55, 37.6, 126.9, 126.95))
+    labels = [text.get_text() for text in renderer.axes.texts]
+    assert 0 < len(labels) < 1000 and all(37.55 <= locations[name][0] <= 37.6 for name in labels)
+    drawn = sum(len(collection.get_segments()) for collection in renderer.axes.collections[:len(modes)])
+    assert drawn < len(optimal_modes) // 10
+    assert full_view_labels <= renderer.max_labels
+
+    assert b"<svg" in render_journey(locations, optimal_modes[:20], format="svg")
+    render_journey(locations, optimal_modes[:20], str(tmp_path / "route.svg"))
+    assert (tmp_path / "route.svg").read_text().lstrip().startswith("<?xml")
+
+    outputs = [str(tmp_path / f"route_{i}.png") for i in range(3)]
+    journeys = [(locations, optimal_modes[i * 10:(i + 1) * 10], f"Route {i}") for i in range(3)]
+    assert list(render_journeys(journeys, outputs)) == outputs
+    assert all(os.path.getsize(output) > 0 for output in outputs)
+    assert all(image.startswith(b"\x89PNG") for image in render_journeys(journeys))
+
+# 51. Test the two-tier planning cache
+def test_planning_cache(tmp_path):
+    """
+    Test canonical keys, LRU eviction in memory, the shared SQLite tier with size-based eviction,
+    the hit/miss statistics and pickling for worker processes.
+    """
+    locations = load_locations("locations.csv")
+    transport_modes = load_transport_modes("transport_modes.csv")
+    key = plan_key(locations, transport_modes, start="Tarjan", seed=1)
+    assert key == plan_key(LocationTable.from_dict(locations), load_transport_modes("transport_modes.csv"),
+                           seed=1, start="Tarjan")
+    moved = dict(locations, Tarjan=(locations["Tarjan"][0] + 1e-9, locations["Tarjan"][1]))
+    slower = [TransportMode(mode.name, mode.speed_kmh * 0.5, mode.cost_per_km, mode.transfer_time_min)
+              for mode in transport_modes]
+    assert len({key, plan_key(moved, transport_modes, start="Tarjan", seed=1),
+                plan_key(locations, slower, start="Tarjan", seed=1),
+                plan_key(locations, transport_modes, start="Tarjan", seed=2)}) == 4
+    previous = use_distance_matrix_store(DistanceMatrixStore(str(tmp_path / "matrices"), np.float32, min_locations=0))
+    try:
+        assert plan_key(locations, transport_modes, start="Tarjan", seed=1) != key
+    finally:
+        use_distance_matrix_store(previous)
+
+    calls = []
+    cache = PlanningCache(max_entries=2, path=str(tmp_path / "plans.sqlite"), max_bytes=10 ** 6)
+    for name in ["a", "b", "a", "c", "b"]:
+        assert cache.get_or_compute(name, lambda: calls.append(name) or {"plan": name * 100}) == {"plan": name * 100}
+    assert calls == ["a", "b", "c"]  # "b" was evicted from memory by "c", then found on disk
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 3)
+    assert stats["memory_entries"] == 2 and stats["memory_evictions"] == 2 and stats["disk_entries"] == 3
+
+    # Another process (here: an unpickled copy) shares the disk tier but not the memory tier
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.get("a") == {"plan": "a" * 100} and copy.stats()["disk_hits"] == 1
+    assert copy.get("missing") is None and copy.stats()["misses"] == 1
+
+    # Above max_bytes the least recently used plans leave the disk tier
+    small = PlanningCache(path=str(tmp_path / "small.sqlite"), max_bytes=3000)
+    for number in range(5):
+        small.put(number, "x" * 1000)
+    assert small.stats()["disk_entries"] == 2 and small.stats()["disk_evictions"] == 3
+    small.close()
+    cache.clear()
+    assert cache.stats()["disk_entries"] == 0 and cache.get("a") is None
+
+# 52. Test cached journey planning
+def test_plan_journey():
+    """
+    Test that plan_journey returns what solve_route and calculate_journey return, and that a
+    repeated request is served from the cache.
+    """
+    locations = load_locations("locations.csv")
+    transport_modes = load_transport_modes("transport_modes.csv")
+    cache = PlanningCache()
+    plan = plan_journey(locations, transport_modes, seed=7, cache=cache)
+    distance, path = solve_route(locations, start="Tarjan", seed=7, suppress_output=True)
+    assert plan == (distance, path, *calculate_journey(locations, transport_modes, path))
+    assert plan_journey(locations, transport_modes, seed=7, cache=cache) is plan
+    columns = plan_journey(locations, transport_modes, seed=7, columnar=True, cache=cache)[2]
+    assert list(columns["Start"]) == path[:-1]
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["misses"] == 2
+
+# 53. Test the geographic partitions of the cluster solver
+def test_partition_locations():
+    """
+    Test that k-means and grid partitions label every location, are seeded, and that grid cells are balanced.
+    """
+    coords = location_coordinates(synthetic_locations(1000, seed=2))
+    for method in ("kmeans", "grid"):
+        labels = partition_locations(coords, 9, method)
+        assert labels.shape == (1000,) and set(labels.tolist()) == set(range(int(labels.max()) + 1))
+        assert np.array_equal(labels, partition_locations(coords, 9, method))
+    counts = np.bincount(partition_locations(coords, 9, "grid"))
+    assert len(counts) == 9 and counts.max() - counts.min() <= 1
+    with pytest.raises(ValueError):
+        partition_locations(coords, 9, "hexagons")
+
+# 54. Test the cluster-decompose-and-stitch solver
+def test_cluster_solve_route():
+    """
+    Test that the cluster solver visits every location once starting from Tarjan, reports the path's
+    distance, beats a plain nearest-neighbour route, and that solve_route switches to it for large sets.
+    """
+    locations = synthetic_locations(1500, seed=5)
+    _, greedy_path = spatial_nearest_neighbor_route(locations)
+    for method, workers in (("kmeans", 2), ("grid", 1)):
+        distance, path = cluster_solve_route(locations, cluster_size=200, method=method, workers=workers,
+                                             suppress_output=True)
+        assert path[0] == "Tarjan" and sorted(path) == sorted(locations)
+        assert distance == pytest.approx(calculate_total_distance(path, locations))
+        assert distance < calculate_total_distance(greedy_path, locations)
+
+    small = load_locations("locations.csv")
+    distance, path = cluster_solve_route(small, start=None, cluster_size=4, workers=1, suppress_output=True)
+    assert sorted(path) == sorted(small) and distance == pytest.approx(calculate_total_distance(path, small))
+    distance, path = solve_route(small, start="Tarjan", exact_max_locations=0, cluster_min_locations=5,
+                                 suppress_output=True)
+    assert path[0] == "Tarjan" and sorted(path) == sorted(small)